@@ -1,120 +1,590 @@
 # app.py
-from flask import Flask, render_template, request, jsonify
-import pywhatkit
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context, url_for
 import time
 import os
 import threading
+import signal
 import sys
 import webbrowser
 import uuid
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from broker import BrokerPipeline, SqliteBroker, WorkerPool
+from campaign_registrar import CampaignRegistrar
+from contact_attributes import ContactAttributeStore
+from contact_import import import_contacts, normalize_number, normalize_prefix
+from contact_store import ContactStore
+from dead_letters import DeadLetterQueue
+from dispatcher import DailyWindow, Dispatcher, next_send_time
+from job_store import JobStore
+import metrics
+from message_template import TemplateError, compile_template
+from progress_stream import ProgressBroadcaster
+from retry_engine import RetryEngine, RetryPolicy
+from send_history import SendHistoryLog
+from send_ledger import SendLedger
+from sqlite_store import (SqliteContactAttributeStore, SqliteContactStore, SqliteDatabase, SqliteDeadLetterQueue,
+                          SqliteJobStore, SqliteSendLedger)
+from state_manager import StateManager
+from transport import SendInterruptedError, create_transports
+from send_pipeline import SendPipeline, SendTask
 
 app = Flask(__name__)
 
 # File to store customer numbers
 NUMBERS_FILE = "customer_numbers.txt"
-# File to store scheduled jobs persistently
+# Legacy JSON file for scheduled jobs (migrated into the journal on first load)
 SCHEDULED_JOBS_FILE = "scheduled_jobs.json"
-
-# Initialize scheduler
+# Append-only journal that stores scheduled jobs persistently
+SCHEDULED_JOBS_JOURNAL = "scheduled_jobs.jsonl"
+# Per-number personalization fields used by message templates ({{name}}, {{order_id}}, ...)
+CONTACT_ATTRIBUTES_FILE = "contact_attributes.jsonl"
+# Rotating, compressed send history (job id, campaign, number, outcome and timings per attempt)
+SEND_HISTORY_DIR = os.environ.get("WHATSAPP_SEND_HISTORY_DIR", "send_history")
+# Segment size at which the send history rotates to a new compressed file
+SEND_HISTORY_SEGMENT_BYTES = int(os.environ.get("WHATSAPP_SEND_HISTORY_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+# pywhatkit's own free-text send log (imported into the send history on first start)
+PYWHATKIT_LOG_FILE = "PyWhatKit_DB.txt"
+# Messages that failed every retry, kept for re-driving
+DEAD_LETTERS_FILE = "dead_letters.jsonl"
+# Outbox ledger of the sends in flight (claims, attempts and confirmations not yet in the job journal)
+SEND_LEDGER_FILE = "send_ledger.jsonl"
+# Storage backend: 'files' (numbers file + job journal) or 'sqlite' (one embedded database,
+# which also keeps the send history); migrate with `python migrate_to_sqlite.py`
+STORAGE_BACKEND = os.environ.get("WHATSAPP_STORAGE", "files")
+SQLITE_DB_FILE = os.environ.get("WHATSAPP_SQLITE_DB", "whatsapp_sender.db")
+
+# Transport used to deliver messages: 'pywhatkit' opens a WhatsApp Web tab per message,
+# 'browser_session' reuses one WhatsApp Web tab, 'fake' sends nowhere (benchmarks/development)
+SEND_TRANSPORT = os.environ.get("WHATSAPP_TRANSPORT", "pywhatkit")
+# Number of parallel sender sessions/accounts (one worker each, each browser_session with its own
+# profile); pywhatkit drives the desktop's browser, so it allows only one
+SEND_WORKERS = int(os.environ.get("WHATSAPP_SEND_WORKERS", "1"))
+# Maximum number of messages waiting in the send pipeline
+SEND_QUEUE_SIZE = 1000
+# Upper bound of the adaptive send rate per worker (messages/second)
+SEND_MAX_RATE = float(os.environ.get("WHATSAPP_SEND_MAX_RATE", "1.0"))
+# Sends tried per message before a transient failure goes to the dead-letter queue,
+# and the backoff between them (doubling from the base delay, jittered, capped)
+RETRY_MAX_ATTEMPTS = int(os.environ.get("WHATSAPP_RETRY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_DELAY = float(os.environ.get("WHATSAPP_RETRY_BASE_DELAY", "30"))
+RETRY_MAX_DELAY = float(os.environ.get("WHATSAPP_RETRY_MAX_DELAY", "3600"))
+# How long a job claimed for sending stays reserved for its claimant if it is not sent
+SEND_LEASE_SECONDS = float(os.environ.get("WHATSAPP_SEND_LEASE_SECONDS", "3600"))
+# Number of separate sender processes (sender_worker.py, one session each) fed through a broker
+# database; 0 sends from this process instead, with WHATSAPP_SEND_WORKERS threads
+SENDER_PROCESSES = int(os.environ.get("WHATSAPP_SENDER_PROCESSES", "0"))
+# Broker database shared with the sender processes (recipient shards, reported outcomes, send ledger)
+BROKER_DB_FILE = os.environ.get("WHATSAPP_BROKER_DB", "whatsapp_broker.db")
+# Recipients a sender process leases at a time
+SENDER_SHARD_SIZE = int(os.environ.get("WHATSAPP_SENDER_SHARD_SIZE", "20"))
+# Seconds without a heartbeat after which a sender process's shard is handed to another one
+SENDER_LEASE_SECONDS = float(os.environ.get("WHATSAPP_SENDER_LEASE_SECONDS", "30"))
+
+# Job status updates are buffered and written together once this many are
+# waiting or the oldest has waited this many seconds (0 writes them at once)
+STATUS_FLUSH_MAX = int(os.environ.get("WHATSAPP_STATUS_FLUSH_MAX", "500"))
+STATUS_FLUSH_INTERVAL = float(os.environ.get("WHATSAPP_STATUS_FLUSH_INTERVAL", "1.0"))
+
+# Recipients stored per write while a submitted campaign is registered in the background
+REGISTRATION_BATCH_SIZE = int(os.environ.get("WHATSAPP_REGISTRATION_BATCH_SIZE", "5000"))
+
+# Largest page the paginated list endpoints will return
+MAX_PAGE_SIZE = 1000
+
+# Only campaigns due within this many seconds are registered with the dispatcher;
+# a rolling loader pulls later campaigns in as time advances
+SCHEDULER_HORIZON = float(os.environ.get("WHATSAPP_SCHEDULER_HORIZON", "3600"))
+# Campaigns found this many seconds past due at startup are marked as missed; later ones are re-slotted
+MAX_SEND_DELAY = float(os.environ.get("WHATSAPP_MAX_SEND_DELAY", "86400"))
+# Scheduled campaigns are released in slots of this many seconds, sized to the senders' capacity
+SEND_SLOT_SECONDS = float(os.environ.get("WHATSAPP_SEND_SLOT_SECONDS", "10"))
+# Daily quiet hours (e.g. "21:00-08:00") during which no scheduled message is sent
+QUIET_HOURS = DailyWindow.parse(os.environ["WHATSAPP_QUIET_HOURS"]) if os.environ.get("WHATSAPP_QUIET_HOURS") else None
+
+# Initialize scheduler (runs the rolling loader; campaigns themselves are timed by the dispatcher)
 scheduler = BackgroundScheduler(daemon=True)
 
+# Initialize contact index and persistent job store
+if STORAGE_BACKEND == 'sqlite':
+    database = SqliteDatabase(SQLITE_DB_FILE)
+    contact_store = SqliteContactStore(database)
+    attribute_store = SqliteContactAttributeStore(database)
+    job_store = SqliteJobStore(database)
+    send_history = None
+    dead_letters = SqliteDeadLetterQueue(database)
+    ledger = SqliteSendLedger(database, lease_seconds=SEND_LEASE_SECONDS)
+else:
+    database = None
+    contact_store = ContactStore(NUMBERS_FILE)
+    attribute_store = ContactAttributeStore(CONTACT_ATTRIBUTES_FILE)
+    job_store = JobStore(SCHEDULED_JOBS_JOURNAL, legacy_path=SCHEDULED_JOBS_FILE)
+    send_history = SendHistoryLog(SEND_HISTORY_DIR, legacy_path=PYWHATKIT_LOG_FILE,
+                                  max_segment_bytes=SEND_HISTORY_SEGMENT_BYTES)
+    dead_letters = DeadLetterQueue(DEAD_LETTERS_FILE)
+    ledger = SendLedger(SEND_LEDGER_FILE, lease_seconds=SEND_LEASE_SECONDS)
+
+if SENDER_PROCESSES:
+    # The sender processes record their attempts in the ledger of the broker database
+    broker = SqliteBroker(BROKER_DB_FILE, lease_seconds=SENDER_LEASE_SECONDS)
+    ledger = broker.ledger(lease_seconds=SEND_LEASE_SECONDS)
+else:
+    broker = None
+
+# Initialize the state manager: one writer thread applies every change to the stores
+# and, once a confirmed send's status is stored, settles it in the ledger
+state_manager = StateManager(job_store, flush_interval=STATUS_FLUSH_INTERVAL, flush_max=STATUS_FLUSH_MAX,
+                             on_flush=lambda job_ids: ledger.settle(job_ids))
+
+# Initialize send pipeline: one worker (and transport) per sender session/account, either
+# threads in this process or sender processes pulling shards of recipients from the broker
+if broker is not None:
+    send_pipeline = BrokerPipeline(
+        broker,
+        lambda name: SEND_CALLBACKS[name],
+        workers=WorkerPool(SENDER_PROCESSES, BROKER_DB_FILE, SEND_TRANSPORT, max_rate=SEND_MAX_RATE,
+                           lease_seconds=SENDER_LEASE_SECONDS, quiet_hours=QUIET_HOURS),
+        max_queued=SEND_QUEUE_SIZE,
+        shard_size=SENDER_SHARD_SIZE,
+        defer=lambda task: _defer_send(task)
+    )
+else:
+    send_pipeline = SendPipeline(
+        create_transports(SEND_TRANSPORT, SEND_WORKERS),
+        max_queued=SEND_QUEUE_SIZE,
+        pacer_options={'max_rate': SEND_MAX_RATE},
+        ledger=ledger,
+        quiet_hours=QUIET_HOURS,
+        defer=lambda task: _defer_send(task)
+    )
+metrics.QUEUE_DEPTH.labels('in_flight').set_function(lambda: ledger.count())
+
+# Initialize progress broadcaster: every /api/progress stream reads from this one instance
+progress = ProgressBroadcaster()
+
 # --- Utility Functions for Number Management ---
-def load_numbers(filename=NUMBERS_FILE):
-    """Loads WhatsApp numbers from a text file."""
-    numbers = []
-    if os.path.exists(filename):
-        with open(filename, "r") as f:
-            for line in f:
-                number = line.strip()
-                if number:
-                    numbers.append(number)
-    return sorted(list(set(numbers)))
-
-def save_numbers(numbers, filename=NUMBERS_FILE):
-    """Saves WhatsApp numbers to a text file."""
-    with open(filename, "w") as f:
-        for number in sorted(list(set(numbers))):
-            f.write(number + "\n")
+def load_numbers():
+    """Returns the sorted list of WhatsApp numbers from the contact index."""
+    return contact_store.all()
+
+def save_numbers(numbers):
+    """Replaces all WhatsApp numbers and rewrites the numbers file."""
+    state_manager.call(contact_store.replace_all, numbers)
 
 # --- Utility Functions for Scheduled Jobs Persistence ---
 def load_scheduled_jobs():
-    """Loads scheduled jobs from a JSON file."""
-    if os.path.exists(SCHEDULED_JOBS_FILE):
-        with open(SCHEDULED_JOBS_FILE, "r") as f:
-            try:
-                jobs_data = json.load(f)
-                # Convert string timestamps back to datetime objects
-                for job in jobs_data:
-                    if 'send_time' in job and isinstance(job['send_time'], str):
-                        job['send_time'] = datetime.fromisoformat(job['send_time'])
-                return jobs_data
-            except json.JSONDecodeError:
-                return []
-    return []
+    """Loads scheduled jobs from the job journal."""
+    return job_store.all()
 
 def save_scheduled_jobs(jobs):
-    """Saves scheduled jobs to a JSON file."""
-    # Convert datetime objects to ISO format strings for JSON serialization
-    jobs_data_to_save = []
-    for job in jobs:
-        job_copy = job.copy()
-        if 'send_time' in job_copy and isinstance(job_copy['send_time'], datetime):
-            job_copy['send_time'] = job_copy['send_time'].isoformat()
-        jobs_data_to_save.append(job_copy)
-    
-    with open(SCHEDULED_JOBS_FILE, "w") as f:
-        json.dump(jobs_data_to_save, f, indent=4)
+    """Replaces all scheduled jobs and compacts the job journal."""
+    state_manager.call(job_store.replace_all, jobs)
 
-def add_job_to_persistence(job_data):
-    """Adds a new job to the persistent storage."""
-    jobs = load_scheduled_jobs()
-    jobs.append(job_data)
-    save_scheduled_jobs(jobs)
+def add_campaign_to_persistence(campaign, numbers):
+    """Adds a campaign and one pending job per recipient to the persistent storage."""
+    return state_manager.call(job_store.add_campaign, campaign, numbers)
 
 def remove_job_from_persistence(job_id):
     """Removes a job from the persistent storage."""
-    jobs = load_scheduled_jobs()
-    jobs = [job for job in jobs if job['id'] != job_id]
-    save_scheduled_jobs(jobs)
+    state_manager.call(job_store.remove, job_id)
 
 def update_job_status_in_persistence(job_id, status):
-    """Updates the status of a job in persistent storage."""
-    jobs = load_scheduled_jobs()
-    for job in jobs:
-        if job['id'] == job_id:
-            job['status'] = status
-            break
-    save_scheduled_jobs(jobs)
+    """Buffers a job status update; buffered updates are flushed together by the writer thread."""
+    return state_manager.update_status(job_id, status)
+
+def update_campaign_status_in_persistence(campaign_id, status):
+    """Updates the status of a campaign in persistent storage."""
+    return state_manager.call(job_store.update_campaign_status, campaign_id, status)
+
+def record_send_history(task, error):
+    """Adds a send attempt to the send history (the SQLite table, or the rotating send history log)."""
+    sent_at = datetime.now()
+    if database is not None:
+        database.add_send_history([{
+            'sent_at': sent_at,
+            'number': task.number,
+            'message': task.message,
+            'status': 'sent' if error is None else f'failed: {str(error)}',
+            'job_id': task.job_id,
+            'campaign_id': task.campaign_id
+        }])
+        return
+    send_history.append({
+        'sent_at': sent_at,
+        'number': task.number,
+        'campaign_id': task.campaign_id,
+        'job_id': task.job_id,
+        'status': 'sent' if error is None else 'failed',
+        'error': None if error is None else str(error),
+        'attempt': task.attempts,
+        'latency': task.latency,
+        # Seconds between the scheduled send time and the actual send
+        'lag': None if task.planned_at is None else round(sent_at.timestamp() - task.planned_at, 3),
+        'message': task.message
+    })
+
+def query_send_history(number=None, campaign_id=None, start=None, end=None, limit=100):
+    """Returns the most recent send attempts matching the filters, newest first, as JSON-ready dicts."""
+    if database is not None:
+        entries = database.send_history(number, limit, campaign_id=campaign_id, start=start, end=end)
+        return [dict(entry, sent_at=entry['sent_at'].isoformat()) for entry in entries]
+    return send_history.query(number=number, campaign_id=campaign_id, start=start, end=end, limit=limit)
 
 # --- Message Sending Job Function (Called by Scheduler) ---
-def send_whatsapp_job(job_id, phone_number, subject, body):
-    """
-    Function executed by APScheduler to send a WhatsApp message.
-    Updates the job status in persistent storage after attempting to send.
-    """
+def build_message(subject, body):
+    """Builds the full message text from subject and body."""
     full_message = ""
     if subject:
         full_message += f"Subject: {subject}\n\n"
     full_message += body
+    return full_message
 
-    print(f"[SCHEDULED SENDER] Attempting to send message (Job ID: {job_id}) to {phone_number}...")
-    try:
-        # pywhatkit.sendwhatmsg_instantly directly opens browser without waiting for specific time within minute
-        pywhatkit.sendwhatmsg_instantly(phone_number, full_message, wait_time=20, tab_close=True)
-        print(f"[SCHEDULED SENDER] Message (Job ID: {job_id}) sent successfully to {phone_number}.")
-        update_job_status_in_persistence(job_id, 'sent')
-    except Exception as e:
-        print(f"[SCHEDULED SENDER ERROR] Failed to send message (Job ID: {job_id}) to {phone_number}: {e}")
+def compile_message(subject, body):
+    """
+    Compiles subject and body into a message template, once per campaign.
+    Raises TemplateError if a placeholder is malformed.
+    """
+    return compile_template(build_message(subject, body))
+
+_RENDER_SECONDS = metrics.STAGE_SECONDS.labels('render')
+
+def render_message(template, number):
+    """Renders a compiled message template with the recipient's personalization fields."""
+    with _RENDER_SECONDS.time():
+        if template.is_static:
+            return template.render()
+        return template.render(attribute_store.get(number), number)
+
+def _on_scheduled_send_done(task, error):
+    """
+    Send pipeline callback: records the outcome of a scheduled message. A
+    transient failure leaves the job pending while it waits for a retry.
+    """
+    record_send_history(task, error)
+    if error is not None:
+        campaign = job_store.get_campaign(task.campaign_id) or {}
+        window = DailyWindow.parse(campaign['send_window']) if campaign.get('send_window') else None
+        if retries.handle_failure(task, error, window) == 'retry':
+            print(f"[SCHEDULED SENDER] Attempt {task.attempts} for job {task.job_id} to {task.number} failed: {error}. "
+                  f"Retrying later.")
+            return
+    if isinstance(error, SendInterruptedError):
+        # May have been delivered: an operator decides whether to re-drive it
+        _dead_letter(task, error)
+    progress.record(task.campaign_id, task.number, error, job_id=task.job_id)
+    if error is None:
+        print(f"[SCHEDULED SENDER] Message (Job ID: {task.job_id}) sent successfully to {task.number}.")
+        update_job_status_in_persistence(task.job_id, 'sent')
+    else:
+        print(f"[SCHEDULED SENDER ERROR] Failed to send message (Job ID: {task.job_id}) to {task.number}: {error}")
         print("[SCHEDULED SENDER ERROR] Please ensure WhatsApp Web is logged in.")
-        update_job_status_in_persistence(job_id, f'failed: {str(e)}')
-    finally:
-        # Optionally, remove job from scheduler's active jobs after completion/failure
-        # If the job is one-off ('date' trigger), APScheduler automatically removes it after execution.
-        pass
+        update_job_status_in_persistence(task.job_id, f'failed: {str(error)}')
+
+def send_whatsapp_job(job_id, phone_number, subject, body, campaign_id=None, template=None, send_time=None,
+                      window=None):
+    """
+    Queues a scheduled WhatsApp message on the send pipeline.
+    The message is rendered from the campaign's compiled template (compiled
+    here if not given) with the recipient's personalization fields.
+    The job status is updated in persistent storage once the send is attempted.
+    send_time, the time the message was scheduled for, feeds the scheduler lag metric;
+    window is the campaign's send window, checked again when a sender takes the message up.
+    Never blocks: returns False if the pipeline is full.
+    """
+    if template is None:
+        template = compile_message(subject, body)
+    print(f"[SCHEDULED SENDER] Queueing message (Job ID: {job_id}) to {phone_number}...")
+    return send_pipeline.submit(SendTask(campaign_id or job_id, job_id, phone_number,
+                                         render_message(template, phone_number), _on_scheduled_send_done,
+                                         planned_at=send_time.timestamp() if send_time else None, window=window),
+                                timeout=0)
+
+def _defer_send(task):
+    """
+    Send pipeline hook for a scheduled message a sender took up outside its
+    send window or inside the quiet hours: it goes back on the dispatcher,
+    like a retry that does not count as an attempt, for the next allowed time.
+    """
+    print(f"[SCHEDULED SENDER] Holding job {task.job_id} to {task.number} until it may be sent.")
+    retries.schedule(task, datetime.now(), task.window)
+
+# Campaigns being released slot by slot: campaign id -> {'campaign', 'template', 'window', 'jobs', 'position'}
+_dispatching = {}
+
+def _start_campaign(campaign_id):
+    """Loads a campaign's pending recipients when its first slot comes up. Returns its dispatch state, or None."""
+    campaign = job_store.get_campaign(campaign_id)
+    if campaign is None:
+        print(f"[SCHEDULED SENDER] Campaign {campaign_id} no longer exists. Skipping.")
+        return None
+
+    try:
+        template = compile_message(campaign['subject'], campaign['body'])
+    except TemplateError as e:
+        # Only campaigns scheduled before templates were validated can get here
+        print(f"[SCHEDULED SENDER ERROR] Campaign {campaign_id} has an invalid message template: {e}")
+        state_manager.call(job_store.close_campaigns, [campaign_id], 'failed', f'failed: invalid template: {e}')
+        return None
+
+    pending_jobs = job_store.campaign_jobs(campaign_id, status='pending')
+    print(f"[SCHEDULED SENDER] Starting campaign {campaign_id} with {len(pending_jobs)} pending recipient(s)...")
+    update_campaign_status_in_persistence(campaign_id, 'running')
+    progress.campaign_started(campaign_id, len(pending_jobs), kind='scheduled')
+    window = DailyWindow.parse(campaign['send_window']) if campaign.get('send_window') else None
+    state = _dispatching[campaign_id] = {'campaign': campaign, 'template': template, 'window': window,
+                                         'jobs': pending_jobs, 'position': 0}
+    return state
+
+def send_campaign_slot(campaign_id, limit, slot_time):
+    """
+    Dispatcher callback: queues up to limit of the campaign's pending
+    recipients on the send pipeline, planned one sender interval apart from
+    slot_time. The recipients are claimed in the send ledger first, with one
+    write, and any already claimed or sent elsewhere are skipped. Recipients
+    the pipeline has no room for are unclaimed and wait for the next slot.
+    Returns (released, finished); once every recipient has been queued, the
+    campaign is marked completed when the pipeline has sent them.
+    """
+    state = _dispatching.get(campaign_id) or _start_campaign(campaign_id)
+    if state is None:
+        return 0, True
+    campaign, jobs = state['campaign'], state['jobs']
+    interval = 1.0 / dispatcher.rate if dispatcher.rate else 0.0
+    position = state['position']
+    candidates = []
+    while position < len(jobs) and len(candidates) < limit:
+        job = jobs[position]
+        position += 1
+        # Re-check so recipients cancelled or moved to another campaign meanwhile are skipped
+        current = job_store.get(job['id'])
+        if current is None or current['status'] != 'pending' or current.get('campaign_id') != campaign_id:
+            continue
+        candidates.append((position - 1, job))
+    claimed = set(ledger.claim([job['id'] for _, job in candidates]))
+    released = 0
+    for index, (job_position, job) in enumerate(candidates):
+        if job['id'] not in claimed:
+            print(f"[SCHEDULED SENDER] Job {job['id']} is already claimed or sent. Skipping.")
+            continue
+        if not send_whatsapp_job(job['id'], job['number'], campaign['subject'], campaign['body'],
+                                 campaign_id=campaign_id, template=state['template'],
+                                 send_time=slot_time + timedelta(seconds=released * interval),
+                                 window=state['window']):
+            # The pipeline is full: this and the rest of the candidates go out in a later slot
+            ledger.forget([other['id'] for _, other in candidates[index:] if other['id'] in claimed])
+            state['position'] = job_position
+            return released, False
+        released += 1
+    state['position'] = position
+    if position < len(jobs):
+        return released, False
+    _dispatching.pop(campaign_id, None)
+    threading.Thread(target=_finish_campaign, args=(campaign_id,), name='campaign-finish', daemon=True).start()
+    return released, True
+
+def _complete_if_running(campaign_id):
+    """
+    Marks a running campaign completed, leaving any other status (cancelled,
+    failed) alone. Runs on the writer thread, so a cancellation cannot land
+    between the check and the write. Returns the campaign's status, or None.
+    """
+    campaign = job_store.get_campaign(campaign_id)
+    if campaign is None:
+        return None
+    if campaign['status'] == 'running':
+        job_store.update_campaign_status(campaign_id, 'completed')
+        return 'completed'
+    return campaign['status']
+
+def _finish_campaign(campaign_id):
+    wait_for_sends(campaign_id)
+    status = state_manager.call(_complete_if_running, campaign_id) or 'completed'
+    progress.campaign_finished(campaign_id, status)
+    print(f"[SCHEDULED SENDER] Campaign {campaign_id} finished ({status}).")
+
+# Initialize dispatcher: releases due campaigns in send slots sized to the rate the senders are
+# measured to deliver (at most their combined rate cap), and holds back while the pipeline is backed up
+dispatcher = Dispatcher(
+    send_campaign_slot,
+    capacity=(SENDER_PROCESSES or SEND_WORKERS) * SEND_MAX_RATE,
+    slot_seconds=SEND_SLOT_SECONDS,
+    quiet_hours=QUIET_HOURS,
+    throughput=lambda: send_pipeline.throughput(),
+    backlog=lambda: send_pipeline.queue_depth()
+)
+metrics.QUEUE_DEPTH.labels('dispatcher').set_function(dispatcher.pending_count)
+
+# --- Retries and Dead Letters ---
+def _resubmit_retry(task, slot_time):
+    """
+    Puts a task due for retry back on the send pipeline, unless its job was
+    cancelled meanwhile (False). Never blocks: None if the pipeline is full.
+    """
+    if task.job_id is not None:
+        current = job_store.get(task.job_id)
+        if current is None or current['status'] != 'pending':
+            return False
+    task.planned_at = slot_time.timestamp()
+    return True if send_pipeline.submit(task, timeout=0) else None
+
+def _dead_letter(task, error):
+    """Stores a message that failed every retry for re-driving later."""
+    dead_letters.add(task.number, task.message, error, task.attempts, job_id=task.job_id,
+                     campaign_id=task.campaign_id)
+    print(f"[RETRY] Giving up on {task.number} after {task.attempts} attempt(s); moved to the dead-letter queue.")
+
+# Initialize retry engine: transient failures wait on the dispatcher, exhausted ones go to the dead-letter queue
+retries = RetryEngine(
+    dispatcher,
+    _resubmit_retry,
+    _dead_letter,
+    policy=RetryPolicy(max_attempts=RETRY_MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY)
+)
+metrics.QUEUE_DEPTH.labels('retry').set_function(retries.waiting_count)
+metrics.QUEUE_DEPTH.labels('dead_letter').set_function(dead_letters.count)
+
+def redrive_dead_letters(entry_ids=None, campaign_id=None):
+    """
+    Sends dead-lettered messages again: the given entries, a campaign's or
+    all of them. They leave the queue with one write, their jobs go back to
+    pending and they are released through the dispatcher like retries, so
+    they share send slots with everything else. A completed campaign runs
+    again until they are done; a cancelled or failed one keeps its status,
+    and one still to be released (or being released) is finished by its own
+    dispatch. Returns how many were re-driven.
+    """
+    entries = dead_letters.take(entry_ids, campaign_id)
+    job_ids = [entry['job_id'] for entry in entries if entry['job_id']]
+    if job_ids:
+        state_manager.call(job_store.update_status_many, job_ids, 'pending')
+    by_campaign = {}
+    for entry in entries:
+        by_campaign.setdefault(entry['campaign_id'], []).append(entry)
+    now = datetime.now()
+    for group_campaign_id, group in by_campaign.items():
+        campaign = job_store.get_campaign(group_campaign_id)
+        window = None
+        if campaign is not None:
+            window = DailyWindow.parse(campaign['send_window']) if campaign.get('send_window') else None
+            if campaign['status'] == 'completed':
+                update_campaign_status_in_persistence(group_campaign_id, 'running')
+        progress.campaign_started(group_campaign_id, len(group), kind='redrive')
+        for entry in group:
+            callback = _on_scheduled_send_done if entry['job_id'] else _on_immediate_send_done
+            retries.schedule(SendTask(group_campaign_id, entry['job_id'], entry['number'], entry['message'], callback),
+                             now, window)
+        undispatched = campaign is not None and campaign['status'] in ('registering', 'pending')
+        if undispatched or group_campaign_id in _dispatching or dispatcher.scheduled(group_campaign_id) is not None:
+            # Its dispatch marks it completed once its last slot is sent, re-driven messages included
+            continue
+        threading.Thread(target=_finish_campaign, args=(group_campaign_id,), name='campaign-finish',
+                         daemon=True).start()
+    return len(entries)
+
+def wait_for_sends(campaign_id):
+    """Blocks until every message of the campaign has been sent or given up on, including retries."""
+    while True:
+        send_pipeline.wait_campaign(campaign_id)
+        # A failed send schedules its retry before the pipeline stops counting it, so nothing slips between
+        if not retries.waiting(campaign_id):
+            return
+        retries.wait_campaign(campaign_id)
+
+# End of the window of campaigns registered with the scheduler (None until rehydration has run)
+_scheduled_until = None
+_horizon_lock = threading.Lock()
+
+def schedule_campaign(campaign):
+    """
+    Hands a campaign to the dispatcher, which releases it slot by slot from
+    its send time on. Campaigns beyond the loaded horizon are left to the
+    rolling loader.
+    """
+    with _horizon_lock:
+        if _scheduled_until is None or campaign['send_time'] > _scheduled_until:
+            dispatcher.cancel(campaign['id'])
+            return
+        _register_campaign(campaign)
+
+def _register_campaign(campaign):
+    window = DailyWindow.parse(campaign['send_window']) if campaign.get('send_window') else None
+    dispatcher.schedule(campaign['id'], campaign['send_time'], window)
+
+# --- Background Campaign Registration ---
+def _add_jobs_if_registering(campaign_id, numbers):
+    """
+    Stores a batch of recipients unless the campaign was cancelled or removed.
+    Runs on the writer thread, so no cancellation can land between the check and the write.
+    """
+    campaign = job_store.get_campaign(campaign_id)
+    if campaign is None or campaign['status'] != 'registering':
+        return 0
+    return job_store.add_jobs(campaign_id, numbers)
+
+def _mark_registered(campaign_id):
+    """Moves a fully registered campaign to 'pending'. Returns the campaign, or None if it was cancelled meanwhile."""
+    campaign = job_store.get_campaign(campaign_id)
+    if campaign is None or campaign['status'] != 'registering':
+        return None
+    job_store.update_campaign_status(campaign_id, 'pending')
+    campaign['status'] = 'pending'
+    return campaign
+
+def _on_campaign_registered(campaign_id):
+    """Registrar callback: hands the campaign to the scheduler once every recipient is stored."""
+    campaign = state_manager.call(_mark_registered, campaign_id)
+    if campaign is None:
+        return
+    # A registration that outlasted the send time starts right away instead of being missed
+    schedule_campaign(dict(campaign, send_time=max(campaign['send_time'], datetime.now())))
+    print(f"[REGISTRAR] Campaign {campaign_id} registered.")
+
+def _on_campaign_registration_failed(campaign_id, error):
+    state_manager.call(job_store.close_campaigns, [campaign_id], 'failed', f'failed: registration error ({error})')
+
+# Initialize campaign registrar: stores the recipients of submitted campaigns in batches, off the request path
+registrar = CampaignRegistrar(
+    page_numbers=lambda limit, cursor: contact_store.page(limit, cursor)[:2],
+    add_jobs=lambda campaign_id, numbers: state_manager.call(_add_jobs_if_registering, campaign_id, numbers),
+    on_registered=_on_campaign_registered,
+    on_failed=_on_campaign_registration_failed,
+    batch_size=REGISTRATION_BATCH_SIZE
+)
+metrics.QUEUE_DEPTH.labels('registration').set_function(registrar.pending_count)
+
+def _resume_registrations():
+    """Requeues campaigns whose registration was interrupted, continuing after the last stored number."""
+    for campaign in job_store.campaigns():
+        if campaign['status'] != 'registering':
+            continue
+        numbers = [job['number'] for job in job_store.campaign_jobs(campaign['id'])]
+        registrar.submit(campaign['id'], contact_store.count(), cursor=max(numbers) if numbers else None,
+                         registered=len(numbers))
+        print(f"[REGISTRAR] Resuming registration of campaign {campaign['id']} after {len(numbers)} recipient(s).")
+
+# --- Response Helpers ---
+def _conditional_json(etag, build_payload):
+    """Answers 304 if the client already holds this ETag, otherwise the JSON from build_payload()."""
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build_payload())
+    response.set_etag(etag)
+    # Let browsers cache the response but always revalidate it with If-None-Match
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _page_limit():
+    """Parses the 'limit' query argument. Returns None if absent; raises ValueError if invalid."""
+    limit = request.args.get('limit')
+    if limit is None:
+        return None
+    limit = int(limit)
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
 
 # --- Flask Routes ---
 @app.route('/')
@@ -124,11 +594,29 @@ def index():
 
 @app.route('/api/numbers', methods=['GET', 'POST'])
 def handle_numbers():
-    """API endpoint for managing customer numbers (GET and POST)."""
-    current_numbers = load_numbers()
-
+    """
+    API endpoint for managing customer numbers (GET and POST).
+    GET supports cursor pagination (?limit=&cursor=), prefix search (?prefix=)
+    and conditional requests via ETag/If-None-Match. Without any of these
+    arguments it returns the whole list.
+    """
     if request.method == 'GET':
-        return jsonify({'numbers': current_numbers})
+        try:
+            limit = _page_limit()
+        except ValueError as e:
+            return jsonify({'message': f'Invalid limit: {e}'}), 400
+        # Unencoded "+" arrives as a space, so clean cursor and prefix like numbers
+        cursor = normalize_prefix(request.args.get('cursor', '')) or None
+        prefix = normalize_prefix(request.args.get('prefix', '')) or None
+
+        def build_payload():
+            if limit is None and cursor is None and prefix is None:
+                numbers = load_numbers()
+                return {'numbers': numbers, 'total': len(numbers), 'next_cursor': None}
+            numbers, next_cursor, matched = contact_store.page(limit or MAX_PAGE_SIZE, cursor, prefix)
+            return {'numbers': numbers, 'total': matched, 'next_cursor': next_cursor}
+
+        return _conditional_json(contact_store.etag(), build_payload)
     elif request.method == 'POST':
         data = request.json
         new_number = data.get('number', '').strip()
@@ -136,45 +624,82 @@ def handle_numbers():
         if not new_number:
             return jsonify({'message': 'Number cannot be empty.'}), 400
 
-        cleaned_number = new_number.replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
-        if not cleaned_number.startswith('+') or not cleaned_number[1:].isdigit() or len(cleaned_number) < 6:
+        cleaned_number = normalize_number(new_number)
+        if cleaned_number is None:
             return jsonify({'message': 'Invalid number format. Must start with "+" and be followed by digits (e.g., +254712345678).'}), 400
 
-        if cleaned_number in current_numbers:
+        attributes = data.get('attributes') or {}
+        if not isinstance(attributes, dict):
+            return jsonify({'message': 'Attributes must be an object of field names to values.'}), 400
+
+        if not state_manager.call(contact_store.add, cleaned_number):
+            if attributes:
+                # Existing number: just update its personalization fields
+                state_manager.call(attribute_store.set_many, {cleaned_number: attributes})
+                return jsonify({'message': f'Attributes of {cleaned_number} updated.', 'total': contact_store.count()}), 200
             return jsonify({'message': f'Number {cleaned_number} already exists.'}), 409
+        if attributes:
+            state_manager.call(attribute_store.set_many, {cleaned_number: attributes})
+
+        return jsonify({'message': f'Number {cleaned_number} added successfully!', 'total': contact_store.count()}), 201
+
+@app.route('/api/numbers/import', methods=['POST'])
+def import_numbers_api():
+    """API endpoint for bulk-importing numbers from an uploaded CSV/TXT or XLSX file."""
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'message': 'Please upload a .csv, .txt or .xlsx file in the "file" field.'}), 400
+
+    try:
+        summary = import_contacts(upload.stream, upload.filename, contact_store, column=request.form.get('column'),
+                                  attribute_store=attribute_store)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'message': f'Failed to import numbers: {e}'}), 500
 
-        current_numbers.append(cleaned_number)
-        save_numbers(current_numbers)
-        return jsonify({'message': f'Number {cleaned_number} added successfully!', 'numbers': load_numbers()}), 201
+    summary['message'] = (f"Imported {summary['added']} new number(s) from {summary['rows']} row(s): "
+                          f"{summary['duplicates']} duplicate(s), {summary['rejected']} rejected.")
+    summary['total'] = contact_store.count()
+    return jsonify(summary), 200
 
 @app.route('/api/numbers/<string:number_to_delete>', methods=['DELETE'])
 def delete_number(number_to_delete):
     """API endpoint for deleting a customer number."""
-    current_numbers = load_numbers()
-    if number_to_delete in current_numbers:
-        current_numbers.remove(number_to_delete)
-        save_numbers(current_numbers)
-        return jsonify({'message': f'Number {number_to_delete} deleted successfully!', 'numbers': load_numbers()}), 200
+    if state_manager.call(contact_store.remove, number_to_delete):
+        state_manager.call(attribute_store.remove, number_to_delete)
+        return jsonify({'message': f'Number {number_to_delete} deleted successfully!', 'total': contact_store.count()}), 200
     else:
         return jsonify({'message': f'Number {number_to_delete} not found.'}), 404
 
 @app.route('/api/schedule_message', methods=['POST'])
 def schedule_message_api():
-    """API endpoint to schedule a message or send immediately."""
+    """
+    API endpoint to schedule a message or send immediately. Returns 202 with
+    the campaign id straight away; recipients are registered (or queued for
+    sending) in the background, so the request does not grow with the
+    contact list. Progress is at GET /api/campaigns/<campaign_id>.
+    """
     data = request.json
     subject = data.get('subject', '').strip()
     body = data.get('body', '').strip()
     scheduled_date_str = data.get('scheduled_date', '').strip()
     scheduled_time_str = data.get('scheduled_time', '').strip()
+    send_window_str = str(data.get('send_window') or '').strip()
     
-    customer_numbers = load_numbers()
+    total = contact_store.count()
 
-    if not customer_numbers:
+    if not total:
         return jsonify({'message': 'No customer numbers available to send messages to. Please add some first.'}), 400
     if not subject:
         return jsonify({'message': 'Message subject cannot be empty.'}), 400
     if not body:
         return jsonify({'message': 'Message body cannot be empty.'}), 400
+    try:
+        # Validate placeholders up front; campaigns store only the template, rendering happens per send
+        template = compile_message(subject, body)
+    except TemplateError as e:
+        return jsonify({'message': f'Invalid message template: {e}'}), 400
 
     if scheduled_date_str and scheduled_time_str:
         # Schedule for future
@@ -186,24 +711,29 @@ def schedule_message_api():
             if scheduled_datetime <= datetime.now():
                 return jsonify({'message': 'Scheduled time must be in the future.'}), 400
 
-            for number in customer_numbers:
-                job_id = str(uuid.uuid4())
-                scheduler.add_job(
-                    send_whatsapp_job, 
-                    trigger=DateTrigger(run_date=scheduled_datetime),
-                    args=[job_id, number, subject, body], 
-                    id=job_id,
-                    misfire_grace_time=60 # seconds
-                )
-                add_job_to_persistence({
-                    'id': job_id,
-                    'number': number,
-                    'subject': subject,
-                    'body': body,
-                    'send_time': scheduled_datetime,
-                    'status': 'pending'
-                })
-            return jsonify({'message': 'Messages scheduled successfully!', 'type': 'scheduled'}), 200
+            # Optional daily window (e.g. "09:00-17:00") the campaign may send in
+            try:
+                send_window = DailyWindow.parse(send_window_str) if send_window_str else None
+            except ValueError as e:
+                return jsonify({'message': f'Invalid send window: {e}'}), 400
+            if next_send_time(scheduled_datetime, send_window, QUIET_HOURS) is None:
+                return jsonify({'message': f'Send window {send_window} lies entirely within the quiet hours {QUIET_HOURS}.'}), 400
+
+            # The campaign is scheduled once the registrar has stored all of its recipients
+            campaign = {
+                'id': str(uuid.uuid4()),
+                'subject': subject,
+                'body': body,
+                'send_time': scheduled_datetime,
+                'status': 'registering'
+            }
+            if send_window is not None:
+                campaign['send_window'] = str(send_window)
+            add_campaign_to_persistence(campaign, [])
+            registrar.submit(campaign['id'], total)
+            return jsonify({'message': f'Scheduling messages to {total} recipient(s)...', 'type': 'scheduled',
+                            'campaign_id': campaign['id'], 'total': total,
+                            'status_url': url_for('campaign_status_api', campaign_id=campaign['id'])}), 202
         except ValueError as e:
             return jsonify({'message': f'Invalid date or time format: {e}'}), 400
         except Exception as e:
@@ -211,72 +741,417 @@ def schedule_message_api():
     else:
         # Send immediately
         # Use a new thread for immediate sending to avoid blocking the API response
-        send_thread = threading.Thread(target=_send_messages_immediately, args=(customer_numbers, subject, body))
+        batch_id = f"immediate-{uuid.uuid4()}"
+        send_thread = threading.Thread(target=_send_messages_immediately,
+                                       args=(total, subject, body, template, batch_id))
         send_thread.start()
-        return jsonify({'message': 'Immediate message sending initiated. Please monitor your browser.', 'type': 'immediate'}), 200
+        return jsonify({'message': 'Immediate message sending initiated. Progress is shown below.',
+                        'type': 'immediate', 'campaign_id': batch_id, 'total': total}), 202
+
+def _on_immediate_send_done(task, error):
+    """Send pipeline callback for messages sent immediately."""
+    record_send_history(task, error)
+    if error is not None and retries.handle_failure(task, error) == 'retry':
+        print(f"[IMMEDIATE SENDER] Attempt {task.attempts} to {task.number} failed: {error}. Retrying later.")
+        return
+    if isinstance(error, SendInterruptedError):
+        _dead_letter(task, error)
+    progress.record(task.campaign_id, task.number, error)
+    if error is None:
+        print(f"[IMMEDIATE SENDER] Message sent to {task.number}.")
+    else:
+        print(f"[IMMEDIATE SENDER ERROR] Failed to send message to {task.number}: {error}")
 
-def _send_messages_immediately(customer_numbers, subject, body):
-    """Helper function to send messages immediately in a separate thread."""
-    full_message = ""
-    if subject:
-        full_message += f"Subject: {subject}\n\n"
-    full_message += body
-    
-    for number in customer_numbers:
-        try:
-            pywhatkit.sendwhatmsg_instantly(number, full_message, wait_time=20, tab_close=True)
-            print(f"[IMMEDIATE SENDER] Message sent to {number}.")
-            time.sleep(5) # Small delay between messages
-        except Exception as e:
-            print(f"[IMMEDIATE SENDER ERROR] Failed to send message to {number}: {e}")
+# Send callbacks by name, for outcomes reported back by the sender processes
+SEND_CALLBACKS = {callback.__name__: callback for callback in (_on_scheduled_send_done, _on_immediate_send_done)}
+
+def _send_messages_immediately(total, subject, body, template=None, batch_id=None):
+    """
+    Helper function to send messages immediately in a separate thread. Pages
+    through the contact list, so the queue (not the request) absorbs its size.
+    """
+    if template is None:
+        template = compile_message(subject, body)
+    batch_id = batch_id or f"immediate-{uuid.uuid4()}"
+    progress.campaign_started(batch_id, total, kind='immediate')
+    cursor = None
+    while True:
+        numbers, cursor, _ = contact_store.page(REGISTRATION_BATCH_SIZE, cursor)
+        for number in numbers:
+            send_pipeline.submit(SendTask(batch_id, None, number, render_message(template, number),
+                                          _on_immediate_send_done))
+        if cursor is None:
+            break
+    wait_for_sends(batch_id)
+    progress.campaign_finished(batch_id, 'completed')
+
+def _job_to_json(job):
+    """Converts a job or campaign dict to its JSON form (datetimes as ISO strings)."""
+    job_copy = job.copy()
+    if isinstance(job_copy.get('send_time'), datetime):
+        job_copy['send_time'] = job_copy['send_time'].isoformat()
+    return job_copy
 
 @app.route('/api/scheduled_messages', methods=['GET'])
 def get_scheduled_messages_api():
-    """API endpoint to get list of scheduled messages."""
-    jobs = load_scheduled_jobs()
-    # Filter for pending and convert datetime to string for JSON serialization
-    pending_jobs = []
-    for job in jobs:
-        if job.get('status') == 'pending':
-            job_copy = job.copy()
-            if isinstance(job_copy['send_time'], datetime):
-                job_copy['send_time'] = job_copy['send_time'].isoformat()
-            pending_jobs.append(job_copy)
-    return jsonify({'scheduled_messages': pending_jobs}), 200
+    """
+    API endpoint to get list of scheduled (pending) messages, ordered by send time.
+    Supports cursor pagination (?limit=&cursor=), a per-campaign count summary
+    (?summary=1) and conditional requests via ETag/If-None-Match. Without
+    arguments it returns every pending message.
+    """
+    try:
+        limit = _page_limit()
+    except ValueError as e:
+        return jsonify({'message': f'Invalid limit: {e}'}), 400
+    cursor = request.args.get('cursor') or None
+
+    if request.args.get('summary') in ('1', 'true'):
+        # Served from the state manager's published snapshot without touching the store's lock
+        snapshot = state_manager.snapshot()
+        return _conditional_json(
+            f"summary-{int(snapshot.taken_at * 1000)}-{snapshot.version}",
+            lambda: {'campaigns': [_job_to_json(campaign) for campaign in snapshot.campaigns],
+                     'pending': snapshot.pending}
+        )
+
+    def build_payload():
+        jobs, next_cursor, total = job_store.pending_page(limit or job_store.pending_count() or 1, cursor)
+        return {'scheduled_messages': [_job_to_json(job) for job in jobs], 'next_cursor': next_cursor, 'total': total}
+
+    try:
+        return _conditional_json(job_store.etag(), build_payload)
+    except ValueError:
+        return jsonify({'message': 'Invalid cursor.'}), 400
+
+@app.route('/api/campaigns/<string:campaign_id>', methods=['GET'])
+def campaign_status_api(campaign_id):
+    """
+    API endpoint for the status of a submitted campaign, including how far
+    the background registration of its recipients has got.
+    """
+    campaign = job_store.get_campaign(campaign_id)
+    registration = registrar.status(campaign_id)
+    if campaign is None and registration is None:
+        return jsonify({'message': f'Campaign {campaign_id} not found.'}), 404
+    payload = {'campaign_id': campaign_id, 'registration': registration}
+    if campaign is not None:
+        payload['status'] = campaign['status']
+        payload['send_time'] = campaign['send_time'].isoformat()
+        payload['send_window'] = campaign.get('send_window')
+    # When the dispatcher will next release recipients (later than send_time outside the send window)
+    next_release = dispatcher.scheduled(campaign_id)
+    payload['next_release'] = next_release.isoformat() if next_release is not None else None
+    return jsonify(payload), 200
 
 @app.route('/api/scheduled_messages/<string:job_id>', methods=['DELETE'])
 def cancel_scheduled_message_api(job_id):
     """API endpoint to cancel a specific scheduled message."""
+    job = job_store.get(job_id)
+    if job is None or job.get('status') != 'pending':
+        return jsonify({'message': f'Failed to cancel job {job_id}: no pending job with this ID.'}), 404
+
+    remove_job_from_persistence(job_id)
+    campaign_id = job.get('campaign_id')
+    if campaign_id and not job_store.pending_count(campaign_id):
+        _retire_campaigns([campaign_id])
+    return jsonify({'message': f'Scheduled message {job_id} cancelled successfully.'}), 200
+
+def _retire_campaigns(campaign_ids):
+    """Drops the dispatcher entries of campaigns that have nobody left to send to."""
+    for campaign_id in campaign_ids:
+        dispatcher.cancel(campaign_id)
+        if _dispatching.pop(campaign_id, None) is not None:
+            progress.campaign_finished(campaign_id, 'cancelled')
+        update_campaign_status_in_persistence(campaign_id, 'cancelled')
+
+def _parse_send_time(data, date_key, time_key):
+    """Reads an ISO date + time pair from a request body. Returns None if absent; raises ValueError if invalid."""
+    date_str = str(data.get(date_key) or '').strip()
+    time_str = str(data.get(time_key) or '').strip()
+    if not date_str and not time_str:
+        return None
+    return datetime.fromisoformat(f"{date_str} {time_str}".strip())
+
+def _select_pending_jobs(data):
+    """
+    Resolves the bulk selectors of a request body (campaign_id, ids and/or a
+    start_date/start_time .. end_date/end_time window) to pending job ids.
+    Raises ValueError if no selector is given or a selector is invalid.
+    """
+    campaign_id = data.get('campaign_id') or None
+    job_ids = data.get('ids')
+    if job_ids is not None and not isinstance(job_ids, list):
+        raise ValueError("'ids' must be a list of job IDs")
+    start = _parse_send_time(data, 'start_date', 'start_time')
+    end = _parse_send_time(data, 'end_date', 'end_time')
+    if campaign_id is None and job_ids is None and start is None and end is None:
+        raise ValueError("give a campaign_id, a list of ids or a start/end time window")
+    return job_store.select_pending(campaign_id=campaign_id, job_ids=job_ids, start=start, end=end)
+
+@app.route('/api/scheduled_messages/cancel', methods=['POST'])
+def bulk_cancel_scheduled_messages_api():
+    """
+    API endpoint to cancel many scheduled messages at once: a whole campaign,
+    a list of job IDs or everything due in a time window. The change is
+    written to the journal as a single record.
+    """
+    data = request.json or {}
+    registration = registrar.status(data['campaign_id']) if data.get('campaign_id') else None
+    if registration is not None and registration['state'] in ('queued', 'registering'):
+        # Marked first, so the registrar stores no more recipients after the selection below
+        _retire_campaigns([data['campaign_id']])
     try:
-        scheduler.remove_job(job_id)
-        remove_job_from_persistence(job_id)
-        return jsonify({'message': f'Scheduled message {job_id} cancelled successfully.'}), 200
-    except Exception as e:
-        return jsonify({'message': f'Failed to cancel job {job_id}: {e}'}), 404
+        job_ids = _select_pending_jobs(data)
+    except ValueError as e:
+        return jsonify({'message': f'Invalid selection: {e}'}), 400
+
+    cancelled, emptied_campaigns = state_manager.call(job_store.cancel_jobs, job_ids)
+    _retire_campaigns(emptied_campaigns)
+    return jsonify({'message': f'{cancelled} scheduled message(s) cancelled.', 'cancelled': cancelled}), 200
+
+@app.route('/api/scheduled_messages/reschedule', methods=['POST'])
+def bulk_reschedule_scheduled_messages_api():
+    """
+    API endpoint to move many scheduled messages to a new send time, using the
+    same selectors as the bulk cancel endpoint plus scheduled_date/scheduled_time.
+    A fully selected campaign keeps its scheduler entry and is re-timed; a
+    partial selection is split off into a new campaign with its own entry.
+    """
+    data = request.json or {}
+    try:
+        send_time = _parse_send_time(data, 'scheduled_date', 'scheduled_time')
+    except ValueError as e:
+        return jsonify({'message': f'Invalid date or time format: {e}'}), 400
+    if send_time is None:
+        return jsonify({'message': 'A new scheduled_date and scheduled_time are required.'}), 400
+    if send_time <= datetime.now():
+        return jsonify({'message': 'Scheduled time must be in the future.'}), 400
+    try:
+        job_ids = _select_pending_jobs(data)
+    except ValueError as e:
+        return jsonify({'message': f'Invalid selection: {e}'}), 400
+
+    rescheduled, campaigns = state_manager.call(job_store.reschedule_jobs, job_ids, send_time)
+    for campaign in campaigns:
+        schedule_campaign(campaign)
+    return jsonify({
+        'message': f'{rescheduled} scheduled message(s) moved to {send_time.isoformat()}.',
+        'rescheduled': rescheduled,
+        'campaign_ids': [campaign['id'] for campaign in campaigns]
+    }), 200
+
+@app.route('/api/send_history', methods=['GET'])
+def get_send_history_api():
+    """
+    API endpoint to query the send history, newest first. Filters: number,
+    campaign_id, start and end (ISO date-times, end exclusive) and limit.
+    """
+    try:
+        limit = _page_limit() or 100
+        start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError as e:
+        return jsonify({'message': f'Invalid query: {e}'}), 400
+    number = request.args.get('number') or None
+    if number:
+        # Group ids are not numbers; they are looked up as given
+        number = normalize_number(number) or number
+    entries = query_send_history(number=number,
+                                 campaign_id=request.args.get('campaign_id') or None,
+                                 start=start, end=end, limit=limit)
+    return jsonify({'send_history': entries, 'count': len(entries)}), 200
+
+@app.route('/api/dead_letters', methods=['GET'])
+def get_dead_letters_api():
+    """API endpoint to list messages that failed every retry, oldest first (?campaign_id=&limit=)."""
+    try:
+        limit = _page_limit() or 100
+    except ValueError as e:
+        return jsonify({'message': f'Invalid limit: {e}'}), 400
+    entries = dead_letters.entries(campaign_id=request.args.get('campaign_id') or None, limit=limit)
+    return jsonify({'dead_letters': [dict(entry, failed_at=entry['failed_at'].isoformat()) for entry in entries],
+                    'total': dead_letters.count()}), 200
+
+@app.route('/api/dead_letters/redrive', methods=['POST'])
+def redrive_dead_letters_api():
+    """
+    API endpoint to send dead-lettered messages again in bulk: a list of
+    entry ids, a whole campaign, or everything with {"all": true}.
+    """
+    data = request.json or {}
+    entry_ids = data.get('ids')
+    if entry_ids is not None and not isinstance(entry_ids, list):
+        return jsonify({'message': "Invalid selection: 'ids' must be a list of entry IDs"}), 400
+    campaign_id = data.get('campaign_id') or None
+    if entry_ids is None and campaign_id is None and not data.get('all'):
+        return jsonify({'message': 'Invalid selection: give a list of ids, a campaign_id or "all": true'}), 400
+    redriven = redrive_dead_letters(entry_ids, campaign_id)
+    return jsonify({'message': f'{redriven} message(s) re-queued for sending.', 'redriven': redriven}), 200
+
+@app.route('/api/senders', methods=['GET'])
+def get_senders_api():
+    """API endpoint to list the sender processes with their last heartbeat and sent/failed counts."""
+    if broker is None:
+        return jsonify({'senders': [], 'processes': 0, 'message': 'Sending runs in this process.'}), 200
+    return jsonify({'senders': broker.workers(), 'processes': SENDER_PROCESSES,
+                    'queued': send_pipeline.queue_depth()}), 200
+
+@app.route('/api/progress', methods=['GET'])
+def progress_stream_api():
+    """
+    Server-Sent Events stream of send progress: a 'snapshot' of campaign
+    totals on connect, then 'campaign' events when a campaign starts or
+    finishes and a 'send' event per recipient with the campaign's totals.
+    """
+    response = Response(stream_with_context(progress.subscribe()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_api():
+    """
+    Prometheus scrape endpoint: send counters, per-stage latency histograms,
+    scheduler lag, queue depths and file I/O timings in the text format.
+    """
+    return app.response_class(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+# Read at scrape time from the published snapshot, so nothing is recorded between scrapes
+metrics.PENDING_JOBS.set_function(lambda: state_manager.snapshot().pending)
 
 # --- Startup Logic ---
-def setup_scheduler():
-    """Loads pending jobs from persistence and re-adds them to the scheduler."""
-    jobs = load_scheduled_jobs()
-    for job_data in jobs:
-        if job_data.get('status') == 'pending':
+# Status given to jobs whose send was interrupted by a crash; they are dead-lettered instead of resent
+INTERRUPTED_SEND_STATUS = f'failed: {SendInterruptedError()}'
+
+def _recover_outbox():
+    """
+    Reconciles the send ledger with the job store after a restart. Only the
+    ledger's entries are read, so this takes time proportional to the sends
+    that were in flight, however many jobs are stored:
+    - confirmed sends whose 'sent' status was not written yet are marked sent;
+    - attempts that were started but never confirmed may have reached the
+      customer, so they are not resent automatically: the job is marked
+      failed and dead-lettered for an operator to re-drive;
+    - claims that never reached the transport are dropped, and their jobs
+      are sent as usual.
+    Jobs still held by the sender processes are left to them: a sender that
+    takes over a dead one's shard reports its cut-off send as interrupted.
+    """
+    held = send_pipeline.unfinished_job_ids()
+    entries = [entry for entry in ledger.in_flight() if entry['job_id'] not in held]
+    if not entries:
+        return
+    sent, interrupted = [], []
+    for entry in entries:
+        job = job_store.get(entry['job_id'])
+        if job is None or job['status'] != 'pending':
+            continue
+        if entry['state'] == 'sent':
+            sent.append(job['id'])
+        elif entry['state'] == 'sending':
+            interrupted.append((job, entry['attempt']))
+    if sent:
+        state_manager.call(job_store.update_status_many, sent, 'sent')
+    templates = {}
+    for job, attempt in interrupted:
+        campaign = job_store.get_campaign(job['campaign_id'])
+        message = ''
+        if campaign is not None:
             try:
-                # Ensure send_time is datetime object
-                if isinstance(job_data['send_time'], str):
-                    job_data['send_time'] = datetime.fromisoformat(job_data['send_time'])
-
-                scheduler.add_job(
-                    send_whatsapp_job, 
-                    trigger=DateTrigger(run_date=job_data['send_time']),
-                    args=[job_data['id'], job_data['number'], job_data['subject'], job_data['body']], 
-                    id=job_data['id'],
-                    misfire_grace_time=60 # seconds
-                )
-                print(f"Re-added scheduled job {job_data['id']} for {job_data['send_time']}")
+                if campaign['id'] not in templates:
+                    templates[campaign['id']] = compile_message(campaign['subject'], campaign['body'])
+                message = render_message(templates[campaign['id']], job['number'])
+            except TemplateError:
+                pass
+        dead_letters.add(job['number'], message, SendInterruptedError(), attempt, job_id=job['id'],
+                         campaign_id=job['campaign_id'])
+    if interrupted:
+        state_manager.call(job_store.update_status_many, [job['id'] for job, _ in interrupted],
+                           INTERRUPTED_SEND_STATUS)
+    ledger.forget([entry['job_id'] for entry in entries])
+    print(f"[SCHEDULER] Recovered {len(entries)} in-flight send(s): {len(sent)} confirmed, "
+          f"{len(interrupted)} interrupted (dead-lettered), the rest released.")
+
+def refill_scheduler():
+    """
+    Rolling loader: registers the campaigns that have come within the
+    scheduler horizon since the last run. Campaigns that cannot be registered
+    are marked as failed with a single journal write.
+    """
+    global _scheduled_until
+    with _horizon_lock:
+        until = datetime.now() + timedelta(seconds=SCHEDULER_HORIZON)
+        failed = {}
+        registered = 0
+        for campaign in job_store.due_campaigns(until, after=_scheduled_until):
+            try:
+                _register_campaign(campaign)
+                registered += 1
             except Exception as e:
-                print(f"Error re-adding job {job_data['id']}: {e}. Skipping.")
-                # Mark as failed if cannot re-add (e.g., time passed while server was down)
-                update_job_status_in_persistence(job_data['id'], f'failed: re-add error ({str(e)})')
+                print(f"Error re-adding campaign {campaign['id']}: {e}. Skipping.")
+                failed[campaign['id']] = f'failed: re-add error ({str(e)})'
+        _scheduled_until = until
+    for campaign_id, status in failed.items():
+        state_manager.call(job_store.close_campaigns, [campaign_id], 'failed', status)
+    return registered
+
+def setup_scheduler():
+    """
+    Loads the job journal, reconciles the send ledger with it (see
+    _recover_outbox) and rehydrates the dispatcher. Campaigns that never
+    started and were due more than MAX_SEND_DELAY ago are marked as missed
+    in one batched write; other past-due campaigns, including ones that
+    were part-way through sending, are re-slotted to send now. Campaigns
+    due within SCHEDULER_HORIZON are registered, and a rolling loader
+    registers later campaigns as their time approaches.
+    """
+    start = time.perf_counter()
+    job_store.load()
+    _recover_outbox()
+    loaded = time.perf_counter()
+
+    now = datetime.now()
+    # Only campaigns that never started: a running one was still draining normally, however old its send_time
+    missed = [campaign['id'] for campaign in job_store.due_campaigns(now - timedelta(seconds=MAX_SEND_DELAY))
+              if campaign['status'] == 'pending']
+    if missed:
+        missed_jobs = state_manager.call(job_store.close_campaigns, missed, 'failed',
+                                         'failed: missed while the server was down')
+        print(f"[SCHEDULER] Marked {len(missed)} past-due campaign(s) ({missed_jobs} recipient(s)) as missed.")
+    late = len(job_store.due_campaigns(now))
+    if late:
+        print(f"[SCHEDULER] Re-slotting {late} campaign(s) that came due while the server was down.")
+
+    _resume_registrations()
+    registered = refill_scheduler()
+    scheduler.add_job(
+        refill_scheduler,
+        trigger=IntervalTrigger(seconds=max(1.0, SCHEDULER_HORIZON / 2)),
+        id='scheduler-refill',
+        replace_existing=True
+    )
+    print(f"[SCHEDULER] Loaded jobs in {loaded - start:.2f} s; registered {registered} campaign(s) "
+          f"due before {_scheduled_until:%Y-%m-%d %H:%M} in {time.perf_counter() - loaded:.2f} s.")
+
+def start_background_services():
+    """
+    Starts the scheduler, the send pipeline and the dispatcher, then
+    rehydrates scheduled campaigns in a background thread so the web server
+    answers requests straight away regardless of the size of the backlog.
+    Requests that need the job store wait until the journal has been loaded.
+    """
+    state_manager.start()
+    scheduler.start()
+    send_pipeline.start()
+    dispatcher.start()
+    rehydration = threading.Thread(target=setup_scheduler, name='scheduler-rehydration', daemon=True)
+    rehydration.start()
+    if send_history is not None:
+        # Importing a large PyWhatKit_DB.txt on first start must not hold up the web server either
+        threading.Thread(target=send_history.load, name='send-history-load', daemon=True).start()
+    return rehydration
 
 
 # --- Main execution block ---
@@ -427,12 +1302,35 @@ if __name__ == '__main__':
                     </button>
                 </div>
             </div>
+            <div>
+                <label for="import-file" class="block text-sm font-medium text-gray-700 mb-2">
+                    Or import a file (.csv, .txt or .xlsx with one number per row)
+                </label>
+                <div class="flex space-x-3">
+                    <input
+                        type="file"
+                        id="import-file"
+                        accept=".csv,.txt,.xlsx"
+                        class="flex-1 input-field"
+                    />
+                    <button onclick="importNumbers()" class="px-5 py-2 btn-primary">
+                        Import
+                    </button>
+                </div>
+            </div>
         </div>
 
         <!-- Customer List Section -->
         <div class="mb-8">
             <h2 class="text-2xl font-bold text-indigo-700 mb-4">Your Customer List (<span id="customer-count">0</span>)</h2>
-            <div id="customer-list-container" class="space-y-3 max-h-60 overflow-y-auto pr-2 border border-gray-200 rounded-lg p-2">
+            <input
+                type="text"
+                id="contact-search"
+                placeholder="Search by number prefix (e.g., +2547)"
+                oninput="searchNumbers()"
+                class="mb-3 input-field"
+            />
+            <div id="customer-list-container" onscroll="renderVisibleNumbers()" class="space-y-3 max-h-60 overflow-y-auto pr-2 border border-gray-200 rounded-lg p-2">
                 <!-- Numbers will be loaded here by JavaScript -->
                 <p id="no-customers-message" class="text-gray-500 italic">Loading customers...</p>
             </div>
@@ -489,6 +1387,9 @@ if __name__ == '__main__':
                     class="input-field resize-y"
                     required
                 ></textarea>
+                <p class="text-xs text-gray-500 mt-1">
+                    {% raw %}Personalize with {{name}}, {{order_id}} or any imported column; add a fallback with {{name|Customer}}.{% endraw %}
+                </p>
             </div>
             <button onclick="scheduleOrSendMessage()" class="w-full flex items-center justify-center px-6 py-3 btn-primary">
                 <svg class="-ml-1 mr-2 h-5 w-5" xmlns="http://www.w3.org/2000/svg" viewBox="0 0 20 20" fill="currentColor" aria-hidden="true">
@@ -507,6 +1408,14 @@ if __name__ == '__main__':
             </div>
         </div>
 
+        <!-- Send Progress Section -->
+        <div class="mb-8 p-6 bg-gray-50 rounded-lg shadow-inner">
+            <h2 class="text-2xl font-bold text-indigo-700 mb-4">Send Progress <span id="progress-connection" class="text-sm font-normal text-gray-500">(connecting...)</span></h2>
+            <div id="progress-container" class="space-y-3 max-h-60 overflow-y-auto pr-2 border border-gray-200 rounded-lg p-2">
+                <p class="text-gray-500 italic">No campaigns sending.</p>
+            </div>
+        </div>
+
     </div>
 
     <script>
@@ -523,10 +1432,21 @@ if __name__ == '__main__':
         const scheduledMessagesContainer = document.getElementById('scheduled-messages-container');
         const scheduledCountSpan = document.getElementById('scheduled-count');
         const noScheduledMessagesMessage = document.getElementById('no-scheduled-messages-message');
+        const contactSearchInput = document.getElementById('contact-search');
+        const progressContainer = document.getElementById('progress-container');
+        const progressConnectionSpan = document.getElementById('progress-connection');
 
-        let allCustomers = [];
+        const PAGE_SIZE = 200;
+        const ROW_HEIGHT = 64; // px; fixed so rows can be positioned without measuring them
+        const OVERSCAN = 5; // extra rows rendered above and below the visible window
         const initialDisplayLimit = 2;
+        let allCustomers = []; // pages loaded so far for the current search, in sorted order
+        let totalCustomers = 0; // contacts matching the current search
+        let nextCursor = null;
+        let currentPrefix = '';
+        let isLoadingPage = false;
         let isViewingAll = false;
+        const revealedNumbers = new Set();
 
         function showStatusMessage(message, type = 'info') {
             statusMessageDiv.textContent = message;
@@ -540,24 +1460,62 @@ if __name__ == '__main__':
             }
         }
 
-        async function fetchNumbers() {
-            showStatusMessage('Loading customer numbers...');
+        // Fetches one page of contacts. The server sends an ETag with Cache-Control: no-cache,
+        // so the browser revalidates with If-None-Match and unchanged pages cost a 304.
+        async function fetchNumbersPage(cursor) {
+            const params = new URLSearchParams({ limit: PAGE_SIZE });
+            if (cursor) params.set('cursor', cursor);
+            if (currentPrefix) params.set('prefix', currentPrefix);
+            const response = await fetch(`/api/numbers?${params}`);
+            const data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.message || 'Unknown error');
+            }
+            return data;
+        }
+
+        async function fetchNumbers(quiet = false) {
+            if (!quiet) showStatusMessage('Loading customer numbers...');
             try {
-                const response = await fetch('/api/numbers');
-                const data = await response.json();
-                if (response.ok) {
-                    allCustomers = data.numbers;
-                    renderNumbers();
-                    showStatusMessage('Customer numbers loaded successfully.', 'success');
-                } else {
-                    showStatusMessage(`Error loading numbers: ${data.message || 'Unknown error'}`, 'error');
-                }
+                const data = await fetchNumbersPage(null);
+                allCustomers = data.numbers;
+                totalCustomers = data.total;
+                nextCursor = data.next_cursor;
+                renderNumbers();
+                if (!quiet) showStatusMessage('Customer numbers loaded successfully.', 'success');
             } catch (error) {
                 console.error('Error fetching numbers:', error);
-                showStatusMessage('Network error or server unavailable while loading numbers.', 'error');
+                showStatusMessage(`Error loading numbers: ${error.message}`, 'error');
+            }
+        }
+
+        async function loadNextNumbersPage() {
+            if (isLoadingPage || !nextCursor) return;
+            isLoadingPage = true;
+            try {
+                const data = await fetchNumbersPage(nextCursor);
+                allCustomers = allCustomers.concat(data.numbers);
+                totalCustomers = data.total;
+                nextCursor = data.next_cursor;
+                renderVisibleNumbers();
+            } catch (error) {
+                console.error('Error fetching more numbers:', error);
+                showStatusMessage(`Error loading more numbers: ${error.message}`, 'error');
+            } finally {
+                isLoadingPage = false;
             }
         }
 
+        let searchTimer = null;
+        function searchNumbers() {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => {
+                currentPrefix = contactSearchInput.value.trim();
+                customerListContainer.scrollTop = 0;
+                fetchNumbers(true);
+            }, 250);
+        }
+
         function maskNumber(number) {
             if (number.length <= 6) return number;
             const prefix = number.substring(0, 5);
@@ -565,43 +1523,54 @@ if __name__ == '__main__':
             return `${prefix}*****${suffix}`;
         }
 
+        function createNumberRow(number) {
+            const li = document.createElement('li');
+            li.className = 'flex items-center justify-between bg-gray-50 p-3 rounded-lg shadow-sm border border-gray-200';
+            const isRevealed = revealedNumbers.has(number);
+            li.setAttribute('data-full-number', number);
+            li.setAttribute('data-masked', isRevealed ? 'false' : 'true');
+
+            li.innerHTML = `
+                <span class="text-gray-800 font-medium text-lg">${isRevealed ? number : maskNumber(number)}</span>
+                <div class="flex items-center space-x-2">
+                    <button onclick="toggleNumberVisibility(this, '${number}')" class="view-contact-btn">
+                        ${isRevealed ? 'Hide Contact' : 'View Contact'}
+                    </button>
+                    <button onclick="deleteNumber('${number}')" class="delete-btn" title="Delete Customer">
+                        <svg class="h-6 w-6" xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24" stroke="currentColor">
+                            <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M19 7l-.867 12.142A2 2 0 0116.138 21H7.862a2 2 0 01-1.995-1.858L5 7m5 4v6m4-6v6m1-10V4a1 1 0 00-1-1h-4a1 1 0 00-1 1v3M4 7h16" />
+                        </svg>
+                    </button>
+                </div>
+            `;
+            return li;
+        }
+
         function renderNumbers() {
             customerListContainer.innerHTML = '';
-            customerCountSpan.textContent = allCustomers.length;
+            customerCountSpan.textContent = totalCustomers;
 
-            if (allCustomers.length === 0) {
-                customerListContainer.innerHTML = '<p id="no-customers-message" class="text-gray-500 italic">No customers added yet. Add some numbers above!</p>';
+            if (totalCustomers === 0) {
+                const emptyText = currentPrefix ? 'No customers match your search.' : 'No customers added yet. Add some numbers above!';
+                customerListContainer.innerHTML = `<p id="no-customers-message" class="text-gray-500 italic">${emptyText}</p>`;
                 toggleViewBtn.classList.add('hidden');
                 return;
             }
 
-            const numbersToDisplay = isViewingAll ? allCustomers : allCustomers.slice(0, initialDisplayLimit);
-
-            numbersToDisplay.forEach(number => {
-                const li = document.createElement('li');
-                li.className = 'flex items-center justify-between bg-gray-50 p-3 rounded-lg shadow-sm border border-gray-200';
-                li.setAttribute('data-full-number', number);
-                li.setAttribute('data-masked', 'true');
-
-                const maskedNum = maskNumber(number);
-
-                li.innerHTML = `
-                    <span class="text-gray-800 font-medium text-lg" id="display-number-${number}">${maskedNum}</span>
-                    <div class="flex items-center space-x-2">
-                        <button onclick="toggleNumberVisibility(this, '${number}')" class="view-contact-btn">
-                            View Contact
-                        </button>
-                        <button onclick="deleteNumber('${number}')" class="delete-btn" title="Delete Customer">
-                            <svg class="h-6 w-6" xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24" stroke="currentColor">
-                                <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M19 7l-.867 12.142A2 2 0 0116.138 21H7.862a2 2 0 01-1.995-1.858L5 7m5 4v6m4-6v6m1-10V4a1 1 0 00-1-1h-4a1 1 0 00-1 1v3M4 7h16" />
-                            </svg>
-                        </button>
-                    </div>
-                `;
-                customerListContainer.appendChild(li);
-            });
+            if (isViewingAll) {
+                // Virtualized list: a spacer sized for all loaded rows, with only the visible rows in the DOM
+                const spacer = document.createElement('div');
+                spacer.id = 'customer-list-spacer';
+                spacer.style.position = 'relative';
+                customerListContainer.appendChild(spacer);
+                renderVisibleNumbers();
+            } else {
+                allCustomers.slice(0, initialDisplayLimit).forEach(number => {
+                    customerListContainer.appendChild(createNumberRow(number));
+                });
+            }
 
-            if (allCustomers.length > initialDisplayLimit) {
+            if (totalCustomers > initialDisplayLimit) {
                 toggleViewBtn.classList.remove('hidden');
                 toggleViewBtn.textContent = isViewingAll ? 'View Fewer Contacts' : 'View All Contacts';
             } else {
@@ -609,8 +1578,35 @@ if __name__ == '__main__':
             }
         }
 
+        function renderVisibleNumbers() {
+            const spacer = document.getElementById('customer-list-spacer');
+            if (!spacer) return;
+            spacer.style.height = `${allCustomers.length * ROW_HEIGHT}px`;
+
+            const scrollTop = customerListContainer.scrollTop;
+            const first = Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN);
+            const last = Math.min(allCustomers.length, Math.ceil((scrollTop + customerListContainer.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+
+            spacer.innerHTML = '';
+            for (let i = first; i < last; i++) {
+                const li = createNumberRow(allCustomers[i]);
+                li.style.position = 'absolute';
+                li.style.top = `${i * ROW_HEIGHT}px`;
+                li.style.left = '0';
+                li.style.right = '0';
+                li.style.height = `${ROW_HEIGHT - 8}px`;
+                spacer.appendChild(li);
+            }
+
+            // Fetch the next page before the user reaches the end of what is loaded
+            if (last >= allCustomers.length - OVERSCAN) {
+                loadNextNumbersPage();
+            }
+        }
+
         function toggleViewAllContacts() {
             isViewingAll = !isViewingAll;
+            customerListContainer.scrollTop = 0;
             renderNumbers();
         }
 
@@ -623,10 +1619,12 @@ if __name__ == '__main__':
                 displaySpan.textContent = fullNumber;
                 listItem.setAttribute('data-masked', 'false');
                 buttonElement.textContent = 'Hide Contact';
+                revealedNumbers.add(fullNumber);
             } else {
                 displaySpan.textContent = maskNumber(fullNumber);
                 listItem.setAttribute('data-masked', 'true');
                 buttonElement.textContent = 'View Contact';
+                revealedNumbers.delete(fullNumber);
             }
         }
 
@@ -653,8 +1651,7 @@ if __name__ == '__main__':
                 const data = await response.json();
                 if (response.ok) {
                     newNumberInput.value = '';
-                    allCustomers = data.numbers;
-                    renderNumbers();
+                    await fetchNumbers(true);
                     showStatusMessage(data.message, 'success');
                 } else {
                     showStatusMessage(`Error adding number: ${data.message || 'Unknown error'}`, 'error');
@@ -665,6 +1662,39 @@ if __name__ == '__main__':
             }
         }
 
+        async function importNumbers() {
+            const fileInput = document.getElementById('import-file');
+            if (!fileInput.files.length) {
+                showStatusMessage('Please choose a file to import.', 'error');
+                return;
+            }
+
+            const formData = new FormData();
+            formData.append('file', fileInput.files[0]);
+
+            showStatusMessage('Importing numbers...', 'info');
+            try {
+                const response = await fetch('/api/numbers/import', {
+                    method: 'POST',
+                    body: formData
+                });
+                const data = await response.json();
+                if (response.ok) {
+                    fileInput.value = '';
+                    await fetchNumbers();
+                    showStatusMessage(data.message, data.rejected ? 'info' : 'success');
+                    if (data.rejects && data.rejects.length) {
+                        console.warn('Rejected rows (first ' + data.rejects.length + '):', data.rejects);
+                    }
+                } else {
+                    showStatusMessage(`Error importing numbers: ${data.message || 'Unknown error'}`, 'error');
+                }
+            } catch (error) {
+                console.error('Error importing numbers:', error);
+                showStatusMessage('Network error or server unavailable while importing numbers.', 'error');
+            }
+        }
+
         async function deleteNumber(number) {
             if (!confirm(`Are you sure you want to delete ${number}?`)) {
                 return;
@@ -676,8 +1706,8 @@ if __name__ == '__main__':
                 });
                 const data = await response.json();
                 if (response.ok) {
-                    allCustomers = data.numbers;
-                    renderNumbers();
+                    revealedNumbers.delete(number);
+                    await fetchNumbers(true);
                     showStatusMessage(data.message, 'success');
                 } else {
                     showStatusMessage(`Error deleting number: ${data.message || 'Unknown error'}`, 'error');
@@ -703,12 +1733,12 @@ if __name__ == '__main__':
                 return;
             }
 
-            let currentNumbers = [];
+            let customerTotal = 0;
             try {
-                const response = await fetch('/api/numbers');
+                const response = await fetch('/api/numbers?limit=1');
                 const data = await response.json();
                 if (response.ok) {
-                    currentNumbers = data.numbers;
+                    customerTotal = data.total;
                 } else {
                     showStatusMessage(`Failed to get customer list before sending: ${data.message || 'Unknown error'}`, 'error');
                     return;
@@ -719,7 +1749,7 @@ if __name__ == '__main__':
                 return;
             }
 
-            if (currentNumbers.length === 0) {
+            if (customerTotal === 0) {
                 showStatusMessage('No customer numbers added yet. Cannot send messages.', 'error');
                 return;
             }
@@ -745,7 +1775,9 @@ if __name__ == '__main__':
                     scheduledDateInput.value = '';
                     scheduledTimeInput.value = '';
                     showStatusMessage(data.message, 'success');
-                    fetchScheduledMessages(); // Refresh scheduled messages list
+                    if (data.type === 'scheduled') {
+                        pollRegistration(data.status_url); // Recipients are registered in the background
+                    }
                 } else {
                     showStatusMessage(`Error: ${data.message || 'Unknown error'}`, 'error');
                 }
@@ -755,13 +1787,41 @@ if __name__ == '__main__':
             }
         }
 
-        async function fetchScheduledMessages() {
+        // Follows the background registration of a scheduled campaign's recipients
+        async function pollRegistration(statusUrl) {
+            try {
+                const response = await fetch(statusUrl);
+                const data = await response.json();
+                const registration = data.registration;
+                if (response.ok && registration && (registration.state === 'queued' || registration.state === 'registering')) {
+                    showStatusMessage(`Registering recipients ${registration.registered}/${registration.total}...`, 'info');
+                    setTimeout(() => pollRegistration(statusUrl), 1000);
+                    return;
+                }
+                if (registration && registration.state === 'failed') {
+                    showStatusMessage(`Error: registering recipients failed (${registration.error})`, 'error');
+                } else if (registration && registration.state === 'registered') {
+                    showStatusMessage(`Messages scheduled for ${registration.registered} recipient(s).`, 'success');
+                }
+            } catch (error) {
+                console.error('Error fetching campaign status:', error);
+            }
+            fetchScheduledMessages(); // Refresh scheduled messages list
+        }
+
+        const SCHEDULED_PAGE_SIZE = 50;
+        let scheduledNextCursor = null;
+
+        async function fetchScheduledMessages(cursor = null) {
             showStatusMessage('Loading scheduled messages...', 'info');
             try {
-                const response = await fetch('/api/scheduled_messages');
+                const params = new URLSearchParams({ limit: SCHEDULED_PAGE_SIZE });
+                if (cursor) params.set('cursor', cursor);
+                const response = await fetch(`/api/scheduled_messages?${params}`);
                 const data = await response.json();
                 if (response.ok) {
-                    renderScheduledMessages(data.scheduled_messages);
+                    scheduledNextCursor = data.next_cursor;
+                    renderScheduledMessages(data.scheduled_messages, data.total, Boolean(cursor));
                     showStatusMessage('Scheduled messages loaded.', 'success');
                 } else {
                     showStatusMessage(`Error loading scheduled messages: ${data.message || 'Unknown error'}`, 'error');
@@ -772,17 +1832,20 @@ if __name__ == '__main__':
             }
         }
 
-        function renderScheduledMessages(messages) {
-            scheduledMessagesContainer.innerHTML = '';
-            scheduledCountSpan.textContent = messages.length;
+        function renderScheduledMessages(messages, total, append = false) {
+            const loadMoreBtn = document.getElementById('load-more-scheduled-btn');
+            if (loadMoreBtn) loadMoreBtn.remove();
+            if (!append) scheduledMessagesContainer.innerHTML = '';
+            scheduledCountSpan.textContent = total;
 
-            if (messages.length === 0) {
+            if (total === 0) {
                 scheduledMessagesContainer.innerHTML = '<p id="no-scheduled-messages-message" class="text-gray-500 italic">No messages scheduled.</p>';
                 return;
             }
 
             messages.forEach(job => {
                 const li = document.createElement('li');
+                li.dataset.jobId = job.id;
                 li.className = 'flex flex-col md:flex-row items-start md:items-center justify-between bg-white p-3 rounded-lg shadow-sm border border-gray-200';
                 
                 const sendTime = new Date(job.send_time);
@@ -798,10 +1861,22 @@ if __name__ == '__main__':
                         <button onclick="cancelScheduledMessage('${job.id}')" class="px-3 py-1 text-red-600 bg-red-100 rounded-md hover:bg-red-200 text-sm">
                             Cancel
                         </button>
+                        <button onclick="cancelCampaign('${job.campaign_id}')" class="px-3 py-1 text-red-600 bg-red-100 rounded-md hover:bg-red-200 text-sm">
+                            Cancel Campaign
+                        </button>
                     </div>
                 `;
                 scheduledMessagesContainer.appendChild(li);
             });
+
+            if (scheduledNextCursor) {
+                const button = document.createElement('button');
+                button.id = 'load-more-scheduled-btn';
+                button.className = 'w-full px-4 py-2 btn-secondary';
+                button.textContent = 'Load More';
+                button.onclick = () => fetchScheduledMessages(scheduledNextCursor);
+                scheduledMessagesContainer.appendChild(button);
+            }
         }
 
         async function cancelScheduledMessage(jobId) {
@@ -826,11 +1901,111 @@ if __name__ == '__main__':
             }
         }
 
+        async function cancelCampaign(campaignId) {
+            if (!confirm('Cancel every pending message of this campaign?')) {
+                return;
+            }
+            showStatusMessage('Cancelling campaign...', 'info');
+            try {
+                const response = await fetch('/api/scheduled_messages/cancel', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ campaign_id: campaignId })
+                });
+                const data = await response.json();
+                if (response.ok) {
+                    showStatusMessage(data.message, 'success');
+                    fetchScheduledMessages();
+                } else {
+                    showStatusMessage(`Error cancelling campaign: ${data.message || 'Unknown error'}`, 'error');
+                }
+            } catch (error) {
+                console.error('Error cancelling campaign:', error);
+                showStatusMessage('Network error or server unavailable while cancelling campaign.', 'error');
+            }
+        }
+
+
+        // --- Live send progress (Server-Sent Events) ---
+        const campaignProgress = new Map(); // campaign_id -> latest totals from the server
+
+        function renderProgress() {
+            if (campaignProgress.size === 0) {
+                progressContainer.innerHTML = '<p class="text-gray-500 italic">No campaigns sending.</p>';
+                return;
+            }
+            progressContainer.innerHTML = '';
+            // Newest campaigns first
+            [...campaignProgress.values()].reverse().forEach(totals => {
+                const done = totals.sent + totals.failed;
+                const percent = totals.total ? Math.min(100, Math.round(done * 100 / totals.total)) : 100;
+                const label = totals.kind === 'immediate' ? 'Send Now' : 'Scheduled campaign';
+                const div = document.createElement('div');
+                div.className = 'bg-white p-3 rounded-lg shadow-sm border border-gray-200';
+                div.innerHTML = `
+                    <div class="flex justify-between text-sm">
+                        <span class="font-bold text-gray-800">${label}</span>
+                        <span class="text-gray-600">${totals.status}</span>
+                    </div>
+                    <div class="w-full bg-gray-200 rounded-full h-2 my-2">
+                        <div class="h-2 rounded-full" style="width: ${percent}%; background-color: rgb(var(--color-success-green));"></div>
+                    </div>
+                    <p class="text-xs text-gray-500">${totals.sent} sent, ${totals.failed} failed of ${totals.total}</p>
+                `;
+                progressContainer.appendChild(div);
+            });
+        }
+
+        // Send events can arrive many times per second; redraw at most once per frame
+        let progressRenderQueued = false;
+        function queueProgressRender() {
+            if (progressRenderQueued) return;
+            progressRenderQueued = true;
+            requestAnimationFrame(() => {
+                progressRenderQueued = false;
+                renderProgress();
+            });
+        }
+
+        function removeSentScheduledMessage(jobId) {
+            const row = scheduledMessagesContainer.querySelector(`li[data-job-id="${jobId}"]`);
+            if (!row) return;
+            row.remove();
+            scheduledCountSpan.textContent = Math.max(0, Number(scheduledCountSpan.textContent) - 1);
+        }
+
+        // One stream per page; the browser reconnects on its own and the server starts each connection with a snapshot
+        function subscribeToProgress() {
+            const source = new EventSource('/api/progress');
+            source.onopen = () => { progressConnectionSpan.textContent = '(live)'; };
+            source.onerror = () => { progressConnectionSpan.textContent = '(reconnecting...)'; };
+            source.addEventListener('snapshot', event => {
+                campaignProgress.clear();
+                JSON.parse(event.data).campaigns.forEach(totals => campaignProgress.set(totals.campaign_id, totals));
+                renderProgress();
+            });
+            source.addEventListener('campaign', event => {
+                const totals = JSON.parse(event.data);
+                campaignProgress.delete(totals.campaign_id);
+                campaignProgress.set(totals.campaign_id, totals);
+                renderProgress();
+                if (totals.kind === 'scheduled' && totals.status !== 'running') {
+                    fetchScheduledMessages();
+                }
+            });
+            source.addEventListener('send', event => {
+                const data = JSON.parse(event.data);
+                if (data.totals) campaignProgress.set(data.campaign_id, data.totals);
+                if (data.job_id) removeSentScheduledMessage(data.job_id);
+                queueProgressRender();
+            });
+        }
 
         // Load numbers and scheduled messages when the page loads
         document.addEventListener('DOMContentLoaded', () => {
             fetchNumbers();
             fetchScheduledMessages();
+            subscribeToProgress();
         });
     </script>
 </body>
@@ -841,18 +2016,23 @@ if __name__ == '__main__':
     with open(os.path.join('templates', 'index.html'), 'w') as f:
         f.write(html_content)
 
-    # Ensure scheduled_jobs.json exists
-    if not os.path.exists(SCHEDULED_JOBS_FILE):
-        with open(SCHEDULED_JOBS_FILE, 'w') as f:
-            json.dump([], f)
-
-    # Setup and start scheduler
-    setup_scheduler()
-    scheduler.start()
+    # Start the scheduler and send pipeline; the job journal (migrating
+    # scheduled_jobs.json on first run) is loaded in the background
+    start_background_services()
 
-    # Add a shutdown hook for the scheduler
+    # Add shutdown hooks for the scheduler, the send pipeline and the state manager
     import atexit
+    # (run in reverse order: stop sending, then flush the buffered status updates)
+    atexit.register(lambda: state_manager.stop(timeout=5))
+    # Exit normally on SIGTERM too, so the shutdown hooks run
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     atexit.register(lambda: scheduler.shutdown(wait=False))
+    atexit.register(lambda: send_pipeline.stop(timeout=5))
+    atexit.register(lambda: dispatcher.stop(timeout=5))
+    atexit.register(lambda: registrar.stop(timeout=5))
+    atexit.register(progress.close)
+    if send_history is not None:
+        atexit.register(send_history.close)
 
     # Determine the host and port for the Flask app
     host = '127.0.0.1'
@@ -0,0 +1,105 @@
+# benchmarks/bench_browser_session.py
+# Measures per-message send time of BrowserSessionTransport against the local
+# WhatsApp Web stand-in (benchmarks/fake_whatsapp_web.html), next to the fixed
+# ~25 s per message the pywhatkit path spends (20 s wait_time + 5 s delay).
+#
+# Requires selenium and a local Chrome (or Firefox with --browser firefox).
+# Usage: python benchmarks/bench_browser_session.py [--messages 50] [--switch-ms 300] [--ack-ms 400]
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from transport import BrowserSessionTransport, PywhatkitTransport, TransportError
+
+FAKE_PAGE = os.path.join(BENCH_DIR, 'fake_whatsapp_web.html')
+
+def make_handler(config):
+    with open(FAKE_PAGE, 'r', encoding='utf-8') as f:
+        page = f.read().replace(
+            '<!-- fake-config -->',
+            f'<script>window.FAKE_WHATSAPP_CONFIG = {json.dumps(config)};</script>'
+        ).encode('utf-8')
+
+    class FakeWhatsAppHandler(BaseHTTPRequestHandler):
+        """Serves the stand-in page for every path, like the WhatsApp Web single-page app."""
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeWhatsAppHandler
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent browser session transport benchmark.")
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--login-ms', type=int, default=500)
+    parser.add_argument('--switch-ms', type=int, default=300)
+    parser.add_argument('--ack-ms', type=int, default=400)
+    parser.add_argument('--browser', default='chrome', choices=['chrome', 'firefox'])
+    parser.add_argument('--show-browser', action='store_true')
+    args = parser.parse_args()
+
+    config = {'login_ms': args.login_ms, 'switch_ms': args.switch_ms, 'ack_ms': args.ack_ms}
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(config))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    profile_dir = tempfile.mkdtemp(prefix='fake_whatsapp_profile_')
+
+    transport = BrowserSessionTransport(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}",
+        profile_dir=profile_dir,
+        browser=args.browser,
+        headless=not args.show_browser,
+        login_timeout=30,
+        chat_timeout=10,
+        send_timeout=10,
+        poll_interval=0.02,
+    )
+    try:
+        start = time.perf_counter()
+        transport.send("+254700000000", "Warm-up message")
+        print(f"session start + first message: {time.perf_counter() - start:.2f} s")
+
+        latencies = []
+        for i in range(args.messages):
+            start = time.perf_counter()
+            transport.send(f"+2547{i:08d}", f"Benchmark message {i}\nSecond line.")
+            latencies.append(time.perf_counter() - start)
+
+        try:
+            transport.send("+000123", "Invalid number")
+            print("invalid number: NOT detected")
+        except TransportError as e:
+            print(f"invalid number detected: {e}")
+    finally:
+        transport.close()
+        server.shutdown()
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+    latencies.sort()
+    baseline = PywhatkitTransport().wait_time + PywhatkitTransport.inter_message_delay
+    mean = sum(latencies) / len(latencies)
+    print(f"{'transport':<18}{'msgs':>6}{'mean s':>9}{'p50 s':>9}{'p99 s':>9}{'msgs/min':>10}")
+    print(f"{'pywhatkit (fixed)':<18}{'-':>6}{baseline:>9.2f}{baseline:>9.2f}{baseline:>9.2f}{60 / baseline:>10.1f}")
+    print(f"{'browser_session':<18}{len(latencies):>6}{mean:>9.2f}{percentile(latencies, 50):>9.2f}"
+          f"{percentile(latencies, 99):>9.2f}{60 / mean:>10.1f}")
+
+if __name__ == '__main__':
+    main()
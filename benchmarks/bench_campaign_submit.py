@@ -0,0 +1,82 @@
+# benchmarks/bench_campaign_submit.py
+# Measures how long scheduling a campaign keeps the HTTP request busy as the
+# contact list grows. The old path loads every number and stores one job per
+# recipient inside the request; the new path stores the campaign alone,
+# queues it with the CampaignRegistrar and returns, while the registrar
+# stores the recipients in batches in the background. Reports the request
+# time of both and how long background registration took to finish.
+#
+# Usage: python benchmarks/bench_campaign_submit.py [--contacts 1000,10000,100000,1000000] [--batch-size 5000]
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from campaign_registrar import CampaignRegistrar
+from contact_store import ContactStore
+from job_store import JobStore
+
+def make_contacts(workdir, count):
+    path = os.path.join(workdir, 'customer_numbers.txt')
+    with open(path, 'w') as f:
+        f.writelines(f"+2547{i:08d}\n" for i in range(count))
+    return ContactStore(path)
+
+def make_job_store(workdir, name):
+    store = JobStore(os.path.join(workdir, name), fsync=False)
+    store.load()
+    return store
+
+def campaign():
+    return {'id': str(uuid.uuid4()), 'subject': 'Offer', 'body': 'Hello {{number}}',
+            'send_time': datetime.now() + timedelta(days=1), 'status': 'pending'}
+
+def run_inline(workdir, contacts):
+    store = make_job_store(workdir, 'inline.jsonl')
+    start = time.perf_counter()
+    store.add_campaign(campaign(), contacts.all())
+    return time.perf_counter() - start
+
+def run_background(workdir, contacts, batch_size):
+    store = make_job_store(workdir, 'background.jsonl')
+    done = threading.Event()
+    registrar = CampaignRegistrar(page_numbers=lambda limit, cursor: contacts.page(limit, cursor)[:2],
+                                  add_jobs=store.add_jobs, on_registered=lambda campaign_id: done.set(),
+                                  batch_size=batch_size)
+    registrar.start()
+    start = time.perf_counter()
+    submitted = dict(campaign(), status='registering')
+    store.add_campaign(submitted, [])
+    registrar.submit(submitted['id'], contacts.count())
+    request_time = time.perf_counter() - start
+    done.wait()
+    registered = time.perf_counter() - start
+    registrar.stop()
+    return request_time, registered
+
+def main():
+    parser = argparse.ArgumentParser(description="Campaign submission latency benchmark.")
+    parser.add_argument('--contacts', default='1000,10000,100000,1000000')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'contacts':>10}{'inline ms':>12}{'submit ms':>12}{'registered s':>14}")
+    for count in [int(n) for n in args.contacts.split(',')]:
+        workdir = tempfile.mkdtemp(prefix='bench_submit_')
+        try:
+            contacts = make_contacts(workdir, count)
+            inline = run_inline(workdir, contacts)
+            request_time, registered = run_background(workdir, contacts, args.batch_size)
+            print(f"{count:>10}{inline * 1e3:>12.1f}{request_time * 1e3:>12.2f}{registered:>14.2f}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
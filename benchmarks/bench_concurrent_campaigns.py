@@ -0,0 +1,132 @@
+# benchmarks/bench_concurrent_campaigns.py
+# Stress test for concurrent campaigns sharing the send pipeline and the
+# state manager. C campaigns of M recipients are stored in a JobStore; one
+# thread per campaign submits its recipients to a SendPipeline at the same
+# time, and every send's status goes through StateManager's writer thread
+# with the app's flush policy. The first send is held until everything is
+# queued, so the pipeline's round-robin can be checked against the recorded
+# send order. After each run the store is reloaded from disk and the run
+# FAILS (exit status 1) if:
+#   - a recipient was sent more than once or not at all,
+#   - a 'sent' status was lost on the way to disk,
+#   - a campaign got ahead of another still sending by more than
+#     workers + 1 messages (one for the send held back, one per worker in flight).
+#
+# Usage: python benchmarks/bench_concurrent_campaigns.py [--campaigns 2,8,32] [--recipients 500] [--workers 1]
+#            [--no-fsync]
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_store import JobStore
+from send_pipeline import SendPipeline, SendTask
+from state_manager import StateManager
+from transport import SendTransport
+
+class RecordingTransport(SendTransport):
+    """Records (campaign, number) for every send, shared by all workers; the first send waits for gate."""
+    name = 'recording'
+
+    def __init__(self, log, lock, gate):
+        self.log = log
+        self.lock = lock
+        self.gate = gate
+
+    def send(self, phone_number, message):
+        self.gate.wait()
+        with self.lock:
+            self.log.append((message, phone_number))
+
+def max_skew(log, sizes):
+    """Largest lead of one campaign over another that still had messages to send, after the first send."""
+    sent = Counter()
+    worst = 0
+    for campaign_id, _ in log[1:]:
+        sent[campaign_id] += 1
+        unfinished = [sent[other] for other in sizes if sent[other] < sizes[other]]
+        if unfinished:
+            worst = max(worst, max(sent.values()) - min(unfinished))
+    return worst
+
+def run(workdir, campaigns, recipients, workers, fsync):
+    store = JobStore(os.path.join(workdir, 'scheduled_jobs.jsonl'), fsync=fsync)
+    store.load()
+    jobs = {}
+    for c in range(campaigns):
+        campaign = {'id': str(uuid.uuid4()), 'subject': 'Stress', 'body': 'Body',
+                    'send_time': datetime.now() + timedelta(days=1)}
+        jobs[campaign['id']] = store.add_campaign(campaign, [f"+2547{c:03d}{i:05d}" for i in range(recipients)])
+    manager = StateManager(store, flush_interval=1.0, flush_max=500)
+    manager.start()
+    log, lock, gate = [], threading.Lock(), threading.Event()
+    transports = [RecordingTransport(log, lock, gate) for _ in range(workers)]
+    pipeline = SendPipeline(transports, max_queued=campaigns * recipients, pacing=False)
+
+    def done(task, error):
+        manager.update_status(task.job_id, 'sent' if error is None else f'failed: {error}')
+
+    def submit(campaign_id, rows):
+        for row in rows:
+            pipeline.submit(SendTask(campaign_id, row['id'], row['number'], campaign_id, callback=done))
+
+    threads = [threading.Thread(target=submit, args=(campaign_id, rows)) for campaign_id, rows in jobs.items()]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gate.set()
+    for campaign_id in jobs:
+        pipeline.wait_campaign(campaign_id)
+    manager.stop()
+    elapsed = time.perf_counter() - start
+    pipeline.stop()
+
+    fresh = JobStore(store.path)
+    fresh.load()
+    stored_sent = sum(entry['counts'].get('sent', 0) for entry in fresh.summary())
+    sends = Counter(number for _, number in log)
+    expected = {row['number'] for rows in jobs.values() for row in rows}
+    duplicated = sum(count - 1 for count in sends.values() if count > 1)
+    missing = len(expected - set(sends))
+    lost = len(expected) - stored_sent
+    skew = max_skew(log, {campaign_id: len(rows) for campaign_id, rows in jobs.items()})
+    return elapsed, len(log), duplicated, missing, lost, skew
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent campaign stress test.")
+    parser.add_argument('--campaigns', default='2,8,32')
+    parser.add_argument('--recipients', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--no-fsync', action='store_true')
+    args = parser.parse_args()
+
+    bound = args.workers + 1
+    failures = []
+    print(f"{'campaigns':>10}{'sends':>8}{'secs':>8}{'sends/sec':>11}{'duplicated':>12}{'missing':>9}{'lost':>6}"
+          f"{'skew':>6}")
+    for campaigns in [int(n) for n in args.campaigns.split(',')]:
+        with tempfile.TemporaryDirectory() as workdir:
+            elapsed, sends, duplicated, missing, lost, skew = run(workdir, campaigns, args.recipients, args.workers,
+                                                                  not args.no_fsync)
+        print(f"{campaigns:>10}{sends:>8}{elapsed:>8.2f}{sends / elapsed:>11.0f}{duplicated:>12}{missing:>9}"
+              f"{lost:>6}{skew:>6}")
+        if duplicated or missing or lost:
+            failures.append(f"{campaigns} campaigns: {duplicated} duplicated, {missing} missing, {lost} lost")
+        if skew > bound:
+            failures.append(f"{campaigns} campaigns: one campaign got {skew} messages ahead (bound {bound})")
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print(f"OK: every recipient sent exactly once, no status lost, campaigns within {bound} message(s) of each other.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/bench_contact_import.py
+# Generates a large CSV of phone numbers (with formatting noise, duplicates
+# and invalid rows) and streams it through contact_import.import_contacts,
+# reporting rows/sec and peak RSS.
+#
+# Usage: python benchmarks/bench_contact_import.py [--rows 1000000] [--chunk-size 10000]
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contact_import import import_contacts
+from contact_store import ContactStore
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def peak_rss_mb():
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def write_csv(path, rows, seed=1):
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write("name,phone\n")
+        for i in range(rows):
+            roll = rng.random()
+            if roll < 0.01:
+                phone = "not a number"
+            elif roll < 0.05:
+                phone = f"+2547{rng.randrange(rows):08d}"  # likely duplicate
+            else:
+                digits = f"{i:08d}"
+                phone = f"+254 7{digits[:2]}-{digits[2:5]} ({digits[5:]})"
+            f.write(f"Customer {i},{phone}\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk contact import benchmark.")
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, 'contacts.csv')
+        write_csv(csv_path, args.rows)
+        print(f"generated {args.rows} rows ({os.path.getsize(csv_path) / 1e6:.1f} MB), RSS {peak_rss_mb():.1f} MB")
+
+        store = ContactStore(os.path.join(workdir, 'customer_numbers.txt'))
+        start = time.perf_counter()
+        with open(csv_path, 'rb') as stream:
+            summary = import_contacts(stream, csv_path, store, chunk_size=args.chunk_size)
+        elapsed = time.perf_counter() - start
+
+        print(f"imported in {elapsed:.2f} s ({summary['rows'] / elapsed:,.0f} rows/sec), peak RSS {peak_rss_mb():.1f} MB")
+        print(f"added {summary['added']}, duplicates {summary['duplicates']}, rejected {summary['rejected']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_job_memory.py
+# Measures the memory held by the in-memory job table with tracemalloc.
+# N pending jobs (spread over a few campaigns) are loaded three ways:
+#   dicts    - the list of plain job dicts load_scheduled_jobs() used to
+#              build (string ids and numbers, datetime send times, repeated
+#              status strings)
+#   journal  - a JobStore loaded from its journal (columnar JobTable plus
+#              the pending and count indexes)
+#   page     - one 50-job API page materialized from that store, i.e. the
+#              only dicts built at the edge
+#
+# Usage: python benchmarks/bench_job_memory.py [--jobs 100000,1000000] [--campaigns 10]
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_store import JobStore
+
+def build_store(workdir, jobs, campaigns):
+    store = JobStore(os.path.join(workdir, 'scheduled_jobs.jsonl'), fsync=False)
+    store.load()
+    per_campaign = jobs // campaigns
+    for c in range(campaigns):
+        campaign = {'id': str(uuid.uuid4()), 'subject': 'Special Offer', 'body': 'Enroll now!',
+                    'send_time': datetime.now() + timedelta(days=1, minutes=c)}
+        store.add_campaign(campaign, [f"+2547{c * per_campaign + i:08d}" for i in range(per_campaign)])
+    return store
+
+def measure(fn):
+    """Returns (result, seconds, bytes still allocated by the result)."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, retained
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory job table memory benchmark.")
+    parser.add_argument('--jobs', default='100000,1000000')
+    parser.add_argument('--campaigns', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'jobs':>9}{'repr':>9}{'secs':>8}{'MB':>9}{'bytes/job':>11}")
+    for jobs in [int(n) for n in args.jobs.split(',')]:
+        with tempfile.TemporaryDirectory() as workdir:
+            build_store(workdir, jobs, args.campaigns)
+            path = os.path.join(workdir, 'scheduled_jobs.jsonl')
+
+            def load_dicts():
+                store = JobStore(path, fsync=False)
+                store.load()
+                return store.all()
+
+            def load_store():
+                store = JobStore(path, fsync=False)
+                store.load()
+                return store
+
+            # The dicts are measured on their own: the store that produced them is dropped
+            dicts, dict_time, dict_bytes = measure(load_dicts)
+            del dicts
+            store, store_time, store_bytes = measure(load_store)
+            page, page_time, page_bytes = measure(lambda: store.pending_page(50)[0])
+            for name, elapsed, size, count in (('dicts', dict_time, dict_bytes, jobs),
+                                               ('journal', store_time, store_bytes, jobs),
+                                               ('page', page_time, page_bytes, len(page))):
+                print(f"{jobs:>9}{name:>9}{elapsed:>8.2f}{size / 1e6:>9.1f}{size / count:>11.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/bench_job_store.py
+# Compares the journal-backed JobStore against the legacy "load, append, dump
+# the whole scheduled_jobs.json" persistence path.
+#
+# Usage: python benchmarks/bench_job_store.py [--sizes 1000,10000,100000] [--legacy-max 10000]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_store import JobStore
+
+SUBJECT = "Special Offer for You"
+BODY = "We are rolling out a new digital course, enroll ASAP!"
+
+def make_jobs(count):
+    send_time = datetime.now() + timedelta(days=1)
+    return [{
+        'id': str(uuid.uuid4()),
+        'number': f"+2547{i:08d}",
+        'subject': SUBJECT,
+        'body': BODY,
+        'send_time': send_time,
+        'status': 'pending'
+    } for i in range(count)]
+
+# --- Legacy path (mirrors the original app.py helpers) ---
+def legacy_load(path):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            try:
+                jobs_data = json.load(f)
+                for job in jobs_data:
+                    if isinstance(job.get('send_time'), str):
+                        job['send_time'] = datetime.fromisoformat(job['send_time'])
+                return jobs_data
+            except json.JSONDecodeError:
+                return []
+    return []
+
+def legacy_save(path, jobs):
+    jobs_data_to_save = []
+    for job in jobs:
+        job_copy = job.copy()
+        if isinstance(job_copy.get('send_time'), datetime):
+            job_copy['send_time'] = job_copy['send_time'].isoformat()
+        jobs_data_to_save.append(job_copy)
+    with open(path, "w") as f:
+        json.dump(jobs_data_to_save, f, indent=4)
+
+def bench_legacy(jobs, workdir):
+    path = os.path.join(workdir, 'legacy.json')
+    start = time.perf_counter()
+    for job in jobs:
+        current = legacy_load(path)
+        current.append(job)
+        legacy_save(path, current)
+    schedule_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for job in jobs[:100]:
+        current = legacy_load(path)
+        for j in current:
+            if j['id'] == job['id']:
+                j['status'] = 'sent'
+                break
+        legacy_save(path, current)
+    update_time = (time.perf_counter() - start) / min(len(jobs), 100)
+
+    start = time.perf_counter()
+    legacy_load(path)
+    load_time = time.perf_counter() - start
+
+    # Listing pending jobs: the original endpoint parsed the whole file per request
+    start = time.perf_counter()
+    [job for job in legacy_load(path) if job.get('status') == 'pending'][:50]
+    page_time = time.perf_counter() - start
+    return schedule_time, update_time, load_time, page_time, os.path.getsize(path)
+
+def bench_journal(jobs, workdir, fsync):
+    path = os.path.join(workdir, 'journal.jsonl')
+    store = JobStore(path, fsync=fsync)
+    store.load()
+    campaign = {
+        'id': str(uuid.uuid4()),
+        'subject': SUBJECT,
+        'body': BODY,
+        'send_time': jobs[0]['send_time']
+    }
+    start = time.perf_counter()
+    rows = store.add_campaign(campaign, [job['number'] for job in jobs])
+    schedule_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for row in rows[:100]:
+        store.update_status(row['id'], 'sent')
+    update_time = (time.perf_counter() - start) / min(len(jobs), 100)
+
+    start = time.perf_counter()
+    JobStore(path).load()
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(100):
+        store.pending_page(50)
+    page_time = (time.perf_counter() - start) / 100
+    return schedule_time, update_time, load_time, page_time, os.path.getsize(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Journal vs. legacy JSON job persistence benchmark.")
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--legacy-max', type=int, default=10000,
+                        help='skip the legacy JSON path above this many jobs (it is quadratic)')
+    parser.add_argument('--no-fsync', action='store_true')
+    args = parser.parse_args()
+
+    print(f"{'backend':<10}{'jobs':>9}{'schedule s':>13}{'update ms':>12}{'load s':>10}{'page ms':>10}{'file MB':>10}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        jobs = make_jobs(size)
+        with tempfile.TemporaryDirectory() as workdir:
+            rows = [('journal', bench_journal(jobs, workdir, not args.no_fsync))]
+            if size <= args.legacy_max:
+                rows.append(('json', bench_legacy(jobs, workdir)))
+            for name, (schedule_time, update_time, load_time, page_time, size_bytes) in rows:
+                print(f"{name:<10}{size:>9}{schedule_time:>13.3f}{update_time * 1000:>12.3f}"
+                      f"{load_time:>10.3f}{page_time * 1000:>10.3f}{size_bytes / 1e6:>10.2f}")
+            if size > args.legacy_max:
+                print(f"{'json':<10}{size:>9}{'skipped (--legacy-max)':>55}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_message_store.py
+# Measures what deduplicating message bodies saves. A legacy
+# scheduled_jobs.json with the same long body embedded in every job is
+# read two ways: decoding the whole file with json.load (what the old
+# loader did before migrating) and the job store's streaming migration into
+# the content-addressed journal. Peak traced memory, time and file sizes are
+# reported, plus the journal size when many campaigns reuse one text.
+#
+# Usage: python benchmarks/bench_message_store.py [--jobs 10000,100000] [--body-size 2000] [--campaigns 1000]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_store import JobStore
+
+def write_legacy_file(path, jobs, body):
+    send_time = (datetime.now() + timedelta(days=1)).isoformat()
+    with open(path, 'w') as f:
+        json.dump([{'id': str(uuid.uuid4()), 'number': f"+2547{i:08d}", 'subject': 'Special Offer',
+                    'body': body, 'send_time': send_time, 'status': 'pending'} for i in range(jobs)], f)
+
+def traced(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def json_load(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed message store benchmark.")
+    parser.add_argument('--jobs', default='10000,100000')
+    parser.add_argument('--body-size', type=int, default=2000, help='characters per message body')
+    parser.add_argument('--campaigns', type=int, default=1000, help='campaigns sharing one body for the journal size test')
+    args = parser.parse_args()
+    body = ('Limited offer! ' * (args.body_size // 15 + 1))[:args.body_size]
+
+    print(f"{'jobs':>8}{'json MB':>9}{'load s':>8}{'load peak MB':>14}{'migrate s':>11}{'migrate peak MB':>17}{'journal MB':>12}")
+    for jobs in [int(n) for n in args.jobs.split(',')]:
+        with tempfile.TemporaryDirectory() as workdir:
+            legacy_path = os.path.join(workdir, 'scheduled_jobs.json')
+            write_legacy_file(legacy_path, jobs, body)
+            _, load_time, load_peak = traced(lambda: json_load(legacy_path))
+
+            store = JobStore(os.path.join(workdir, 'scheduled_jobs.jsonl'), legacy_path=legacy_path, fsync=False)
+            _, stream_time, stream_peak = traced(store.load)
+            print(f"{jobs:>8}{os.path.getsize(legacy_path) / 1e6:>9.1f}{load_time:>8.2f}{load_peak / 1e6:>14.1f}"
+                  f"{stream_time:>11.2f}{stream_peak / 1e6:>17.1f}{os.path.getsize(store.path) / 1e6:>12.1f}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        store = JobStore(os.path.join(workdir, 'scheduled_jobs.jsonl'), fsync=False)
+        store.load()
+        send_time = datetime.now() + timedelta(days=1)
+        for _ in range(args.campaigns):
+            store.add_campaign({'id': str(uuid.uuid4()), 'subject': 'Special Offer', 'body': body,
+                                'send_time': send_time}, ['+254700000000'])
+        inline_size = args.campaigns * len(json.dumps({'subject': 'Special Offer', 'body': body}))
+        print(f"\n{args.campaigns} campaigns with one body: journal {os.path.getsize(store.path) / 1e6:.2f} MB "
+              f"(inline bodies alone would add {inline_size / 1e6:.2f} MB)")
+
+if __name__ == '__main__':
+    main()
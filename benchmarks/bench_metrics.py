@@ -0,0 +1,70 @@
+# benchmarks/bench_metrics.py
+# Measures what the telemetry hooks cost on the send path. Each hot-path
+# recording call (counter increment, histogram observe, timed block) is run
+# N times from several threads with recording on and off (WHATSAPP_METRICS=0),
+# and a /metrics scrape of the full registry is timed.
+#
+# Usage: python benchmarks/bench_metrics.py [--calls 200000] [--threads 4]
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+
+def run_threads(fn, calls, threads):
+    """Runs fn calls times spread over threads and returns nanoseconds per call."""
+    per_thread = calls // threads
+
+    def work():
+        for _ in range(per_thread):
+            fn()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description="Telemetry hook overhead benchmark.")
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    sent_total = metrics.MESSAGES_TOTAL.labels('fake', 'ok')
+    send_seconds = metrics.STAGE_SECONDS.labels('send')
+
+    def timed_block():
+        with send_seconds.time():
+            pass
+
+    hooks = (('counter inc', sent_total.inc),
+             ('histogram observe', lambda: send_seconds.observe(0.25)),
+             ('timed block', timed_block),
+             ('empty call', lambda: None))
+
+    print(f"{'hook':<20}{'on ns/call':>12}{'off ns/call':>13}")
+    for name, hook in hooks:
+        metrics.ENABLED = True
+        enabled = run_threads(hook, args.calls, args.threads)
+        metrics.ENABLED = False
+        disabled = run_threads(hook, args.calls, args.threads)
+        print(f"{name:<20}{enabled:>12.0f}{disabled:>13.0f}")
+    metrics.ENABLED = True
+
+    for stage in ('render', 'send', 'open_chat', 'type', 'persist'):
+        metrics.STAGE_SECONDS.labels(stage).observe(0.1)
+    start = time.perf_counter()
+    scrapes = 200
+    for _ in range(scrapes):
+        text = metrics.render()
+    print(f"\nscrape: {(time.perf_counter() - start) / scrapes * 1e6:.0f} us for {len(text)} bytes")
+
+if __name__ == '__main__':
+    main()
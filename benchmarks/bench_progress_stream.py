@@ -0,0 +1,72 @@
+# benchmarks/bench_progress_stream.py
+# Measures the cost of the live progress stream as dashboards are added.
+# One sender thread reports N recipient outcomes to the ProgressBroadcaster
+# while S subscriber threads drain the SSE stream (as Flask would, minus
+# the socket) until the campaign's completion event. Reports the
+# sender's time per recorded send, the frames and bytes each subscriber
+# received, and how many wake-ups it took them.
+#
+# Usage: python benchmarks/bench_progress_stream.py [--sends 100000] [--subscribers 0,1,12,100]
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from progress_stream import ProgressBroadcaster
+
+def drain(broadcaster, stats, ready):
+    """Consumes one subscription until the broadcaster is closed."""
+    frames = wakeups = size = 0
+    stream = broadcaster.subscribe()
+    next(stream)
+    ready.release()
+    for chunk in stream:
+        wakeups += 1
+        frames += chunk.count('\n\n')
+        size += len(chunk)
+        # The last event (or a catch-up snapshot taken after it) marks the campaign completed
+        if '"status":"completed"' in chunk:
+            break
+    stream.close()
+    stats.append((frames, wakeups, size))
+
+def run(sends, subscribers):
+    broadcaster = ProgressBroadcaster(buffer_size=10000)
+    stats = []
+    ready = threading.Semaphore(0)
+    threads = [threading.Thread(target=drain, args=(broadcaster, stats, ready)) for _ in range(subscribers)]
+    for thread in threads:
+        thread.start()
+    for _ in range(subscribers):
+        ready.acquire()
+
+    start = time.perf_counter()
+    broadcaster.campaign_started('bench', sends, kind='immediate')
+    for i in range(sends):
+        broadcaster.record('bench', f"+2547{i:08d}", None if i % 100 else 'timeout', job_id=str(i))
+    broadcaster.campaign_finished('bench')
+    elapsed = time.perf_counter() - start
+    for thread in threads:
+        thread.join()
+    broadcaster.close()
+    return elapsed, stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Progress stream fan-out benchmark.")
+    parser.add_argument('--sends', type=int, default=100000)
+    parser.add_argument('--subscribers', default='0,1,12,100')
+    args = parser.parse_args()
+
+    print(f"{'subscribers':>12}{'us/send':>9}{'frames/sub':>12}{'wakeups/sub':>13}{'MB/sub':>8}")
+    for subscribers in [int(n) for n in args.subscribers.split(',')]:
+        elapsed, stats = run(args.sends, subscribers)
+        frames = sum(s[0] for s in stats) / max(1, len(stats))
+        wakeups = sum(s[1] for s in stats) / max(1, len(stats))
+        size = sum(s[2] for s in stats) / max(1, len(stats))
+        print(f"{subscribers:>12}{elapsed / args.sends * 1e6:>9.1f}{frames:>12.0f}{wakeups:>13.0f}{size / 1e6:>8.1f}")
+
+if __name__ == '__main__':
+    main()
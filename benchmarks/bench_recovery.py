@@ -0,0 +1,65 @@
+# benchmarks/bench_recovery.py
+# Measures how long restart recovery reads the send ledger, as the number of
+# messages sent before the crash grows and as the number left in flight grows.
+# Each message goes through the ledger as the send pipeline drives it (claim,
+# attempt, confirm) and is settled in groups of --flush-max, as the state
+# manager does once statuses are stored; the last --in-flight messages are
+# left unsettled. Reports the ledger's size on disk and the time to reload it.
+#
+# Usage: python benchmarks/bench_recovery.py [--sent 10000,100000,1000000] [--in-flight 0,100,1000,10000]
+#            [--flush-max 500]
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from send_ledger import SendLedger
+
+def fill(path, sent, in_flight, flush_max):
+    ledger = SendLedger(path, fsync=False)
+    unsettled = []
+    for i in range(sent + in_flight):
+        job_id = f"job-{i}"
+        ledger.claim([job_id])
+        ledger.begin(job_id, 1)
+        ledger.confirm(job_id, True)
+        if i < sent:
+            unsettled.append(job_id)
+            if len(unsettled) >= flush_max:
+                ledger.settle(unsettled)
+                unsettled = []
+    ledger.settle(unsettled)
+    ledger.close()
+
+def recover(path):
+    start = time.perf_counter()
+    ledger = SendLedger(path)
+    entries = ledger.in_flight()
+    return time.perf_counter() - start, len(entries)
+
+def main():
+    parser = argparse.ArgumentParser(description="Send ledger recovery benchmark.")
+    parser.add_argument('--sent', default='10000,100000,1000000')
+    parser.add_argument('--in-flight', default='0,100,1000,10000')
+    parser.add_argument('--flush-max', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'sent':>10}{'in flight':>11}{'ledger KB':>11}{'recover ms':>12}{'found':>8}")
+    for sent in [int(n) for n in args.sent.split(',')]:
+        for in_flight in [int(n) for n in args.in_flight.split(',')]:
+            workdir = tempfile.mkdtemp(prefix='bench_recovery_')
+            try:
+                path = os.path.join(workdir, 'send_ledger.jsonl')
+                fill(path, sent, in_flight, args.flush_max)
+                elapsed, found = recover(path)
+                assert found == in_flight
+                print(f"{sent:>10}{in_flight:>11}{os.path.getsize(path) / 1024:>11.1f}{elapsed * 1e3:>12.2f}{found:>8}")
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
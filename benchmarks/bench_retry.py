@@ -0,0 +1,191 @@
+# benchmarks/bench_retry.py
+# Measures how retrying transient failures affects a campaign's delivery and
+# send time. N recipients go through a SendPipeline on the FakeTransport with
+# a transient failure rate, handled three ways: no retries, retries that
+# sleep out their backoff on the worker (the worker is held while waiting),
+# and retries put on the dispatcher's timing wheel by the RetryEngine (the
+# worker moves on to the next message). Reports wall time, messages sent,
+# messages given up on and how much of the wall time the worker spent idle.
+#
+# It then checks that a pywhatkit failure is retried only when it happened
+# before the WhatsApp Web tab opened: a stand-in pywhatkit module fails once
+# at each step of a send (bad number, opening the browser, typing, closing
+# the tab after Enter) and the message goes through the pipeline with
+# retries. The run FAILS (exit status 1) if a message is delivered twice, or
+# if a failure while opening the browser is not retried.
+#
+# Usage: python benchmarks/bench_retry.py [--messages 2000] [--failure-rate 0.05] [--latency 0.001]
+#            [--base-delay 0.05] [--max-attempts 5]
+import argparse
+import os
+import sys
+import threading
+import time
+import types
+import webbrowser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatcher import Dispatcher
+from retry_engine import RetryEngine, RetryPolicy
+from send_pipeline import SendPipeline, SendTask
+from transport import FakeTransport, PywhatkitTransport, SendTransport, is_transient
+
+class SleepingRetryTransport(SendTransport):
+    """Retries inside the send call, sleeping out each backoff on the worker thread."""
+    name = 'sleeping_retry'
+
+    def __init__(self, inner, policy):
+        self.inner = inner
+        self.policy = policy
+        self.slept = 0.0
+
+    def send(self, phone_number, message):
+        attempt = 1
+        while True:
+            try:
+                return self.inner.send(phone_number, message)
+            except Exception as e:
+                if not is_transient(e) or attempt >= self.policy.max_attempts:
+                    raise
+                delay = self.policy.delay(attempt)
+                self.slept += delay
+                time.sleep(delay)
+                attempt += 1
+
+def run(mode, args):
+    transport = FakeTransport(latency=args.latency, failure_rate=args.failure_rate, seed=1)
+    policy = RetryPolicy(max_attempts=args.max_attempts, base_delay=args.base_delay,
+                         max_delay=args.base_delay * 100, seed=1)
+    if mode == 'sleeping':
+        transport = SleepingRetryTransport(transport, policy)
+    pipeline = SendPipeline([transport], max_queued=args.messages, pacing=False)
+    dispatcher = Dispatcher(lambda key, limit, slot_time: (0, True), capacity=1e6, tick=0.005)
+    outcomes = {'sent': 0, 'gave_up': 0}
+    lock = threading.Lock()
+
+    def resubmit(task, slot_time):
+        return pipeline.submit(task)
+
+    def exhausted(task, error):
+        pass
+
+    retries = RetryEngine(dispatcher, resubmit, exhausted, policy=policy)
+
+    def done(task, error):
+        if error is not None and mode == 'scheduled' and retries.handle_failure(task, error) == 'retry':
+            return
+        with lock:
+            outcomes['sent' if error is None else 'gave_up'] += 1
+
+    pipeline.start()
+    dispatcher.start()
+    start = time.perf_counter()
+    for i in range(args.messages):
+        pipeline.submit(SendTask('bench', f"job-{i}", f"+2547{i:08d}", "Hello", callback=done))
+    while True:
+        pipeline.wait_campaign('bench')
+        if not retries.waiting('bench'):
+            break
+        retries.wait_campaign('bench')
+    elapsed = time.perf_counter() - start
+    dispatcher.stop()
+    pipeline.stop()
+    slept = transport.slept if mode == 'sleeping' else 0.0
+    return elapsed, outcomes['sent'], outcomes['gave_up'], slept
+
+class CountryCodeException(Exception):
+    """Named like pywhatkit's, which the transport matches by name."""
+
+class StandInBrowser(webbrowser.BaseBrowser):
+    """Registered as the preferred browser, so pywhatkit's webbrowser.open() comes here."""
+
+    def __init__(self, stand_in):
+        super().__init__('stand-in')
+        self.stand_in = stand_in
+
+    def open(self, url, new=0, autoraise=True):
+        self.stand_in.fail('open')
+        return True
+
+class StandInPywhatkit(types.ModuleType):
+    """The steps of pywhatkit.sendwhatmsg_instantly, failing once at fail_at; delivered counts Enter presses."""
+
+    def __init__(self, fail_at):
+        super().__init__('pywhatkit')
+        self.fail_at = fail_at
+        self.delivered = 0
+
+    def fail(self, step):
+        if step == self.fail_at:
+            self.fail_at = None
+            raise (CountryCodeException if step == 'number' else RuntimeError)(f"stand-in failure at {step}")
+
+    def sendwhatmsg_instantly(self, phone_no, message, wait_time=15, tab_close=False, close_time=3):
+        self.fail('number')
+        webbrowser.open(f"https://web.whatsapp.com/send?phone={phone_no}")
+        self.fail('type')
+        self.delivered += 1
+        if tab_close:
+            self.fail('tab_close')
+
+def check_pywhatkit(step):
+    """Sends one message through pywhatkit failing once at step. Returns (outcome, attempts, deliveries)."""
+    stand_in = StandInPywhatkit(step)
+    sys.modules['pywhatkit'] = stand_in
+    webbrowser.register('stand-in', None, StandInBrowser(stand_in), preferred=True)
+    pipeline = SendPipeline([PywhatkitTransport(wait_time=0)], pacing=False)
+    pipeline.transports[0].inter_message_delay = 0
+    dispatcher = Dispatcher(lambda key, limit, slot_time: (0, True), capacity=1e6, tick=0.005)
+    retries = RetryEngine(dispatcher, lambda task, slot_time: pipeline.submit(task), lambda task, error: None,
+                          policy=RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.01, seed=1))
+    outcome = {}
+
+    def done(task, error):
+        if error is not None and retries.handle_failure(task, error) == 'retry':
+            return
+        outcome['result'] = 'sent' if error is None else type(error).__name__
+        outcome['attempts'] = task.attempts
+
+    dispatcher.start()
+    pipeline.submit(SendTask('check', 'job-1', '+254700000000', 'Hello', callback=done))
+    while True:
+        pipeline.wait_campaign('check')
+        if not retries.waiting('check'):
+            break
+        retries.wait_campaign('check')
+    dispatcher.stop()
+    pipeline.stop()
+    return outcome['result'], outcome['attempts'], stand_in.delivered
+
+def main():
+    parser = argparse.ArgumentParser(description="Transient failure retry benchmark.")
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--failure-rate', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.001)
+    parser.add_argument('--base-delay', type=float, default=0.05)
+    parser.add_argument('--max-attempts', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'mode':<11}{'wall s':>9}{'sent':>8}{'gave up':>9}{'worker idle s':>15}")
+    for mode in ('none', 'sleeping', 'scheduled'):
+        elapsed, sent, gave_up, slept = run(mode, args)
+        print(f"{mode:<11}{elapsed:>9.2f}{sent:>8}{gave_up:>9}{slept:>15.2f}")
+
+    print()
+    print(f"{'pywhatkit fails at':<20}{'outcome':>24}{'attempts':>10}{'delivered':>11}")
+    failures = []
+    for step in ('number', 'open', 'type', 'tab_close'):
+        result, attempts, delivered = check_pywhatkit(step)
+        print(f"{step:<20}{result:>24}{attempts:>10}{delivered:>11}")
+        if delivered > 1:
+            failures.append(f"a failure at {step} delivered the message {delivered} times")
+        if step == 'open' and result != 'sent':
+            failures.append(f"a failure while opening the browser was not retried ({result})")
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: pywhatkit failures are retried only before the browser opened; nothing was delivered twice.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_scale_out.py
+# Measures how send throughput scales with the number of sender processes.
+# N recipients are submitted to a BrokerPipeline and sent by 1, 2, 4, ...
+# sender_worker.py processes, each with its own FakeTransport, pulling shards
+# from a fresh broker database; every outcome comes back to a callback in this
+# process. Timing starts once all the senders have checked in. Reports wall
+# time, messages/sec and the speedup over one sender. With --kill-one a sender
+# is killed halfway through each run to show its shard being taken over.
+#
+# Usage: python benchmarks/bench_scale_out.py [--workers 1,2,4,8] [--messages 2000] [--latency 0.01]
+#            [--shard-size 20] [--kill-one]
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from broker import BrokerPipeline, SqliteBroker, WorkerPool
+from send_pipeline import SendTask
+
+def run(workers, args):
+    workdir = tempfile.mkdtemp(prefix='bench_scale_out_')
+    path = os.path.join(workdir, 'broker.db')
+    broker = SqliteBroker(path, lease_seconds=args.lease_seconds)
+    pool = WorkerPool(workers, path, 'fake', options={'latency': args.latency}, pacing=False,
+                      lease_seconds=args.lease_seconds, stdout=subprocess.DEVNULL)
+    outcomes = {'ok': 0, 'failed': 0}
+    lock = threading.Lock()
+
+    def done(task, error):
+        with lock:
+            outcomes['ok' if error is None else 'failed'] += 1
+
+    pipeline = BrokerPipeline(broker, {'done': done}.__getitem__, workers=pool, max_queued=args.messages,
+                              shard_size=args.shard_size)
+    try:
+        pipeline.start()
+        while len(broker.workers()) < workers:
+            time.sleep(0.01)
+        killer = None
+        if args.kill_one:
+            def kill_one():
+                while outcomes['ok'] < args.messages // 2:
+                    time.sleep(0.01)
+                os.kill(pool.pids()[0], signal.SIGKILL)
+            killer = threading.Thread(target=kill_one, daemon=True)
+            killer.start()
+        start = time.perf_counter()
+        for i in range(args.messages):
+            pipeline.submit(SendTask('bench', f"job-{i}", f"+2547{i:08d}", "Hello", callback=done))
+        pipeline.wait_campaign('bench')
+        elapsed = time.perf_counter() - start
+        pipeline.stop(timeout=10)
+        return elapsed, outcomes['ok'], outcomes['failed']
+    finally:
+        pool.stop(timeout=10)
+        broker.db.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sender process scale-out benchmark.")
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--shard-size', type=int, default=20)
+    parser.add_argument('--lease-seconds', type=float, default=2.0)
+    parser.add_argument('--kill-one', action='store_true')
+    args = parser.parse_args()
+
+    print(f"{'senders':>8}{'wall s':>9}{'msgs/s':>10}{'speedup':>9}{'sent':>7}{'failed':>8}")
+    base = None
+    for workers in [int(n) for n in args.workers.split(',')]:
+        elapsed, sent, failed = run(workers, args)
+        rate = (sent + failed) / elapsed
+        base = base or rate
+        print(f"{workers:>8}{elapsed:>9.2f}{rate:>10.1f}{rate / base:>8.2f}x{sent:>7}{failed:>8}")
+
+if __name__ == '__main__':
+    main()
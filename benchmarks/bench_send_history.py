@@ -0,0 +1,88 @@
+# benchmarks/bench_send_history.py
+# Compares answering send history questions from pywhatkit's free-text
+# PyWhatKit_DB.txt (one regex pass over the whole file per question) with
+# the rotating, block-indexed send history log. N records spread over many
+# numbers and campaigns are written both ways; then the same lookups by
+# number, by campaign and by a one-hour time range are timed, along with
+# write throughput and on-disk size.
+#
+# Usage: python benchmarks/bench_send_history.py [--records 100000,1000000] [--numbers 50000] [--campaigns 200]
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from send_history import SendHistoryLog
+
+MESSAGE = "Subject: Special Offer\n\nHello, enroll now and get 20% off this week only!"
+
+def entries(count, numbers, campaigns, start):
+    for i in range(count):
+        yield {'sent_at': start + timedelta(seconds=i), 'number': f"+2547{(i * 7919) % numbers:08d}",
+               'campaign_id': f"campaign-{i * campaigns // count}", 'job_id': None,
+               'status': 'sent' if i % 50 else 'failed', 'error': None if i % 50 else 'timeout',
+               'latency': 4.2, 'lag': 0.8, 'message': MESSAGE}
+
+def write_pywhatkit_log(path, count, numbers, campaigns, start):
+    with open(path, 'w', encoding='utf-8') as f:
+        for entry in entries(count, numbers, campaigns, start):
+            sent_at = entry['sent_at']
+            f.write(f"Date: {sent_at.day}/{sent_at.month}/{sent_at.year}\nTime: {sent_at.hour}:{sent_at.minute}\n"
+                    f"Phone Number: {entry['number']}\nMessage: {MESSAGE}\n{'-' * 20}\n")
+
+def regex_scan(path, pattern):
+    """Counts the log blocks a regex matches, reading the whole file like a report script would."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return len(re.findall(pattern, f.read()))
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Send history log benchmark.")
+    parser.add_argument('--records', default='100000,1000000')
+    parser.add_argument('--numbers', type=int, default=50000)
+    parser.add_argument('--campaigns', type=int, default=200)
+    args = parser.parse_args()
+    start = datetime(2026, 1, 1)
+
+    print(f"{'records':>9}{'query':>10}{'text s':>9}{'log ms':>9}{'hits':>7}")
+    for count in [int(n) for n in args.records.split(',')]:
+        with tempfile.TemporaryDirectory() as workdir:
+            text_path = os.path.join(workdir, 'PyWhatKit_DB.txt')
+            write_pywhatkit_log(text_path, count, args.numbers, args.campaigns, start)
+            log = SendHistoryLog(os.path.join(workdir, 'send_history'), max_segment_bytes=8 * 1024 * 1024)
+            _, write_time = timed(lambda: log.append_many(entries(count, args.numbers, args.campaigns, start)))
+            log.close()
+            log = SendHistoryLog(os.path.join(workdir, 'send_history'), max_segment_bytes=8 * 1024 * 1024)
+            _, load_time = timed(log.load)
+            log_bytes = sum(entry.stat().st_size for entry in os.scandir(log.directory))
+
+            number = f"+2547{(count // 2 * 7919) % args.numbers:08d}"
+            middle = start + timedelta(seconds=count // 2)
+            hour = [middle.replace(minute=0, second=0) + timedelta(hours=h) for h in (0, 1)]
+            queries = (
+                ('number', rf"Phone Number: {re.escape(number)}\n",
+                 lambda: log.query(number=number, limit=count)),
+                # The text log has no campaign ids; a number-and-day match is the closest a report could get
+                ('campaign', None,
+                 lambda: log.query(campaign_id=f"campaign-{args.campaigns // 2}", limit=count)),
+                ('hour', rf"Date: {middle.day}/{middle.month}/{middle.year}\nTime: {middle.hour}:\d+\n",
+                 lambda: log.query(start=hour[0], end=hour[1], limit=count)),
+            )
+            for name, pattern, query in queries:
+                text_time = timed(lambda: regex_scan(text_path, pattern))[1] if pattern else float('nan')
+                hits, log_time = timed(query)
+                print(f"{count:>9}{name:>10}{text_time:>9.2f}{log_time * 1000:>9.1f}{len(hits):>7}")
+            print(f"{count:>9} write {count / write_time:,.0f} records/s, load {load_time * 1000:.0f} ms, "
+                  f"text {os.path.getsize(text_path) / 1e6:.1f} MB, log {log_bytes / 1e6:.1f} MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+# benchmarks/bench_send_throughput.py
+# Pushes synthetic recipients through the app's scheduling and sending paths
+# using the in-process FakeTransport, and reports messages/sec, p50/p99
+# per-message latency and peak RSS. No browser or WhatsApp account is needed.
+#
+# Usage: python benchmarks/bench_send_throughput.py [--sizes 10000,100000,1000000]
+#            [--latency 0] [--jitter 0] [--failure-rate 0] [--workers 1] [--campaigns 1] [--pacing]
+#            [--flush-interval 1.0] [--flush-max 500] [--retry-attempts 1]
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("WHATSAPP_TRANSPORT", "fake")
+import app
+from contact_store import ContactStore
+from dead_letters import DeadLetterQueue
+from job_store import JobStore
+from retry_engine import RetryPolicy
+from send_ledger import SendLedger
+from send_pipeline import SendPipeline
+from state_manager import StateManager
+from transport import FakeTransport, SendTransport
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+class TimingTransport(SendTransport):
+    """Wraps a transport and records the latency of every send call."""
+    name = 'timing'
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.latencies = []
+
+    def send(self, phone_number, message):
+        start = time.perf_counter()
+        try:
+            self.inner.send(phone_number, message)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def peak_rss_mb():
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def report(label, count, elapsed, latencies):
+    latencies.sort()
+    rate = count / elapsed if elapsed else float('inf')
+    if latencies:
+        p50, p99 = f"{percentile(latencies, 50) * 1e6:.1f}", f"{percentile(latencies, 99) * 1e6:.1f}"
+    else:
+        p50 = p99 = '-'
+    print(f"{label:<22}{count:>10}{elapsed:>10.2f}{rate:>12.0f}{p50:>11}{p99:>11}{peak_rss_mb():>10.1f}")
+
+def make_pipeline(fake, args):
+    """Replaces the app's send pipeline with one wrapping the fake transport in timing shims."""
+    transports = [TimingTransport(fake) for _ in range(args.workers)]
+    app.send_pipeline = SendPipeline(transports, max_queued=args.queue_size, pacing=args.pacing,
+                                     pacer_options={'initial_rate': args.max_rate, 'max_rate': args.max_rate},
+                                     ledger=app.ledger)
+    return transports
+
+def collect_latencies(transports):
+    app.send_pipeline.stop()
+    return [latency for transport in transports for latency in transport.latencies]
+
+def run(size, args):
+    numbers = [f"+2547{i:08d}" for i in range(size)]
+    fake = FakeTransport(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate, seed=1)
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        app.job_store = JobStore(os.path.join(workdir, 'jobs.jsonl'), fsync=args.fsync)
+        # Every scheduled send records its attempt and outcome in the ledger, fsynced with --fsync
+        app.ledger = SendLedger(os.path.join(workdir, 'send_ledger.jsonl'), fsync=args.fsync)
+        app.state_manager = StateManager(app.job_store, flush_interval=args.flush_interval,
+                                         flush_max=args.flush_max, on_flush=app.ledger.settle)
+        app.dead_letters = DeadLetterQueue(os.path.join(workdir, 'dead_letters.jsonl'))
+        # Failed sends are retried without backoff, or dead-lettered straight away with one attempt
+        app.retries.policy = RetryPolicy(max_attempts=args.retry_attempts, base_delay=0, max_delay=0)
+        if args.retry_attempts > 1:
+            # Retries count against the dispatcher's slots; do not let its rate cap or slot length hold them back
+            app.dispatcher.capacity, app.dispatcher.slot_seconds = 1e9, 0.01
+            app.dispatcher.start()
+        # Register campaigns with the dispatcher directly instead of via the rolling loader
+        app._scheduled_until = datetime.now() + timedelta(days=2)
+
+        # Scheduling path: persist the campaigns and register one dispatcher entry each
+        campaigns = []
+        per_campaign = (size + args.campaigns - 1) // args.campaigns
+        start = time.perf_counter()
+        for i in range(args.campaigns):
+            campaign = {
+                'id': str(uuid.uuid4()),
+                'subject': f'Benchmark {i}',
+                'body': 'Synthetic benchmark message.',
+                'send_time': datetime.now() + timedelta(days=1),
+                'status': 'pending'
+            }
+            app.add_campaign_to_persistence(campaign, numbers[i * per_campaign:(i + 1) * per_campaign])
+            app.schedule_campaign(campaign)
+            campaigns.append(campaign)
+        report('schedule campaign', size, time.perf_counter() - start, [])
+        for campaign in campaigns:
+            app.dispatcher.cancel(campaign['id'])
+
+        # Scheduled sending path: release every campaign concurrently in one unbounded slot
+        transports = make_pipeline(fake, args)
+        flushes_before = app.state_manager.flushes
+        finished = {}
+        def drain(campaign_id):
+            # Releases as much as the pipeline has room for, as the dispatcher would slot by slot
+            while True:
+                room = args.queue_size - app.send_pipeline.queue_depth()
+                if room > 0 and app.send_campaign_slot(campaign_id, room, datetime.now())[1]:
+                    break
+                time.sleep(0.001)
+            app.wait_for_sends(campaign_id)
+            finished[campaign_id] = time.perf_counter() - start
+        start = time.perf_counter()
+        with quiet:
+            threads = [threading.Thread(target=drain, args=(c['id'],)) for c in campaigns]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        report('scheduled send', size, time.perf_counter() - start, collect_latencies(transports))
+        app.state_manager.flush()
+        print(f"  ledger entries left after the last flush: {app.ledger.count()}")
+        print(f"  status writes: {app.state_manager.flushes - flushes_before} for {size} messages")
+        if len(campaigns) > 1:
+            times = sorted(finished.values())
+            print(f"  campaign finish times: first {times[0]:.2f} s, last {times[-1]:.2f} s")
+
+        # Immediate sending path: pages the recipients from the contact list
+        app.contact_store = ContactStore(os.path.join(workdir, 'customer_numbers.txt'))
+        app.contact_store.add_many(numbers)
+        transports = make_pipeline(fake, args)
+        start = time.perf_counter()
+        with quiet:
+            app._send_messages_immediately(size, 'Benchmark', 'Synthetic benchmark message.')
+        report('immediate send', size, time.perf_counter() - start, collect_latencies(transports))
+        app.state_manager.stop()
+        os.chdir(ROOT)
+
+def main():
+    parser = argparse.ArgumentParser(description="Send path throughput benchmark using the fake transport.")
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated seconds per message')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=1, help='send pipeline workers (sender sessions)')
+    parser.add_argument('--campaigns', type=int, default=1, help='split recipients across concurrent campaigns')
+    parser.add_argument('--queue-size', type=int, default=1000)
+    parser.add_argument('--pacing', action='store_true', help='enable adaptive pacing (capped by --max-rate)')
+    parser.add_argument('--max-rate', type=float, default=1000.0, help='max messages/sec per worker when pacing')
+    parser.add_argument('--fsync', action='store_true', help='fsync every journal append and ledger attempt/confirmation')
+    parser.add_argument('--flush-interval', type=float, default=app.STATUS_FLUSH_INTERVAL,
+                        help='seconds status updates may stay buffered (0 writes each group at once)')
+    parser.add_argument('--flush-max', type=int, default=app.STATUS_FLUSH_MAX,
+                        help='buffered status updates that force a write')
+    parser.add_argument('--retry-attempts', type=int, default=1,
+                        help='send attempts per message; more retries --failure-rate failures at once')
+    parser.add_argument('--verbose', action='store_true', help='keep the sender print() output')
+    args = parser.parse_args()
+
+    print(f"{'stage':<22}{'msgs':>10}{'secs':>10}{'msgs/sec':>12}{'p50 us':>11}{'p99 us':>11}{'RSS MB':>10}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        run(size, args)
+
+if __name__ == '__main__':
+    main()
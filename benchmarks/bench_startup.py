@@ -0,0 +1,124 @@
+# benchmarks/bench_startup.py
+# Builds a job journal with a large backlog of scheduled campaigns and starts
+# the app against it, reporting time-to-first-request, time until the job
+# store answers and time until scheduler rehydration finishes, for the old
+# eager startup (load + register every campaign before serving) and the
+# lazy startup (serve immediately, register only campaigns within the horizon).
+#
+# Usage: python benchmarks/bench_startup.py [--campaigns 1000,10000,100000] [--recipients 10]
+#            [--horizon 3600] [--past-due 0.1]
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from job_store import JobStore
+
+JOURNAL = 'scheduled_jobs.jsonl'
+# Large enough to register every campaign, like the old startup did
+EAGER_HORIZON = 10 * 365 * 24 * 3600
+
+def build_journal(workdir, campaigns, recipients, past_due, seed=1):
+    """Writes a journal with campaigns spread over the next 30 days (a share of them already past due)."""
+    rng = random.Random(seed)
+    store = JobStore(os.path.join(workdir, JOURNAL), fsync=False, compact_min_records=10 ** 12)
+    store.load()
+    now = datetime.now()
+    numbers = [f"+2547{i:08d}" for i in range(recipients)]
+    for _ in range(campaigns):
+        if rng.random() < past_due:
+            send_time = now - timedelta(seconds=rng.uniform(3600, 7 * 24 * 3600))
+        else:
+            send_time = now + timedelta(seconds=rng.uniform(300, 30 * 24 * 3600))
+        campaign = {'id': str(uuid.uuid4()), 'subject': 'Benchmark', 'body': 'Body', 'send_time': send_time}
+        store.add_campaign(campaign, numbers)
+    return os.path.getsize(store.path)
+
+def wait_for(url, deadline=600):
+    """Polls url until it answers 200. Returns the time it took."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=deadline) as response:
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except OSError:
+            time.sleep(0.005)
+    raise RuntimeError(f"{url} did not answer within {deadline} s")
+
+def run_child(mode, horizon):
+    """Starts the app in this process (cwd is the benchmark workdir) and prints one JSON result line."""
+    os.environ['WHATSAPP_TRANSPORT'] = 'fake'
+    os.environ['WHATSAPP_SCHEDULER_HORIZON'] = str(EAGER_HORIZON if mode == 'eager' else horizon)
+    start = time.perf_counter()
+    import app
+    from werkzeug.serving import make_server
+
+    if mode == 'eager':
+        app.scheduler.start()
+        app.send_pipeline.start()
+        app.setup_scheduler()
+        rehydration = None
+    else:
+        rehydration = app.start_background_services()
+
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    wait_for(f"{base}/api/numbers?limit=1")
+    first_request = time.perf_counter() - start
+    wait_for(f"{base}/api/scheduled_messages?summary=1")
+    job_store_ready = time.perf_counter() - start
+    if rehydration is not None:
+        rehydration.join()
+    rehydrated = time.perf_counter() - start
+    entries = app.dispatcher.pending_count()
+    server.shutdown()
+    app.scheduler.shutdown(wait=False)
+    print(json.dumps({'first_request': first_request, 'job_store_ready': job_store_ready,
+                      'rehydrated': rehydrated, 'entries': entries}))
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmark with a large scheduled backlog.")
+    parser.add_argument('--campaigns', default='1000,10000,100000')
+    parser.add_argument('--recipients', type=int, default=10)
+    parser.add_argument('--horizon', type=float, default=3600)
+    parser.add_argument('--past-due', type=float, default=0.1)
+    parser.add_argument('--child', choices=['eager', 'lazy'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.horizon)
+        return
+
+    print(f"{'campaigns':>10}{'jobs':>10}{'MB':>8}  {'startup':<8}{'1st req s':>11}{'store s':>10}"
+          f"{'rehydr s':>10}{'entries':>9}")
+    for campaigns in [int(size) for size in args.campaigns.split(',')]:
+        with tempfile.TemporaryDirectory() as workdir:
+            size = build_journal(workdir, campaigns, args.recipients, args.past_due)
+            for mode in ('eager', 'lazy'):
+                with tempfile.TemporaryDirectory() as rundir:
+                    shutil.copy(os.path.join(workdir, JOURNAL), rundir)
+                    output = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), '--child', mode, '--horizon', str(args.horizon)],
+                        cwd=rundir, capture_output=True, text=True, check=True
+                    ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                print(f"{campaigns:>10}{campaigns * args.recipients:>10}{size / 1e6:>8.1f}  {mode:<8}"
+                      f"{result['first_request']:>11.3f}{result['job_store_ready']:>10.3f}"
+                      f"{result['rehydrated']:>10.3f}{result['entries']:>9}")
+
+if __name__ == '__main__':
+    main()
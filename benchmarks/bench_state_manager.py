@@ -0,0 +1,163 @@
+# benchmarks/bench_state_manager.py
+# Stress test for concurrent job status updates. N threads each mark their own
+# slice of a campaign as sent, while one reader thread polls the campaign
+# summary every few milliseconds. Three write paths are compared:
+#   legacy  - the original unlocked load/modify/dump of scheduled_jobs.json
+#   direct  - every thread calls JobStore.update_status itself (one append each)
+#   manager - updates go through StateManager's single writer thread
+# After each run the store is reloaded from disk and lost updates are counted;
+# the run FAILS (exit status 1) if the direct or manager path lost any.
+# bench_concurrent_campaigns.py checks the same for whole campaigns being sent.
+#
+# Usage: python benchmarks/bench_state_manager.py [--threads 1,4,16,64] [--updates 2000] [--no-fsync]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_store import JobStore
+from state_manager import StateManager
+
+# Seconds between summary reads of the polling reader thread (a busy UI polls every few ms)
+READ_INTERVAL = 0.002
+
+def legacy_update(path, job_id, status):
+    """Mirrors the original update_job_status_in_persistence: read, modify and rewrite the whole file."""
+    with open(path, 'r') as f:
+        jobs = json.load(f)
+    for job in jobs:
+        if job['id'] == job_id:
+            job['status'] = status
+    with open(path, 'w') as f:
+        json.dump(jobs, f)
+
+def run_legacy(workdir, job_ids, slices):
+    path = os.path.join(workdir, 'scheduled_jobs.json')
+    with open(path, 'w') as f:
+        json.dump([{'id': job_id, 'status': 'pending'} for job_id in job_ids], f)
+
+    def worker(ids):
+        for job_id in ids:
+            try:
+                legacy_update(path, job_id, 'sent')
+            except ValueError:
+                pass  # a concurrent writer truncated the file mid-read
+
+    elapsed = run_threads(worker, slices)
+    try:
+        with open(path, 'r') as f:
+            sent = sum(1 for job in json.load(f) if job['status'] == 'sent')
+    except ValueError:
+        sent = None  # interleaved rewrites left the file unreadable
+    return elapsed, sent, len(job_ids), 0
+
+def make_store(workdir, size, fsync):
+    store = JobStore(os.path.join(workdir, 'scheduled_jobs.jsonl'), fsync=fsync)
+    store.load()
+    campaign = {'id': str(uuid.uuid4()), 'subject': 'Stress', 'body': 'Body',
+                'send_time': datetime.now() + timedelta(days=1)}
+    rows = store.add_campaign(campaign, [f"+2547{i:08d}" for i in range(size)])
+    return store, [row['id'] for row in rows]
+
+def reloaded_sent(store):
+    fresh = JobStore(store.path)
+    fresh.load()
+    return sum(entry['counts'].get('sent', 0) for entry in fresh.summary())
+
+def run_threads(worker, slices, reader=None):
+    threads = [threading.Thread(target=worker, args=(ids,)) for ids in slices]
+    stop = threading.Event()
+    reader_thread = None
+    if reader is not None:
+        reader_thread = threading.Thread(target=reader, args=(stop,))
+        reader_thread.start()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    if reader_thread is not None:
+        reader_thread.join()
+    return elapsed
+
+def run_direct(store, slices):
+    reads = [0]
+
+    def worker(ids):
+        for job_id in ids:
+            store.update_status(job_id, 'sent')
+
+    def reader(stop):
+        while not stop.wait(READ_INTERVAL):
+            store.summary()
+            reads[0] += 1
+
+    elapsed = run_threads(worker, slices, reader)
+    return elapsed, reloaded_sent(store), 0, reads[0]
+
+def run_manager(store, slices):
+    manager = StateManager(store)
+    manager.start()
+    reads = [0]
+
+    def worker(ids):
+        for job_id in ids:
+            # Wait for the commit, like a caller that needs the update to be durable
+            manager.update_status(job_id, 'sent', wait=True)
+
+    def reader(stop):
+        while not stop.wait(READ_INTERVAL):
+            manager.snapshot()
+            reads[0] += 1
+
+    elapsed = run_threads(worker, slices, reader)
+    manager.stop()
+    return elapsed, reloaded_sent(store), manager.batches, reads[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent status update stress test.")
+    parser.add_argument('--threads', default='1,4,16,64')
+    parser.add_argument('--updates', type=int, default=2000, help='status updates per run (split across threads)')
+    parser.add_argument('--legacy-updates', type=int, default=200, help='updates for the (slow) legacy path')
+    parser.add_argument('--no-fsync', action='store_true')
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'path':<9}{'threads':>8}{'updates':>9}{'secs':>9}{'upd/sec':>10}{'lost':>8}{'batches':>9}{'reads':>9}")
+    for threads in [int(n) for n in args.threads.split(',')]:
+        for path in ('legacy', 'direct', 'manager'):
+            updates = args.legacy_updates if path == 'legacy' else args.updates
+            with tempfile.TemporaryDirectory() as workdir:
+                if path == 'legacy':
+                    job_ids = [str(uuid.uuid4()) for _ in range(updates)]
+                else:
+                    store, job_ids = make_store(workdir, updates, not args.no_fsync)
+                slices = [job_ids[i::threads] for i in range(threads)]
+                if path == 'legacy':
+                    elapsed, sent, batches, reads = run_legacy(workdir, job_ids, slices)
+                    batches = reads = '-'
+                elif path == 'direct':
+                    elapsed, sent, batches, reads = run_direct(store, slices)
+                    batches = updates
+                else:
+                    elapsed, sent, batches, reads = run_manager(store, slices)
+            lost = 'corrupt' if sent is None else updates - sent
+            print(f"{path:<9}{threads:>8}{updates:>9}{elapsed:>9.2f}{updates / elapsed:>10.0f}"
+                  f"{lost:>8}{batches:>9}{reads:>9}")
+            if path != 'legacy' and lost:
+                failures.append(f"{path} with {threads} threads lost {lost} update(s)")
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
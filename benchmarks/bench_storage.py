@@ -0,0 +1,97 @@
+# benchmarks/bench_storage.py
+# Compares the file backend (numbers file + job journal) with the SQLite
+# backend on the operations the app performs: bulk contact import, prefix
+# search, scheduling a campaign, per-send status updates, listing pending
+# jobs, the campaign summary and a cold start.
+#
+# Usage: python benchmarks/bench_storage.py [--sizes 10000,100000,1000000] [--updates 1000] [--no-fsync]
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contact_store import ContactStore
+from job_store import JobStore
+from sqlite_store import SqliteContactStore, SqliteDatabase, SqliteJobStore
+
+IMPORT_CHUNK = 10000
+
+def open_files(workdir, fsync):
+    contacts = ContactStore(os.path.join(workdir, 'customer_numbers.txt'))
+    jobs = JobStore(os.path.join(workdir, 'scheduled_jobs.jsonl'), fsync=fsync)
+    jobs.load()
+    return contacts, jobs
+
+def open_sqlite(workdir, fsync):
+    database = SqliteDatabase(os.path.join(workdir, 'whatsapp_sender.db'), synchronous='FULL' if fsync else 'OFF')
+    return SqliteContactStore(database), SqliteJobStore(database)
+
+def disk_usage(workdir):
+    return sum(os.path.getsize(os.path.join(workdir, name)) for name in os.listdir(workdir))
+
+def bench(opener, size, updates, fsync):
+    numbers = [f"+2547{i:08d}" for i in range(size)]
+    with tempfile.TemporaryDirectory() as workdir:
+        contacts, jobs = opener(workdir, fsync)
+        start = time.perf_counter()
+        for offset in range(0, size, IMPORT_CHUNK):
+            contacts.add_many(numbers[offset:offset + IMPORT_CHUNK])
+        import_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(100):
+            contacts.page(50, prefix=f"+2547{i:03d}")
+        search_time = (time.perf_counter() - start) / 100
+
+        campaign = {'id': str(uuid.uuid4()), 'subject': 'Benchmark', 'body': 'Body',
+                    'send_time': datetime.now() + timedelta(days=1)}
+        start = time.perf_counter()
+        rows = jobs.add_campaign(campaign, numbers)
+        schedule_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for row in rows[:updates]:
+            jobs.update_status(row['id'], 'sent')
+        update_time = (time.perf_counter() - start) / min(updates, len(rows))
+
+        start = time.perf_counter()
+        cursor = None
+        for _ in range(100):
+            _, cursor, _ = jobs.pending_page(50, cursor)
+        page_time = (time.perf_counter() - start) / 100
+
+        start = time.perf_counter()
+        jobs.summary()
+        summary_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cold_contacts, cold_jobs = opener(workdir, fsync)
+        cold_contacts.page(50)
+        cold_jobs.pending_page(50)
+        load_time = time.perf_counter() - start
+        return import_time, search_time, schedule_time, update_time, page_time, summary_time, load_time, disk_usage(workdir)
+
+def main():
+    parser = argparse.ArgumentParser(description="File vs. SQLite storage backend benchmark.")
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--updates', type=int, default=1000, help='individual status updates to time')
+    parser.add_argument('--no-fsync', action='store_true')
+    args = parser.parse_args()
+
+    print(f"{'backend':<9}{'rows':>9}{'import s':>10}{'search ms':>11}{'schedule s':>12}{'update ms':>11}"
+          f"{'page ms':>9}{'summary ms':>12}{'cold s':>8}{'disk MB':>9}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        for name, opener in (('files', open_files), ('sqlite', open_sqlite)):
+            result = bench(opener, size, args.updates, not args.no_fsync)
+            import_time, search_time, schedule_time, update_time, page_time, summary_time, load_time, size_bytes = result
+            print(f"{name:<9}{size:>9}{import_time:>10.3f}{search_time * 1000:>11.3f}{schedule_time:>12.3f}"
+                  f"{update_time * 1000:>11.3f}{page_time * 1000:>9.3f}{summary_time * 1000:>12.2f}"
+                  f"{load_time:>8.3f}{size_bytes / 1e6:>9.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_template.py
+# Measures how fast personalized messages are rendered. The template is
+# compiled once and rendered per recipient from the attribute store; as a
+# baseline the same messages are built the naive way, with one str.replace
+# per placeholder and recipient.
+#
+# Usage: python benchmarks/bench_template.py [--messages 1000000] [--fields 3]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contact_attributes import ContactAttributeStore
+from message_template import compile_template
+
+def make_template(fields):
+    placeholders = ' '.join(f"{{{{field{i}|none}}}}" for i in range(1, fields))
+    return f"Subject: Your order\n\nHi {{{{name|Customer}}}}, your order is on its way. {placeholders} Reply STOP to opt out."
+
+def naive_render(text, attributes, fields):
+    message = text.replace("{{name|Customer}}", attributes.get('name') or 'Customer')
+    for i in range(1, fields):
+        message = message.replace(f"{{{{field{i}|none}}}}", attributes.get(f'field{i}') or 'none')
+    return message
+
+def main():
+    parser = argparse.ArgumentParser(description="Message template rendering benchmark.")
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--fields', type=int, default=3, help='placeholders per message')
+    args = parser.parse_args()
+
+    text = make_template(args.fields)
+    numbers = [f"+2547{i:08d}" for i in range(args.messages)]
+    with tempfile.TemporaryDirectory() as workdir:
+        store = ContactAttributeStore(os.path.join(workdir, 'contact_attributes.jsonl'))
+        store.set_many({number: dict({'name': f"Customer {i}"}, **{f'field{f}': str(i * f) for f in range(1, args.fields)})
+                        for i, number in enumerate(numbers)})
+
+        start = time.perf_counter()
+        template = compile_template(text)
+        compile_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for number in numbers:
+            template.render(store.get(number), number)
+        compiled_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for number in numbers:
+            naive_render(text, store.get(number), args.fields)
+        naive_time = time.perf_counter() - start
+
+        assert template.render(store.get(numbers[-1]), numbers[-1]) == naive_render(text, store.get(numbers[-1]), args.fields)
+
+    print(f"{'renderer':<10}{'messages':>10}{'secs':>9}{'msg/sec':>12}{'us/msg':>9}")
+    for name, elapsed in (('compiled', compiled_time), ('naive', naive_time)):
+        print(f"{name:<10}{args.messages:>10}{elapsed:>9.2f}{args.messages / elapsed:>12.0f}"
+              f"{elapsed / args.messages * 1e6:>9.2f}")
+    print(f"template compiled once in {compile_time * 1e6:.0f} us")
+
+if __name__ == '__main__':
+    main()
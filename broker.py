@@ -0,0 +1,540 @@
+# broker.py
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import metrics
+from dispatcher import DailyWindow
+from send_pipeline import SEND_SECONDS_SMOOTHING, SendTask, sender_rate
+from sqlite_store import SqliteDatabase, SqliteSendLedger
+from transport import (TRANSPORTS, PermanentTransportError, SendInterruptedError, TransportError, check_parallel,
+                       session_options)
+
+# --- Schema ---
+BROKER_SCHEMA = """
+-- Work for the sender processes: a campaign's tasks in shards of up to shard_size
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    campaign_id TEXT NOT NULL,
+    -- Position among the campaign's shards; leasing lowest seq first takes campaigns in turn
+    seq INTEGER NOT NULL,
+    -- JSON list of tasks (job_id, number, message, planned_at, window, attempts, callback)
+    tasks TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    -- Tasks reported so far, and the task being sent (set just before the transport call)
+    progress INTEGER NOT NULL DEFAULT 0,
+    attempting INTEGER,
+    state TEXT NOT NULL DEFAULT 'ready',
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS shards_state_seq ON shards (state, seq, id);
+CREATE INDEX IF NOT EXISTS shards_campaign ON shards (campaign_id, state);
+
+-- Outcomes reported by the sender processes, until the API process has applied them
+CREATE TABLE IF NOT EXISTS results (
+    seq INTEGER PRIMARY KEY,
+    shard_id INTEGER NOT NULL,
+    campaign_id TEXT NOT NULL,
+    task TEXT NOT NULL,
+    -- 'ok', 'transient', 'permanent', 'interrupted', 'skipped' (already sent elsewhere)
+    -- or 'deferred' (came up outside its send window or inside the quiet hours; not sent)
+    outcome TEXT NOT NULL,
+    error TEXT,
+    latency REAL,
+    worker TEXT NOT NULL,
+    transport TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_campaign ON results (campaign_id);
+CREATE INDEX IF NOT EXISTS results_shard ON results (shard_id);
+
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    transport TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    heartbeat REAL NOT NULL,
+    sent INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Without a defer hook, a deferred task is handled as a transient failure and retried
+_ERRORS = {'transient': TransportError, 'permanent': PermanentTransportError, 'interrupted': SendInterruptedError,
+           'deferred': TransportError}
+
+class SqliteBroker:
+    """
+    Work queue shared by the API process and the sender processes, in one
+    SQLite database (WAL mode, so every process reads while one writes).
+
+    The API process enqueues tasks in shards. A sender process leases one
+    shard at a time, renewing the lease as it goes, and reports every task
+    in the same transaction that advances the shard and confirms the send
+    in the ledger (the send_ledger table of the same database). A sender
+    that dies stops renewing; once its lease runs out the shard is leased
+    by another sender, which carries on from the first unreported task. A
+    task whose send was begun but never reported is reported as
+    interrupted rather than sent again.
+    """
+
+    def __init__(self, path, lease_seconds=30.0, clock=time.time):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self.db = SqliteDatabase(path)
+        self.db.conn.executescript(BROKER_SCHEMA)
+
+    def ledger(self, owner=None, lease_seconds=3600.0):
+        """Returns a send ledger on the broker's database, shared by every process using it."""
+        return SqliteSendLedger(self.db, owner=owner, lease_seconds=lease_seconds, clock=self.clock)
+
+    # --- API Side ---
+    def enqueue(self, campaign_id, tasks, shard_size):
+        """Stores a campaign's tasks (JSON-ready dicts) in shards with one transaction."""
+        with self.db.lock, self.db.conn:
+            row = self.db.conn.execute("SELECT MAX(seq) FROM shards WHERE campaign_id = ?", (campaign_id,)).fetchone()
+            seq = (row[0] or 0) + 1
+            shards = []
+            for start in range(0, len(tasks), shard_size):
+                chunk = tasks[start:start + shard_size]
+                shards.append((campaign_id, seq, json.dumps(chunk, separators=(',', ':')), len(chunk)))
+                seq += 1
+            self.db.conn.executemany("INSERT INTO shards (campaign_id, seq, tasks, size) VALUES (?, ?, ?, ?)", shards)
+
+    def results(self, after=0, limit=1000):
+        """Returns reported outcomes after the given seq, oldest first."""
+        with self.db.lock:
+            rows = self.db.conn.execute("SELECT * FROM results WHERE seq > ? ORDER BY seq LIMIT ?",
+                                        (after, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def ack(self, seq):
+        """Drops the outcomes up to seq once applied."""
+        with self.db.lock, self.db.conn:
+            self.db.conn.execute("DELETE FROM results WHERE seq <= ?", (seq,))
+
+    def prune(self):
+        """Drops the finished shards that have no outcomes left to apply."""
+        with self.db.lock, self.db.conn:
+            self.db.conn.execute("DELETE FROM shards WHERE state = 'done' AND NOT EXISTS "
+                                 "(SELECT 1 FROM results WHERE results.shard_id = shards.id)")
+
+    def unfinished(self, campaign_id=None):
+        """Counts the tasks (of one campaign, or all) not yet reported, plus reported outcomes not yet applied."""
+        where, params = ("AND campaign_id = ? ", (campaign_id,)) if campaign_id is not None else ("", ())
+        with self.db.lock:
+            queued = self.db.conn.execute(f"SELECT COALESCE(SUM(size - progress), 0) FROM shards "
+                                          f"WHERE state != 'done' {where}", params).fetchone()[0]
+            reported = self.db.conn.execute(f"SELECT COUNT(*) FROM results WHERE 1 = 1 {where}",
+                                            params).fetchone()[0]
+        return queued + reported
+
+    def unfinished_job_ids(self):
+        """Returns the job ids of every task not yet reported, or reported but not yet applied."""
+        with self.db.lock:
+            rows = self.db.conn.execute("SELECT tasks, progress FROM shards WHERE state != 'done'").fetchall()
+            reported = self.db.conn.execute("SELECT task FROM results").fetchall()
+        job_ids = set()
+        for row in rows:
+            job_ids.update(task['job_id'] for task in json.loads(row['tasks'])[row['progress']:] if task['job_id'])
+        job_ids.update(json.loads(row['task'])['job_id'] for row in reported)
+        job_ids.discard(None)
+        return job_ids
+
+    def workers(self):
+        """Returns the registered sender processes with their heartbeat age and counters."""
+        now = self.clock()
+        with self.db.lock:
+            rows = self.db.conn.execute("SELECT * FROM workers ORDER BY id").fetchall()
+        return [dict(row, heartbeat_age=round(now - row['heartbeat'], 3),
+                     alive=now - row['heartbeat'] < self.lease_seconds) for row in rows]
+
+    # --- Sender Side ---
+    def heartbeat(self, worker_id, transport, started_at, shard_id=None):
+        """Registers the sender as alive and renews its shard's lease. Returns False if the shard was taken over."""
+        now = self.clock()
+        with self.db.lock, self.db.conn:
+            self.db.conn.execute(
+                "INSERT INTO workers (id, pid, transport, started_at, heartbeat) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET pid = excluded.pid, transport = excluded.transport, "
+                "started_at = excluded.started_at, heartbeat = excluded.heartbeat",
+                (worker_id, os.getpid(), transport, started_at, now))
+            if shard_id is None:
+                return True
+            return self.db.conn.execute(
+                "UPDATE shards SET lease_until = ? WHERE id = ? AND owner = ? AND state = 'leased'",
+                (now + self.lease_seconds, shard_id, worker_id)).rowcount == 1
+
+    def lease(self, worker_id):
+        """
+        Leases the next shard: a ready one, taking campaigns in turn, or else
+        one whose sender stopped renewing its lease. Returns a dict with id,
+        campaign_id, tasks, progress and attempting, or None if there is no work.
+        """
+        now = self.clock()
+        with self.db.lock:
+            self.db.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.db.conn.execute("SELECT * FROM shards WHERE state = 'ready' "
+                                           "ORDER BY seq, id LIMIT 1").fetchone()
+                if row is None:
+                    row = self.db.conn.execute("SELECT * FROM shards WHERE state = 'leased' AND lease_until < ? "
+                                               "ORDER BY seq, id LIMIT 1", (now,)).fetchone()
+                if row is not None:
+                    self.db.conn.execute("UPDATE shards SET state = 'leased', owner = ?, lease_until = ? WHERE id = ?",
+                                         (worker_id, now + self.lease_seconds, row['id']))
+                self.db.conn.commit()
+            except BaseException:
+                self.db.conn.rollback()
+                raise
+        if row is None:
+            return None
+        if row['state'] == 'leased':
+            print(f"[BROKER] {worker_id} took over shard {row['id']} from {row['owner']}, "
+                  f"{row['size'] - row['progress']} task(s) left.")
+        return {'id': row['id'], 'campaign_id': row['campaign_id'], 'tasks': json.loads(row['tasks']),
+                'progress': row['progress'], 'attempting': row['attempting']}
+
+    def begin(self, ledger, worker_id, shard, index):
+        """
+        Marks shard task index as being sent and, for a job, records the
+        attempt in the ledger, in one transaction. Returns 'send', 'skip'
+        (the job is being sent or was sent elsewhere) or 'lost' (the shard
+        was taken over; stop working on it).
+        """
+        task = shard['tasks'][index]
+        with self.db.lock, self.db.conn:
+            if not self.db.conn.execute(
+                    "UPDATE shards SET attempting = ?, lease_until = ? WHERE id = ? AND owner = ? AND state = 'leased'",
+                    (index, self.clock() + self.lease_seconds, shard['id'], worker_id)).rowcount:
+                return 'lost'
+            if task['job_id'] and not ledger.begin_in(self.db.conn, task['job_id'], task['attempts'] + 1):
+                return 'skip'
+        return 'send'
+
+    def report(self, ledger, worker_id, transport, shard, index, outcome, error=None, latency=None):
+        """
+        Reports the outcome of shard task index: advances the shard (finishing
+        it after its last task), settles the attempt in the ledger and stores
+        the result, in one transaction. Returns False if the shard was taken over.
+        """
+        task = shard['tasks'][index]
+        last = index + 1 >= len(shard['tasks'])
+        with self.db.lock, self.db.conn:
+            if not self.db.conn.execute(
+                    "UPDATE shards SET progress = ?, attempting = NULL, lease_until = ?, state = ? "
+                    "WHERE id = ? AND owner = ? AND state = 'leased'",
+                    (index + 1, self.clock() + self.lease_seconds, 'done' if last else 'leased', shard['id'],
+                     worker_id)).rowcount:
+                return False
+            if task['job_id'] and outcome not in ('skipped', 'deferred'):
+                ledger.confirm_in(self.db.conn, task['job_id'], outcome == 'ok')
+            self.db.conn.execute(
+                "INSERT INTO results (shard_id, campaign_id, task, outcome, error, latency, worker, transport) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (shard['id'], shard['campaign_id'], json.dumps(task, separators=(',', ':')), outcome,
+                 None if error is None else str(error), latency, worker_id, transport))
+            if outcome != 'deferred':
+                column = 'sent' if outcome == 'ok' else 'failed'
+                self.db.conn.execute(f"UPDATE workers SET {column} = {column} + 1 WHERE id = ?", (worker_id,))
+        return True
+
+    def release(self, worker_id, shard_id):
+        """Hands back a partly sent shard (its sender is stopping between tasks) for another sender to pick up."""
+        with self.db.lock, self.db.conn:
+            self.db.conn.execute("UPDATE shards SET state = 'ready', owner = NULL, lease_until = NULL "
+                                 "WHERE id = ? AND owner = ? AND state = 'leased'", (shard_id, worker_id))
+
+class BrokerPipeline:
+    """
+    Drop-in replacement for SendPipeline that hands tasks to sender
+    processes through a SqliteBroker instead of sending them in-process.
+
+    submit() buffers tasks per campaign; a collector thread writes them as
+    shards (once shard_size are waiting, or on its next round), applies the
+    outcomes the senders report by calling each task's callback, and keeps
+    the WorkerPool (if any) at full strength. Callbacks travel by name,
+    resolved with resolve_callback(name), so outcomes reported after the
+    API process restarted still reach their callback. wait_campaign() and
+    queue_depth() count tasks in the broker as well as in this process.
+    A scheduled task that a sender took up outside its send window or
+    inside the quiet hours comes back unsent and is handed to defer(task).
+    """
+
+    def __init__(self, broker, resolve_callback, workers=None, max_queued=1000, shard_size=50, poll_interval=0.05,
+                 defer=None):
+        self.broker = broker
+        self.resolve_callback = resolve_callback
+        self.defer = defer
+        self.workers = workers
+        self.max_queued = max_queued
+        self.shard_size = shard_size
+        self.poll_interval = poll_interval
+        self._buffers = {}
+        self._buffered = 0
+        self._outstanding = 0
+        # Smoothed seconds per send reported by the senders, None until one has reported
+        self._send_seconds = None
+        # Outcome applied but not yet acked, so this process never applies it twice
+        self._unacked_seq = None
+        self._cond = threading.Condition()
+        # Held while buffered tasks move to the broker, so waiters never see them in neither place
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._collector = None
+        metrics.QUEUE_DEPTH.labels('send').set_function(self.queue_depth)
+
+    # --- Lifecycle ---
+    def start(self):
+        """Starts the sender processes and the collector thread."""
+        with self._cond:
+            if self._collector is not None:
+                return
+            self._stop_event.clear()
+            if self.workers is not None:
+                self.workers.start()
+            self._collector = threading.Thread(target=self._collector_loop, name='broker-collector', daemon=True)
+            self._collector.start()
+
+    def stop(self, timeout=None):
+        """Writes out buffered tasks, stops the collector and the sender processes."""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+            collector, self._collector = self._collector, None
+        if collector is not None:
+            collector.join(timeout)
+        self._flush()
+        if self.workers is not None:
+            self.workers.stop(timeout)
+
+    # --- Submission ---
+    def submit(self, task, timeout=None):
+        """Queues a task, blocking while max_queued are outstanding. Returns False on timeout or shutdown."""
+        self.start()
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._outstanding < self.max_queued or self._stop_event.is_set(),
+                                       timeout):
+                return False
+            if self._stop_event.is_set():
+                return False
+            self._buffers.setdefault(task.campaign_id, []).append({
+                'job_id': task.job_id, 'number': task.number, 'message': task.message,
+                'planned_at': task.planned_at, 'window': str(task.window) if task.window is not None else None,
+                'attempts': task.attempts,
+                'callback': task.callback.__name__ if task.callback is not None else None
+            })
+            self._buffered += 1
+            self._outstanding += 1
+            if len(self._buffers[task.campaign_id]) >= self.shard_size:
+                self._cond.notify_all()
+            return True
+
+    def wait_campaign(self, campaign_id, timeout=None):
+        """Blocks until every task of the campaign, submitted here or before a restart, has been applied."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._flush_lock:
+                if not self._buffers.get(campaign_id) and not self.broker.unfinished(campaign_id):
+                    return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            with self._cond:
+                self._cond.wait(self.poll_interval if remaining is None else min(remaining, self.poll_interval))
+
+    def queue_depth(self):
+        return self._buffered + self.broker.unfinished()
+
+    def unfinished_job_ids(self):
+        """Job ids the senders or the collector still have to finish; recovery leaves their ledger entries alone."""
+        return self.broker.unfinished_job_ids()
+
+    def throughput(self):
+        """
+        Messages/second the live sender processes deliver at present (see
+        sender_rate), from the send times they report; before any has checked
+        in, the WorkerPool's. None if there is no sender or a sender's rate
+        is unbounded.
+        """
+        max_rate = self.workers.max_rate if self.workers is not None and self.workers.pacing else None
+        senders = [worker['transport'] for worker in self.broker.workers() if worker['alive']]
+        if not senders and self.workers is not None:
+            senders = [self.workers.transport] * self.workers.count
+        total = None
+        for name in senders:
+            transport = TRANSPORTS.get(name)
+            if transport is None:
+                continue
+            rate = sender_rate(self._send_seconds, transport, max_rate)
+            if rate is None:
+                return None
+            total = (total or 0.0) + rate
+        return total
+
+    # --- Collector ---
+    def _flush(self):
+        with self._flush_lock:
+            with self._cond:
+                buffers, self._buffers = self._buffers, {}
+                self._buffered = 0
+            for campaign_id, tasks in buffers.items():
+                self.broker.enqueue(campaign_id, tasks, self.shard_size)
+
+    def _apply(self, result):
+        task_data = json.loads(result['task'])
+        callback = None
+        if task_data['callback']:
+            try:
+                callback = self.resolve_callback(task_data['callback'])
+            except KeyError:
+                print(f"[BROKER] Unknown send callback '{task_data['callback']}' for job {task_data['job_id']}.")
+        window = DailyWindow.parse(task_data['window']) if task_data.get('window') else None
+        task = SendTask(result['campaign_id'], task_data['job_id'], task_data['number'], task_data['message'],
+                        callback, planned_at=task_data['planned_at'], window=window)
+        task.attempts = task_data['attempts']
+        outcome = result['outcome']
+        if outcome == 'skipped':
+            return
+        if outcome == 'deferred' and self.defer is not None:
+            self.defer(task)
+            return
+        task.attempts += 1
+        task.latency = result['latency']
+        error = None if outcome == 'ok' else _ERRORS[outcome](result['error'] or outcome)
+        metrics.MESSAGES_TOTAL.labels(result['transport'], 'ok' if error is None else 'failed').inc()
+        if task.latency is not None:
+            metrics.STAGE_SECONDS.labels('send').observe(task.latency)
+            self._send_seconds = task.latency if self._send_seconds is None else (
+                self._send_seconds + SEND_SECONDS_SMOOTHING * (task.latency - self._send_seconds))
+        if task.planned_at is not None:
+            metrics.SCHEDULER_LAG_SECONDS.observe(max(0.0, time.time() - task.planned_at))
+        if task.callback is not None:
+            try:
+                task.callback(task, error)
+            except Exception as e:
+                print(f"[BROKER] Callback for job {task.job_id} failed: {e}")
+
+    def _collect(self):
+        """
+        Applies reported outcomes in order, acking each one as soon as it is
+        applied, so a crash replays at most the outcome being applied.
+        Returns how many were applied.
+        """
+        if self._unacked_seq is not None:
+            # Applied in an earlier round whose ack failed: ack it before reading it back
+            self.broker.ack(self._unacked_seq)
+            self._unacked_seq = None
+        results = self.broker.results()
+        for result in results:
+            try:
+                self._apply(result)
+            except Exception as e:
+                print(f"[BROKER] Could not apply outcome {result['seq']}: {e}")
+            self._unacked_seq = result['seq']
+            self.broker.ack(result['seq'])
+            self._unacked_seq = None
+            with self._cond:
+                # Tasks submitted before a restart were never counted here
+                self._outstanding = max(0, self._outstanding - 1)
+                self._cond.notify_all()
+        if results:
+            self.broker.prune()
+        return len(results)
+
+    def _collector_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self._flush()
+                applied = self._collect()
+                if self.workers is not None:
+                    self.workers.check()
+            except Exception as e:
+                print(f"[BROKER] Collector error: {e}")
+                applied = 0
+            if not applied:
+                with self._cond:
+                    if not any(len(tasks) >= self.shard_size for tasks in self._buffers.values()):
+                        self._cond.wait(self.poll_interval)
+
+class WorkerPool:
+    """
+    Runs count sender processes (sender_worker.py) against a broker
+    database and starts a replacement for any that exits. Each process
+    gets its own transport (for browser_session, its own browser profile),
+    so each is a separate sender session. With quiet_hours (a DailyWindow)
+    the senders hold back scheduled tasks during them.
+    """
+
+    def __init__(self, count, broker_path, transport, options=None, max_rate=1.0, pacing=True, lease_seconds=30.0,
+                 worker_prefix='sender', stdout=None, quiet_hours=None):
+        check_parallel(transport, count)
+        self.count = count
+        self.broker_path = broker_path
+        self.lease_seconds = lease_seconds
+        self.transport = transport
+        self.options = options or {}
+        self.max_rate = max_rate
+        self.pacing = pacing
+        self.worker_prefix = worker_prefix
+        self.quiet_hours = quiet_hours
+        # Where the senders' output goes (None: this process's stdout)
+        self.stdout = stdout
+        self._processes = {}
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    def _command(self, index):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sender_worker.py')
+        worker_id = f"{self.worker_prefix}-{index}"
+        command = [sys.executable, script, '--broker', self.broker_path, '--transport', self.transport,
+                   '--worker-id', worker_id, '--max-rate', str(self.max_rate),
+                   '--lease-seconds', str(self.lease_seconds)]
+        if not self.pacing:
+            command.append('--no-pacing')
+        if self.quiet_hours is not None:
+            command += ['--quiet-hours', str(self.quiet_hours)]
+        options = dict(session_options(self.transport, index), **self.options)
+        for key, value in options.items():
+            command += ['--option', f"{key}={json.dumps(value)}"]
+        return command
+
+    def start(self):
+        with self._lock:
+            self._stopping = False
+            for index in range(self.count):
+                if index not in self._processes:
+                    self._processes[index] = subprocess.Popen(self._command(index), stdout=self.stdout)
+
+    def check(self):
+        """Starts a replacement for every sender process that has exited."""
+        with self._lock:
+            if self._stopping:
+                return
+            for index, process in list(self._processes.items()):
+                if process.poll() is not None:
+                    print(f"[BROKER] Sender {self.worker_prefix}-{index} exited with code {process.returncode}; "
+                          f"restarting it.")
+                    self._processes[index] = subprocess.Popen(self._command(index), stdout=self.stdout)
+
+    def pids(self):
+        with self._lock:
+            return {index: process.pid for index, process in self._processes.items()}
+
+    def stop(self, timeout=None):
+        """Asks every sender to stop after its current message, then waits for them."""
+        with self._lock:
+            self._stopping = True
+            processes, self._processes = list(self._processes.values()), {}
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
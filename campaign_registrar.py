@@ -0,0 +1,150 @@
+# campaign_registrar.py
+import threading
+import time
+from collections import OrderedDict, deque
+
+class Registration:
+    """Progress of registering one campaign's recipients."""
+    __slots__ = ('campaign_id', 'state', 'registered', 'total', 'cursor', 'error', 'submitted_at', 'finished_at')
+
+    def __init__(self, campaign_id, total, cursor=None, registered=0):
+        self.campaign_id = campaign_id
+        self.state = 'queued'
+        self.registered = registered
+        self.total = total
+        self.cursor = cursor
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self):
+        return {'campaign_id': self.campaign_id, 'state': self.state, 'registered': self.registered,
+                'total': self.total, 'error': self.error, 'submitted_at': self.submitted_at,
+                'finished_at': self.finished_at}
+
+class CampaignRegistrar:
+    """
+    Background stage that registers the recipients of submitted campaigns.
+
+    A submission only records the campaign id; the worker thread then pages
+    through the contact list with page_numbers(limit, cursor) ->
+    (numbers, next_cursor) and stores each page with add_jobs(campaign_id,
+    numbers), one write per batch. Campaigns being registered take turns one
+    batch at a time, so a huge campaign does not hold up a small one. When
+    the last page is stored, on_registered(campaign_id) runs (e.g. to hand
+    the campaign to the scheduler); if add_jobs reports the campaign is gone
+    (cancelled meanwhile) registration stops quietly, and errors go to
+    on_failed(campaign_id, error).
+
+    Progress is kept per campaign for status() until keep_finished newer
+    registrations have finished.
+    """
+
+    def __init__(self, page_numbers, add_jobs, on_registered, on_failed=None, batch_size=5000, keep_finished=1000):
+        self.page_numbers = page_numbers
+        self.add_jobs = add_jobs
+        self.on_registered = on_registered
+        self.on_failed = on_failed
+        self.batch_size = batch_size
+        self.keep_finished = keep_finished
+        self._registrations = OrderedDict()
+        self._active = deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._worker = None
+
+    # --- Lifecycle ---
+    def start(self):
+        with self._cond:
+            if self._worker is not None:
+                return
+            self._stopping = False
+            self._worker = threading.Thread(target=self._worker_loop, name='campaign-registrar', daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout=None):
+        """Stops after the current batch; unfinished campaigns stay 'registering' and can be resumed."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.join(timeout)
+
+    # --- Submission ---
+    def submit(self, campaign_id, total, cursor=None, registered=0):
+        """
+        Queues a campaign for registration and returns its Registration.
+        cursor and registered resume an interrupted registration after the
+        last number already stored.
+        """
+        registration = Registration(campaign_id, total, cursor, registered)
+        with self._cond:
+            self._registrations.pop(campaign_id, None)
+            self._registrations[campaign_id] = registration
+            self._active.append(registration)
+            self._cond.notify_all()
+        self.start()
+        return registration
+
+    def status(self, campaign_id):
+        """Returns the registration progress of a campaign as a dict, or None if unknown."""
+        with self._cond:
+            registration = self._registrations.get(campaign_id)
+            return registration.to_dict() if registration is not None else None
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._active)
+
+    # --- Worker ---
+    def _finish(self, registration, state, error=None):
+        with self._cond:
+            registration.state = state
+            registration.error = error
+            registration.finished_at = time.time()
+            finished = [key for key, value in self._registrations.items() if value.finished_at is not None]
+            for key in finished[:max(0, len(finished) - self.keep_finished)]:
+                del self._registrations[key]
+
+    def _register_batch(self, registration):
+        """Stores one page of recipients. Returns True once the campaign is fully registered (or gone)."""
+        numbers, next_cursor = self.page_numbers(self.batch_size, registration.cursor)
+        if numbers:
+            added = self.add_jobs(registration.campaign_id, numbers)
+            if not added:
+                self._finish(registration, 'cancelled')
+                return True
+            with self._cond:
+                registration.registered += added
+                registration.cursor = numbers[-1]
+        if next_cursor is not None:
+            return False
+        self._finish(registration, 'registered')
+        self.on_registered(registration.campaign_id)
+        return True
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._active and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                registration = self._active.popleft()
+                registration.state = 'registering'
+            try:
+                done = self._register_batch(registration)
+            except Exception as e:
+                print(f"[REGISTRAR] Registering campaign {registration.campaign_id} failed: {e}")
+                self._finish(registration, 'failed', str(e))
+                if self.on_failed is not None:
+                    try:
+                        self.on_failed(registration.campaign_id, e)
+                    except Exception as callback_error:
+                        print(f"[REGISTRAR] Failure handler for {registration.campaign_id} failed: {callback_error}")
+                continue
+            if not done:
+                with self._cond:
+                    # Back of the line, so other campaigns get their next batch first
+                    self._active.append(registration)
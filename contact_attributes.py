@@ -0,0 +1,120 @@
+# contact_attributes.py
+import json
+import os
+import threading
+
+import metrics
+
+_APPEND_SECONDS = metrics.FILE_IO_SECONDS.labels('attributes_append')
+_COMPACT_SECONDS = metrics.FILE_IO_SECONDS.labels('attributes_compact')
+
+class ContactAttributeStore:
+    """
+    Personalization fields (name, order id, custom attributes) stored next to
+    each number, used to render message templates per recipient.
+
+    Backed by an append-only JSONL file with one {"number", "attributes"}
+    record per change (the last record for a number wins, null removes it).
+    The file is read once into a dict and rewritten compactly when stale
+    records outnumber live ones.
+    """
+
+    def __init__(self, path, compact_min_records=1000):
+        self.path = path
+        self.compact_min_records = compact_min_records
+        self._attributes = {}
+        self._record_count = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    # --- Loading ---
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        attributes = {}
+        count = 0
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    count += 1
+                    if record.get('attributes') is None:
+                        attributes.pop(record['number'], None)
+                    else:
+                        attributes[record['number']] = record['attributes']
+        self._attributes = attributes
+        self._record_count = count
+        self._loaded = True
+
+    # --- Writing ---
+    def _append(self, records):
+        with _APPEND_SECONDS.time(), open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+        self._record_count += len(records)
+        if self._record_count >= self.compact_min_records and self._record_count > 2 * len(self._attributes):
+            self.compact()
+
+    def compact(self):
+        """Rewrites the file with one record per number and atomically replaces it."""
+        with self._lock:
+            self._ensure_loaded()
+            tmp_path = self.path + ".tmp"
+            with _COMPACT_SECONDS.time():
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for number, attributes in self._attributes.items():
+                        f.write(json.dumps({'number': number, 'attributes': attributes}, separators=(',', ':')) + '\n')
+                os.replace(tmp_path, self.path)
+            self._record_count = len(self._attributes)
+
+    # --- Public API ---
+    def get(self, number):
+        """Returns the attribute dict of a number, or None."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._attributes.get(number)
+
+    def all(self):
+        """Returns {number: attributes} for every number with attributes."""
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._attributes)
+
+    def get_many(self, numbers):
+        """Returns {number: attributes} for the numbers that have attributes."""
+        with self._lock:
+            self._ensure_loaded()
+            return {number: self._attributes[number] for number in numbers if number in self._attributes}
+
+    def set_many(self, updates, merge=True):
+        """
+        Stores attributes for several numbers with a single append.
+        updates maps number -> attribute dict; with merge the given fields are
+        added to the number's existing ones, otherwise they replace them.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            records = []
+            for number, attributes in updates.items():
+                attributes = {str(name): str(value) for name, value in attributes.items()
+                              if value is not None and str(value) != ''}
+                if merge and number in self._attributes:
+                    attributes = dict(self._attributes[number], **attributes)
+                if not attributes or attributes == self._attributes.get(number):
+                    continue
+                self._attributes[number] = attributes
+                records.append({'number': number, 'attributes': attributes})
+            if records:
+                self._append(records)
+            return len(records)
+
+    def remove(self, number):
+        """Drops all attributes of a number."""
+        with self._lock:
+            self._ensure_loaded()
+            if self._attributes.pop(number, None) is None:
+                return False
+            self._append([{'number': number, 'attributes': None}])
+            return True
@@ -0,0 +1,159 @@
+# contact_import.py
+import csv
+import io
+import os
+import re
+
+# Same rules as adding a single number: strip spaces, dashes and brackets,
+# then require "+" followed by digits, at least 6 characters in total.
+_SEPARATORS = re.compile(r"[\s\-()]+")
+_VALID_NUMBER = re.compile(r"\+\d{5,}")
+# Column names recognised as the phone number column when the file has a header row
+NUMBER_COLUMN_NAMES = ('number', 'phone', 'phone_number', 'phone number', 'mobile', 'whatsapp', 'msisdn')
+
+def normalize_number(raw):
+    """Cleans a raw number. Returns the cleaned number, or None if it is invalid."""
+    cleaned = _SEPARATORS.sub('', raw)
+    return cleaned if _VALID_NUMBER.fullmatch(cleaned) else None
+
+def normalize_prefix(raw):
+    """Cleans a search prefix the same way as a number; a leading "+" is added if missing."""
+    cleaned = _SEPARATORS.sub('', raw or '')
+    if cleaned and not cleaned.startswith('+'):
+        cleaned = '+' + cleaned
+    return cleaned
+
+def normalize_chunk(values, first_row_number):
+    """
+    Normalizes a chunk of raw values in one pass.
+    Returns (valid_numbers, rejects) where rejects holds (row_number, value, reason) tuples.
+    """
+    sub = _SEPARATORS.sub
+    fullmatch = _VALID_NUMBER.fullmatch
+    valid = []
+    rejects = []
+    for offset, raw in enumerate(values):
+        if raw is None or not str(raw).strip():
+            rejects.append((first_row_number + offset, '', 'empty'))
+            continue
+        cleaned = sub('', str(raw))
+        if fullmatch(cleaned):
+            valid.append(cleaned)
+        else:
+            rejects.append((first_row_number + offset, str(raw), 'invalid format'))
+    return valid, rejects
+
+# --- Row Readers ---
+def _iter_csv_rows(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    return csv.reader(text)
+
+def _iter_xlsx_rows(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Importing .xlsx files requires openpyxl (pip install openpyxl).")
+    # read_only mode streams rows instead of loading the whole sheet
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if cell is None else str(cell) for cell in row]
+    finally:
+        workbook.close()
+
+def iter_rows(stream, filename):
+    """Yields rows (lists of strings) from a CSV/TXT or XLSX upload without loading it all into memory."""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        return _iter_xlsx_rows(stream)
+    if extension in ('', '.csv', '.txt'):
+        return _iter_csv_rows(stream)
+    raise ValueError(f"Unsupported file type '{extension}'. Upload a .csv, .txt or .xlsx file.")
+
+def _resolve_column(first_row, column):
+    """Returns (column_index, first_row_is_header) for the number column."""
+    if column not in (None, ''):
+        if str(column).isdigit():
+            return int(column), False
+        lowered = [cell.strip().lower() for cell in first_row]
+        if str(column).strip().lower() in lowered:
+            return lowered.index(str(column).strip().lower()), True
+        raise ValueError(f"Column '{column}' not found in the header row.")
+    lowered = [cell.strip().lower() for cell in first_row]
+    for name in NUMBER_COLUMN_NAMES:
+        if name in lowered:
+            return lowered.index(name), True
+    return 0, False
+
+# --- Import ---
+def _row_attributes(row, attribute_columns):
+    """Returns the non-empty personalization fields of a row, or None."""
+    attributes = {}
+    for index, name in attribute_columns:
+        if index < len(row) and row[index] is not None and str(row[index]).strip():
+            attributes[name] = str(row[index]).strip()
+    return attributes or None
+
+def import_contacts(stream, filename, contact_store, column=None, chunk_size=10000, max_rejects=100,
+                    attribute_store=None):
+    """
+    Streams rows from an uploaded file into the contact store in chunks.
+    Memory use is bounded by chunk_size (plus at most max_rejects reported rejects),
+    regardless of the file size. Returns a summary dict.
+
+    If the file has a header row and an attribute_store is given, the other
+    columns (e.g. name, order_id) are stored as the number's personalization
+    fields, keyed by their header names.
+    """
+    rows = iter_rows(stream, filename)
+    summary = {'rows': 0, 'added': 0, 'duplicates': 0, 'rejected': 0, 'rejects': [], 'with_attributes': 0}
+
+    first_row = next(rows, None)
+    if first_row is None:
+        return summary
+    column_index, has_header = _resolve_column(first_row, column)
+    attribute_columns = []
+    if has_header and attribute_store is not None:
+        attribute_columns = [(index, name.strip().lower().replace(' ', '_')) for index, name in enumerate(first_row)
+                             if index != column_index and name.strip()]
+    attribute_chunk = []
+
+    def flush(values, first_row_number):
+        valid, rejects = normalize_chunk(values, first_row_number)
+        if attribute_columns:
+            updates = {}
+            for raw, attributes in zip(values, attribute_chunk):
+                number = normalize_number(str(raw)) if attributes and raw is not None else None
+                if number is not None:
+                    updates[number] = attributes
+            attribute_store.set_many(updates)
+            summary['with_attributes'] += len(updates)
+            attribute_chunk.clear()
+        added = contact_store.add_many(valid)
+        summary['added'] += added
+        summary['duplicates'] += len(valid) - added
+        summary['rejected'] += len(rejects)
+        room = max_rejects - len(summary['rejects'])
+        for row_number, value, reason in rejects[:room]:
+            summary['rejects'].append({'row': row_number, 'value': value, 'reason': reason})
+
+    chunk = []
+    chunk_start = 1
+    if has_header:
+        chunk_start = 2
+    else:
+        chunk.append(first_row[column_index] if column_index < len(first_row) else '')
+
+    for row in rows:
+        chunk.append(row[column_index] if column_index < len(row) else '')
+        if attribute_columns:
+            attribute_chunk.append(_row_attributes(row, attribute_columns))
+        if len(chunk) >= chunk_size:
+            flush(chunk, chunk_start)
+            summary['rows'] += len(chunk)
+            chunk_start += len(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk, chunk_start)
+        summary['rows'] += len(chunk)
+    return summary
@@ -0,0 +1,173 @@
+# contact_store.py
+import bisect
+import os
+import threading
+import uuid
+
+import metrics
+
+_APPEND_SECONDS = metrics.FILE_IO_SECONDS.labels('contacts_append')
+_REWRITE_SECONDS = metrics.FILE_IO_SECONDS.labels('contacts_rewrite')
+
+class ContactStore:
+    """
+    Process-resident index of customer numbers backed by a plain text file
+    (one number per line).
+
+    Membership checks use a set, a sorted list is kept up to date with
+    bisect on every change, new numbers are appended to the file, and the
+    file is only re-read when its size or modification time changes on disk
+    (e.g. when it is edited by hand).
+    """
+    # Batches larger than this are merged into the sorted list instead of insorted one by one
+    INSORT_LIMIT = 64
+
+    def __init__(self, path):
+        self.path = path
+        self._numbers = set()
+        self._sorted = []
+        self._file_state = None
+        # Bumped on every change; combined with a per-process token it makes a cheap ETag
+        self.version = 0
+        self._token = uuid.uuid4().hex[:8]
+        self._lock = threading.RLock()
+
+    # --- Disk Synchronisation ---
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def _reload(self):
+        """Re-reads the numbers file in one pass."""
+        numbers = set()
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    number = line.strip()
+                    if number:
+                        numbers.add(number)
+        self._numbers = numbers
+        self._sorted = sorted(numbers)
+        self._file_state = self._stat()
+        self.version += 1
+
+    def _refresh(self):
+        """Reloads the index if the file changed on disk since it was last read or written."""
+        if self._file_state is None or self._stat() != self._file_state:
+            self._reload()
+
+    def _ends_with_newline(self):
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) == b"\n"
+        except OSError:
+            return True
+
+    def _append_lines(self, numbers):
+        prefix = "" if self._ends_with_newline() else "\n"
+        with _APPEND_SECONDS.time(), open(self.path, "a") as f:
+            f.write(prefix + "".join(number + "\n" for number in numbers))
+        self._file_state = self._stat()
+        self.version += 1
+
+    def _rewrite(self):
+        """Writes the whole sorted list to a temp file and atomically replaces the numbers file."""
+        tmp_path = self.path + ".tmp"
+        with _REWRITE_SECONDS.time():
+            with open(tmp_path, "w") as f:
+                for number in self._sorted:
+                    f.write(number + "\n")
+            os.replace(tmp_path, self.path)
+        self._file_state = self._stat()
+        self.version += 1
+
+    # --- Public API ---
+    def all(self):
+        """Returns the sorted list of numbers."""
+        with self._lock:
+            self._refresh()
+            return list(self._sorted)
+
+    def etag(self):
+        """Returns an opaque tag that changes whenever the contact list changes."""
+        with self._lock:
+            self._refresh()
+            return f"contacts-{self._token}-{self.version}"
+
+    def page(self, limit, cursor=None, prefix=None):
+        """
+        Returns (numbers, next_cursor, matched) for one page of the sorted list.
+        cursor is the last number of the previous page; prefix restricts the
+        results to numbers starting with it. matched is the number of contacts
+        matching the prefix (or all contacts without one).
+        """
+        with self._lock:
+            self._refresh()
+            numbers = self._sorted
+            if prefix:
+                low = bisect.bisect_left(numbers, prefix)
+                # Smallest string greater than every string starting with prefix
+                high = bisect.bisect_left(numbers, prefix[:-1] + chr(ord(prefix[-1]) + 1), low)
+            else:
+                low, high = 0, len(numbers)
+            start = bisect.bisect_right(numbers, cursor, low, high) if cursor else low
+            end = min(start + limit, high)
+            page = numbers[start:end]
+            next_cursor = page[-1] if page and end < high else None
+            return page, next_cursor, high - low
+
+    def count(self):
+        with self._lock:
+            self._refresh()
+            return len(self._sorted)
+
+    def contains(self, number):
+        with self._lock:
+            self._refresh()
+            return number in self._numbers
+
+    def add(self, number):
+        """Adds a number. Returns False if it already exists."""
+        return self.add_many([number]) == 1
+
+    def add_many(self, numbers):
+        """Adds several numbers with a single append. Returns how many were new."""
+        with self._lock:
+            self._refresh()
+            added = []
+            for number in numbers:
+                if number not in self._numbers:
+                    self._numbers.add(number)
+                    added.append(number)
+            if len(added) <= self.INSORT_LIMIT:
+                for number in added:
+                    bisect.insort(self._sorted, number)
+            else:
+                # Large batches: Timsort merges the two sorted runs in linear time
+                self._sorted.extend(sorted(added))
+                self._sorted.sort()
+            if added:
+                self._append_lines(added)
+            return len(added)
+
+    def remove(self, number):
+        """Removes a number. Returns False if it does not exist."""
+        with self._lock:
+            self._refresh()
+            if number not in self._numbers:
+                return False
+            self._numbers.discard(number)
+            del self._sorted[bisect.bisect_left(self._sorted, number)]
+            self._rewrite()
+            return True
+
+    def replace_all(self, numbers):
+        """Replaces every stored number with the given list."""
+        with self._lock:
+            self._numbers = set(numbers)
+            self._sorted = sorted(self._numbers)
+            self._rewrite()
@@ -0,0 +1,144 @@
+# dead_letters.py
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+import metrics
+
+_APPEND_SECONDS = metrics.FILE_IO_SECONDS.labels('dead_letters_append')
+_COMPACT_SECONDS = metrics.FILE_IO_SECONDS.labels('dead_letters_compact')
+
+def _entry_to_record(entry):
+    record = dict(entry)
+    record['failed_at'] = entry['failed_at'].isoformat()
+    return record
+
+def _entry_from_record(record):
+    entry = dict(record)
+    entry['failed_at'] = datetime.fromisoformat(record['failed_at'])
+    return entry
+
+class DeadLetterQueue:
+    """
+    Messages that failed every retry, kept for inspection and re-driving.
+
+    Each entry holds the rendered message with its number, job and campaign,
+    the last error, the number of attempts and when it was given up on.
+    Backed by an append-only JSONL file of {"op": "add", "entry"} and
+    {"op": "remove", "ids"} records, read once into memory and rewritten
+    compactly when removed entries outnumber live ones.
+    """
+
+    def __init__(self, path, compact_min_records=1000):
+        self.path = path
+        self.compact_min_records = compact_min_records
+        self._entries = OrderedDict()
+        self._record_count = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    # --- Loading ---
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        entries = OrderedDict()
+        count = 0
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    count += 1
+                    if record.get('op') == 'add':
+                        entry = _entry_from_record(record['entry'])
+                        entries[entry['id']] = entry
+                    elif record.get('op') == 'remove':
+                        for entry_id in record['ids']:
+                            entries.pop(entry_id, None)
+        self._entries = entries
+        self._record_count = count
+        self._loaded = True
+
+    # --- Writing ---
+    def _append(self, records):
+        with _APPEND_SECONDS.time(), open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+        self._record_count += len(records)
+        if self._record_count >= self.compact_min_records and self._record_count > 2 * len(self._entries):
+            self.compact()
+
+    def compact(self):
+        """Rewrites the file with one record per live entry and atomically replaces it."""
+        with self._lock:
+            self._ensure_loaded()
+            tmp_path = self.path + ".tmp"
+            with _COMPACT_SECONDS.time():
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for entry in self._entries.values():
+                        f.write(json.dumps({'op': 'add', 'entry': _entry_to_record(entry)}, separators=(',', ':')) + '\n')
+                os.replace(tmp_path, self.path)
+            self._record_count = len(self._entries)
+
+    # --- Public API ---
+    def add(self, number, message, error, attempts, job_id=None, campaign_id=None):
+        """Stores a message that ran out of retries. Returns the new entry."""
+        entry = {
+            'id': str(uuid.uuid4()),
+            'failed_at': datetime.now(),
+            'number': number,
+            'message': message,
+            'error': str(error),
+            'attempts': attempts,
+            'job_id': job_id,
+            'campaign_id': campaign_id
+        }
+        with self._lock:
+            self._ensure_loaded()
+            self._entries[entry['id']] = entry
+            self._append([{'op': 'add', 'entry': _entry_to_record(entry)}])
+        return dict(entry)
+
+    def entries(self, campaign_id=None, limit=None):
+        """Returns copies of the stored entries, oldest first, optionally for one campaign."""
+        with self._lock:
+            self._ensure_loaded()
+            result = []
+            for entry in self._entries.values():
+                if campaign_id is not None and entry['campaign_id'] != campaign_id:
+                    continue
+                result.append(dict(entry))
+                if limit is not None and len(result) >= limit:
+                    break
+            return result
+
+    def take(self, entry_ids=None, campaign_id=None):
+        """
+        Removes and returns the selected entries with a single append: the
+        given ids, every entry of a campaign, or everything if neither is given.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if entry_ids is not None:
+                selected = [self._entries[entry_id] for entry_id in dict.fromkeys(entry_ids)
+                            if entry_id in self._entries]
+            else:
+                selected = [entry for entry in self._entries.values()
+                            if campaign_id is None or entry['campaign_id'] == campaign_id]
+            if campaign_id is not None:
+                selected = [entry for entry in selected if entry['campaign_id'] == campaign_id]
+            if not selected:
+                return []
+            for entry in selected:
+                del self._entries[entry['id']]
+            self._append([{'op': 'remove', 'ids': [entry['id'] for entry in selected]}])
+            return [dict(entry) for entry in selected]
+
+    def count(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._entries)
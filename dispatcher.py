@@ -0,0 +1,377 @@
+# dispatcher.py
+import threading
+import time
+from datetime import datetime, timedelta
+
+# --- Daily Windows ---
+class DailyWindow:
+    """
+    A time-of-day range repeated every day, such as 09:00-17:00. An end
+    before the start wraps past midnight (21:00-08:00); equal ends mean the
+    whole day.
+    """
+    __slots__ = ('start', 'end')
+
+    def __init__(self, start, end):
+        # Seconds after midnight
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def parse(cls, text):
+        """Parses 'HH:MM-HH:MM'. Raises ValueError if malformed."""
+        try:
+            start_text, end_text = str(text).split('-')
+            bounds = []
+            for part in (start_text, end_text):
+                hours, minutes = part.strip().split(':')
+                hours, minutes = int(hours), int(minutes)
+                if not (0 <= hours < 24 and 0 <= minutes < 60):
+                    raise ValueError
+                bounds.append(hours * 3600 + minutes * 60)
+        except ValueError:
+            raise ValueError(f"expected a window like 09:00-17:00, got {text!r}")
+        return cls(*bounds)
+
+    def __str__(self):
+        return f"{self.start // 3600:02d}:{self.start % 3600 // 60:02d}-{self.end // 3600:02d}:{self.end % 3600 // 60:02d}"
+
+    def contains(self, moment):
+        seconds = moment.hour * 3600 + moment.minute * 60 + moment.second + moment.microsecond / 1e6
+        if self.start < self.end:
+            return self.start <= seconds < self.end
+        if self.start > self.end:
+            return seconds >= self.start or seconds < self.end
+        return True
+
+    def _next(self, moment, seconds):
+        """Returns the first moment at or after moment that falls on the given time of day."""
+        midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        candidate = midnight + timedelta(seconds=seconds)
+        return candidate if candidate >= moment else candidate + timedelta(days=1)
+
+    def next_start(self, moment):
+        return self._next(moment, self.start)
+
+    def next_end(self, moment):
+        return self._next(moment, self.end)
+
+def next_send_time(moment, window=None, quiet_hours=None):
+    """
+    Returns the first moment at or after moment that lies inside the send
+    window and outside the quiet hours, or None if the two never overlap.
+    """
+    for _ in range(6):
+        if quiet_hours is not None and quiet_hours.start != quiet_hours.end and quiet_hours.contains(moment):
+            moment = quiet_hours.next_end(moment)
+        elif window is not None and not window.contains(moment):
+            moment = window.next_start(moment)
+        else:
+            return moment
+    return None
+
+# --- Timing Wheel ---
+_NEVER = float('inf')
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel with levels of 2**bits slots each.
+
+    Level 0 holds entries due within the next 2**bits ticks, one slot per
+    tick; each higher level covers 2**bits times the span of the one below,
+    so with the defaults (4 levels of 64 one-second slots) a single wheel
+    reaches 194 days ahead and anything later waits in the top level.
+    Adding an entry is O(1); as time advances, a higher-level slot is
+    cascaded into the lower levels when the level below wraps around, so
+    each entry is moved at most once per level. The wheel also tracks the
+    next tick at which anything can fire or cascade, so advancing through
+    empty ticks costs one comparison, as with the head of a heap.
+    """
+
+    def __init__(self, now_tick, bits=6, levels=4):
+        self.bits = bits
+        self.levels = levels
+        self._mask = (1 << bits) - 1
+        self._wheels = [[[] for _ in range(1 << bits)] for _ in range(levels)]
+        self._counts = [0] * levels
+        # Nothing fires or cascades before this tick
+        self._next_event = _NEVER
+        self._now = now_tick
+        self._due = []
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def now(self):
+        return self._now
+
+    def add(self, tick, item):
+        """Adds item to fire at tick; a tick that has already passed fires on the next advance()."""
+        self._size += 1
+        self._place(tick, item)
+
+    def _place(self, tick, item):
+        delta = tick - self._now
+        if delta <= 0:
+            self._due.append(item)
+            return
+        level = 0
+        while level < self.levels - 1 and delta >= 1 << (self.bits * (level + 1)):
+            level += 1
+        self._wheels[level][(tick >> (self.bits * level)) & self._mask].append((tick, item))
+        self._counts[level] += 1
+        # A higher-level entry moves down at its level's next boundary, no later
+        event = tick if not level else (self._now | ((1 << (self.bits * level)) - 1)) + 1
+        if event < self._next_event:
+            self._next_event = event
+
+    def advance(self, tick):
+        """Moves the wheel forward to tick and returns the items that became due, oldest first."""
+        if tick < self._next_event and not self._due:
+            if tick > self._now:
+                self._now = tick
+            return []
+        while self._now < tick and self._size > len(self._due):
+            if self._now + 1 < self._next_event:
+                # Skip the ticks where nothing happens
+                self._now = min(tick, self._next_event - 1)
+                continue
+            self._now += 1
+            now = self._now
+            if not now & self._mask:
+                # Level 0 wrapped: cascade the higher levels whose turn it is, top down
+                for level in range(self.levels - 1, 0, -1):
+                    shift = self.bits * level
+                    if not now & ((1 << shift) - 1):
+                        self._cascade(level, self._wheels[level][(now >> shift) & self._mask])
+            self._cascade(0, self._wheels[0][now & self._mask])
+            self._next_event = self._find_next_event()
+        self._now = max(self._now, tick)
+        due, self._due = self._due, []
+        self._size -= len(due)
+        return due
+
+    def _cascade(self, level, slot):
+        if slot:
+            entries = slot[:]
+            slot.clear()
+            self._counts[level] -= len(entries)
+            for tick, item in entries:
+                self._place(tick, item)
+
+    def _find_next_event(self):
+        """Returns the next tick with a level-0 slot to fire or a higher level to cascade."""
+        now = self._now
+        wrap = (now | self._mask) + 1
+        if self._counts[0]:
+            slots = self._wheels[0]
+            for tick in range(now + 1, wrap):
+                if slots[tick & self._mask]:
+                    return tick
+            return wrap
+        for level in range(1, self.levels):
+            if self._counts[level]:
+                return (now | ((1 << (self.bits * level)) - 1)) + 1
+        return _NEVER
+
+    def next_tick(self):
+        """Returns the next tick that needs attention: now if something is due, else the next event."""
+        return self._now if self._due else self._next_event
+
+# --- Dispatcher ---
+class _Entry:
+    __slots__ = ('key', 'when', 'window', 'release')
+
+    def __init__(self, key, when, window, release):
+        self.key = key
+        self.when = when
+        self.window = window
+        self.release = release
+
+class Dispatcher:
+    """
+    Releases scheduled campaigns to the send pipeline in send slots.
+
+    Time is cut into slots of slot_seconds, each holding as many messages
+    as the senders can deliver in it. The rate is measured afresh for each
+    slot with throughput() (messages per second, None if unknown), and never
+    exceeds capacity; it is stored in rate. While more than a slot's worth
+    of messages wait in the send pipeline (backlog()), nothing more is
+    released, so the pipeline never holds work queued far ahead of the
+    senders.
+
+    When a campaign comes due, release(key, limit, slot_time) is called to
+    queue up to limit of its recipients, planned from slot_time (a
+    datetime), and returns (released, finished); an unfinished campaign
+    (including one the pipeline had no room for) goes back on the timing
+    wheel for the next slot. Campaigns due in the same slot split its
+    capacity evenly, so a large campaign does not hold up a small one.
+
+    Nothing is dropped for being late: a campaign that comes due outside
+    its send window or inside the quiet hours, or that fires after its slot
+    because the process was busy or asleep, is re-slotted to the next time
+    it may send.
+    """
+
+    def __init__(self, release, capacity, slot_seconds=10.0, tick=1.0, quiet_hours=None, clock=time.time,
+                 throughput=None, backlog=None):
+        self.release = release
+        self.capacity = capacity
+        self.slot_seconds = slot_seconds
+        self.throughput = throughput
+        self.backlog = backlog
+        self.rate = capacity
+        self.slot_capacity = max(1, int(capacity * slot_seconds))
+        self.tick = tick
+        self.quiet_hours = quiet_hours
+        self.clock = clock
+        self.reslotted = 0
+        self._wheel = TimingWheel(int(clock() / tick))
+        self._entries = {}
+        self._slot = None
+        self._slot_used = 0
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._worker = None
+
+    # --- Lifecycle ---
+    def start(self):
+        with self._cond:
+            if self._worker is not None:
+                return
+            self._stopping = False
+            self._worker = threading.Thread(target=self._worker_loop, name='dispatcher', daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.join(timeout)
+
+    # --- Scheduling ---
+    def schedule(self, key, when, window=None, release=None):
+        """
+        Schedules (or re-times) key to be released from when (a datetime) on,
+        within window (a DailyWindow) and outside the quiet hours. release
+        overrides the dispatcher's release callback for this entry (used for
+        one-off retries). Returns the first allowed send time; raises
+        ValueError if there is none.
+        """
+        start = next_send_time(when, window, self.quiet_hours)
+        if start is None:
+            raise ValueError(f"send window {window} lies entirely within the quiet hours {self.quiet_hours}")
+        entry = _Entry(key, start, window, release)
+        with self._cond:
+            self._entries[key] = entry
+            self._wheel.add(self._tick_of(start), entry)
+            self._cond.notify_all()
+        return start
+
+    def cancel(self, key):
+        """Unschedules key. Returns True if it was scheduled."""
+        with self._cond:
+            # The wheel keeps the entry until its slot passes; it is skipped there
+            return self._entries.pop(key, None) is not None
+
+    def scheduled(self, key):
+        """Returns the next time key will be released, or None if it is not scheduled."""
+        with self._cond:
+            entry = self._entries.get(key)
+            return entry.when if entry is not None else None
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._entries)
+
+    def _tick_of(self, moment):
+        return int(moment.timestamp() / self.tick)
+
+    def _measure(self, hook):
+        """Calls a throughput or backlog hook; None if there is none or it fails."""
+        if hook is None:
+            return None
+        try:
+            return hook()
+        except Exception as e:
+            print(f"[DISPATCHER] Measuring the send pipeline failed: {e}")
+            return None
+
+    def _resize(self):
+        """Sizes the slot to the measured send rate, capped by capacity."""
+        measured = self._measure(self.throughput)
+        self.rate = min(self.capacity, measured) if measured else self.capacity
+        self.slot_capacity = max(1, int(self.rate * self.slot_seconds))
+
+    def _reslot(self, entry, when):
+        """Puts entry back on the wheel at the first allowed time at or after when. Call with the lock held."""
+        entry.when = next_send_time(when, entry.window, self.quiet_hours) or when
+        self._wheel.add(self._tick_of(entry.when), entry)
+
+    # --- Worker ---
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    due = self._wheel.advance(int(self.clock() / self.tick))
+                    # Entries cancelled or re-timed since they were added are skipped
+                    due = [entry for entry in due if self._entries.get(entry.key) is entry]
+                    if due:
+                        break
+                    if not len(self._wheel):
+                        self._cond.wait()
+                        continue
+                    self._cond.wait(max(0.0, self._wheel.next_tick() * self.tick - self.clock()))
+            self._dispatch(due)
+
+    def _dispatch(self, due):
+        """Gives each due campaign its share of the current slot and re-slots the rest."""
+        now = datetime.fromtimestamp(self.clock())
+        slot = int(now.timestamp() // self.slot_seconds)
+        next_slot = datetime.fromtimestamp((slot + 1) * self.slot_seconds)
+        if slot != self._slot:
+            self._slot, self._slot_used = slot, 0
+            self._resize()
+        # Work still waiting from earlier slots
+        backlog = self._measure(self.backlog) or 0
+        ready = []
+        with self._cond:
+            for entry in due:
+                allowed = next_send_time(now, entry.window, self.quiet_hours)
+                if allowed is None or allowed > now:
+                    # The window closed (or quiet hours began) before it could be sent
+                    self.reslotted += 1
+                    self._reslot(entry, allowed or next_slot)
+                elif self._slot_used >= self.slot_capacity or backlog > self.slot_capacity:
+                    self.reslotted += 1
+                    self._reslot(entry, next_slot)
+                else:
+                    ready.append(entry)
+        share = -(-self.slot_capacity // max(1, len(ready)))
+        for entry in ready:
+            limit = min(share, self.slot_capacity - self._slot_used)
+            if limit <= 0:
+                with self._cond:
+                    if self._entries.get(entry.key) is entry:
+                        self._reslot(entry, next_slot)
+                continue
+            slot_time = now + timedelta(seconds=self._slot_used / self.rate) if self.rate else now
+            try:
+                released, finished = (entry.release or self.release)(entry.key, limit, slot_time)
+            except Exception as e:
+                print(f"[DISPATCHER] Releasing {entry.key} failed: {e}")
+                released, finished = 0, True
+            self._slot_used += released
+            with self._cond:
+                if self._entries.get(entry.key) is not entry:
+                    continue
+                if finished:
+                    del self._entries[entry.key]
+                else:
+                    self._reslot(entry, next_slot)
@@ -0,0 +1,869 @@
+# job_store.py
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+from array import array
+from datetime import datetime
+
+import metrics
+from job_table import JobTable, id_key
+from message_store import MessageStore
+
+# --- Journal Record Helpers ---
+def _job_to_record(job):
+    """Converts an in-memory job dict into its JSON-serializable form."""
+    job_copy = job.copy()
+    if isinstance(job_copy.get('send_time'), datetime):
+        job_copy['send_time'] = job_copy['send_time'].isoformat()
+    return job_copy
+
+def _job_from_record(record):
+    """Converts a journal job record back into an in-memory job dict."""
+    job = dict(record)
+    if isinstance(job.get('send_time'), str):
+        job['send_time'] = datetime.fromisoformat(job['send_time'])
+    return job
+
+def _campaign_to_record(campaign):
+    """
+    Converts an in-memory campaign dict into its JSON-serializable form.
+    The message text is stored separately under its hash, so only the hash is written.
+    """
+    record = _job_to_record(campaign)
+    if 'message' in record:
+        record.pop('subject', None)
+        record.pop('body', None)
+    return record
+
+def _message_record(key, subject, body):
+    return {'op': 'message', 'hash': key, 'subject': subject, 'body': body}
+
+def _campaign_from_record(record):
+    """Converts a journal campaign record back into an in-memory campaign dict."""
+    return _job_from_record(record)
+
+def status_bucket(status):
+    """Maps a stored status to its summary bucket ('failed: <reason>' counts as 'failed')."""
+    if status and status.startswith('failed'):
+        return 'failed'
+    return status
+
+# Pending-index keys are (send time in ms << 128) | job id key, so one int sorts by time, then id
+_KEY_MASK = (1 << 128) - 1
+
+def _time_code(send_time):
+    """Returns a send time in whole milliseconds since the epoch (0 if unknown)."""
+    return round(send_time.timestamp() * 1000) if isinstance(send_time, datetime) else 0
+
+def _iter_json_array(f, chunk_size=1 << 16):
+    """
+    Yields the elements of a top-level JSON array from a text file one at a
+    time, reading it in chunks, so a large file is never held in memory
+    (nor decoded into one list) all at once.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    expect = '['
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n':
+            position += 1
+        if position == len(buffer):
+            chunk = f.read(chunk_size)
+            if not chunk:
+                if expect != 'end':
+                    raise ValueError("Unexpected end of JSON array")
+                return
+            buffer, position = chunk, 0
+            continue
+        char = buffer[position]
+        if expect == '[':
+            if char != '[':
+                raise ValueError("Expected a JSON array")
+            position += 1
+            expect = 'first'
+        elif expect == 'separator':
+            if char not in ',]':
+                raise ValueError(f"Expected ',' or ']' at offset {position}")
+            position += 1
+            expect = 'value' if char == ',' else 'end'
+        elif expect == 'first' and char == ']':
+            position += 1
+            expect = 'end'
+        elif expect in ('first', 'value'):
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                # The element may continue in the next chunk
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            position = end
+            expect = 'separator'
+            yield value
+        else:
+            raise ValueError("Unexpected data after the JSON array")
+
+# Time spent in journal appends (including fsync) and in snapshot rewrites
+_APPEND_SECONDS = metrics.FILE_IO_SECONDS.labels('journal_append')
+_SNAPSHOT_SECONDS = metrics.FILE_IO_SECONDS.labels('journal_snapshot')
+
+def _fsync_directory(path):
+    """Flushes a directory entry so a rename survives a crash (best effort on Windows)."""
+    try:
+        fd = os.open(path or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+# --- Journal-Backed Job Store ---
+class JobStore:
+    """
+    Append-only journal of campaigns and their per-recipient jobs.
+
+    A campaign holds its send_time and the hash of its message; each job is
+    a compact recipient row ({'id', 'campaign_id', 'number', 'status'}).
+    Message texts live in a content-addressed MessageStore and are written
+    to the journal once per distinct text ('message' records), however many
+    campaigns and recipients use them. In memory, a campaign's 'subject'
+    and 'body' are the shared interned strings.
+    Every change is appended to the journal as one JSON line, so the cost of
+    a write is proportional to the change rather than to the number of stored
+    jobs. The in-memory index is rebuilt in a single streaming pass on load,
+    and the journal is compacted into a fresh snapshot (written to a temp file
+    and atomically renamed into place) once dead records outnumber live ones.
+
+    In memory, jobs live in a columnar JobTable (packed ids, numbers and
+    status codes) rather than one dict per job; dicts are only built for
+    the jobs a caller asks for.
+
+    Next to the journal the store keeps two read indexes that are updated
+    incrementally: pending jobs sorted by (send time, job id) for paginated
+    listing, and per-campaign counts by status bucket for summaries. version
+    is bumped on every change and can be used as an ETag.
+    """
+
+    def __init__(self, path, legacy_path=None, fsync=True,
+                 compact_min_records=1000, compact_ratio=2.0):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.fsync = fsync
+        self.compact_min_records = compact_min_records
+        self.compact_ratio = compact_ratio
+        self._table = JobTable()
+        self._legacy_rows = {}
+        self._campaigns = {}
+        self._campaign_jobs = {}
+        self._messages = MessageStore()
+        self._pending = []
+        self._counts = {}
+        self._record_count = 0
+        self._loaded = False
+        self.version = 0
+        self._token = uuid.uuid4().hex[:8]
+        self._lock = threading.RLock()
+
+    # --- Loading ---
+    def load(self):
+        """Rebuilds the in-memory index from the journal in one streaming pass."""
+        with self._lock:
+            self._table = JobTable()
+            self._legacy_rows = {}
+            self._campaigns = {}
+            self._campaign_jobs = {}
+            self._messages.clear()
+            self._record_count = 0
+            if not os.path.exists(self.path):
+                if self.legacy_path and os.path.exists(self.legacy_path):
+                    self._import_legacy()
+                self._rebuild_indexes()
+                self._loaded = True
+                return
+
+            good_offset = 0
+            torn = False
+            with open(self.path, 'rb') as f:
+                for raw_line in f:
+                    if not raw_line.endswith(b'\n'):
+                        torn = True
+                        break
+                    try:
+                        record = json.loads(raw_line)
+                    except ValueError:
+                        torn = True
+                        break
+                    self._apply(record)
+                    self._record_count += 1
+                    good_offset += len(raw_line)
+
+            if torn:
+                # A crash mid-append leaves a partial last line; drop only that tail.
+                print(f"[JOB STORE] Discarding torn record at end of {self.path} (offset {good_offset}).")
+                with open(self.path, 'r+b') as f:
+                    f.truncate(good_offset)
+            if self._legacy_rows:
+                self._group_legacy_jobs()
+                self._write_snapshot()
+            self._rebuild_indexes()
+            self._loaded = True
+
+    def _import_legacy(self):
+        """
+        Imports jobs from the legacy scheduled_jobs.json file into a new journal.
+        The file is decoded one job at a time and each job's subject and body
+        are interned right away, so the per-job copies of the text are dropped
+        as soon as they are read.
+        """
+        with open(self.legacy_path, 'r') as f:
+            try:
+                for record in _iter_json_array(f):
+                    self._add_legacy_job(_job_from_record(record))
+            except ValueError as e:
+                print(f"[JOB STORE] Could not read {self.legacy_path} ({e}); nothing migrated.")
+                self._table = JobTable()
+                self._legacy_rows = {}
+                self._messages.clear()
+        self._group_legacy_jobs()
+        self._write_snapshot()
+        print(f"[JOB STORE] Migrated {len(self._table)} job(s) from {self.legacy_path} to {self.path}.")
+
+    def _add_legacy_job(self, job):
+        """
+        Adds a self-contained legacy job (with its own subject, body and
+        send_time) to the table; its message is interned and the job is
+        folded into a campaign by _group_legacy_jobs().
+        """
+        row = self._table.add(job['id'], None, job.get('number', ''), job.get('status', 'pending'))
+        message_key = self._messages.intern(job.get('subject', ''), job.get('body', ''))[0]
+        self._legacy_rows[row] = (message_key, job.get('send_time'))
+
+    def _group_legacy_jobs(self):
+        """Folds self-contained legacy jobs into campaigns keyed by their shared message."""
+        by_message = {}
+        for row, key in self._legacy_rows.items():
+            if not self._table.alive(row):
+                continue
+            campaign_id = by_message.get(key)
+            if campaign_id is None:
+                campaign_id = str(uuid.uuid4())
+                by_message[key] = campaign_id
+                subject, body = self._messages.get(key[0])
+                self._campaigns[campaign_id] = {
+                    'id': campaign_id,
+                    'message': key[0],
+                    'subject': subject,
+                    'body': body,
+                    'send_time': key[1],
+                    'status': 'pending'
+                }
+                self._campaign_jobs[campaign_id] = array('I')
+            self._table.set_campaign(row, campaign_id)
+            self._campaign_jobs[campaign_id].append(row)
+        self._legacy_rows = {}
+
+    # --- Read Indexes ---
+    def _pending_key(self, row):
+        campaign = self._campaigns.get(self._table.campaign_id(row))
+        send_time = campaign.get('send_time') if campaign is not None else None
+        return (_time_code(send_time) << 128) | self._table.key(row)
+
+    def _rebuild_indexes(self):
+        """Rebuilds the pending and count indexes from scratch in O(n log n)."""
+        time_codes = {campaign_id: _time_code(campaign.get('send_time'))
+                      for campaign_id, campaign in self._campaigns.items()}
+        self._pending = sorted((time_codes.get(campaign_id, 0) << 128) | key
+                               for _, campaign_id, key in self._table.iter_status('pending'))
+        self._counts = {campaign_id: {} for campaign_id in self._campaigns}
+        for (campaign_id, status), count in self._table.count_by_campaign().items():
+            counts = self._counts.setdefault(campaign_id, {})
+            bucket = status_bucket(status)
+            counts[bucket] = counts.get(bucket, 0) + count
+        self.version += 1
+
+    def _count(self, row, delta):
+        counts = self._counts.setdefault(self._table.campaign_id(row), {})
+        bucket = status_bucket(self._table.status(row))
+        counts[bucket] = counts.get(bucket, 0) + delta
+
+    def _unindex_pending(self, row):
+        key = self._pending_key(row)
+        index = bisect.bisect_left(self._pending, key)
+        if index < len(self._pending) and self._pending[index] == key:
+            del self._pending[index]
+
+    def _set_status(self, row, status):
+        """Changes a job's status and keeps the read indexes in step."""
+        was_pending = self._table.is_pending(row)
+        if was_pending and status != 'pending':
+            self._unindex_pending(row)
+        elif not was_pending and status == 'pending':
+            bisect.insort(self._pending, self._pending_key(row))
+        self._count(row, -1)
+        self._table.set_status(row, status)
+        self._count(row, 1)
+
+    def _unindex_pending_many(self, rows):
+        """Removes many pending keys at once: one linear filter instead of k list deletions."""
+        keys = [self._pending_key(row) for row in rows if self._table.is_pending(row)]
+        if len(keys) <= 64:
+            for key in keys:
+                index = bisect.bisect_left(self._pending, key)
+                if index < len(self._pending) and self._pending[index] == key:
+                    del self._pending[index]
+        else:
+            doomed = set(keys)
+            self._pending = [key for key in self._pending if key not in doomed]
+
+    def _index_pending_many(self, rows):
+        """Adds many pending keys at once; large batches are merged by Timsort in linear time."""
+        keys = sorted(self._pending_key(row) for row in rows if self._table.is_pending(row))
+        if len(keys) <= 64:
+            for key in keys:
+                bisect.insort(self._pending, key)
+        else:
+            self._pending.extend(keys)
+            self._pending.sort()
+
+    def _forget_job(self, row):
+        """Removes a job from the read indexes (the caller deletes its row)."""
+        if self._table.is_pending(row):
+            self._unindex_pending(row)
+        self._count(row, -1)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def _apply(self, record):
+        """Applies a single journal record to the in-memory index."""
+        op = record.get('op')
+        if op == 'add':
+            job = record['job']
+            if 'campaign_id' not in job:
+                # Self-contained job from an older journal; grouped into a campaign after loading
+                self._add_legacy_job(_job_from_record(job))
+            else:
+                row = self._table.add(job['id'], job['campaign_id'], job['number'], job['status'])
+                self._campaign_jobs.setdefault(job['campaign_id'], array('I')).append(row)
+        elif op == 'status':
+            row = self._table.row(record['id'])
+            if row is not None:
+                self._table.set_status(row, record['status'])
+        elif op == 'remove':
+            row = self._table.row(record['id'])
+            if row is not None:
+                self._table.delete(row)
+        elif op == 'message':
+            self._messages.add(record['hash'], record['subject'], record['body'])
+        elif op == 'campaign':
+            campaign = self._attach_message(_campaign_from_record(record['campaign']))
+            self._campaigns[campaign['id']] = campaign
+            self._campaign_jobs.setdefault(campaign['id'], array('I'))
+        elif op == 'campaign_status':
+            campaign = self._campaigns.get(record['id'])
+            if campaign is not None:
+                campaign['status'] = record['status']
+        elif op == 'remove_campaign':
+            self._drop_campaign(record['id'])
+        elif op == 'remove_many':
+            for job_id in record['ids']:
+                row = self._table.row(job_id)
+                if row is not None:
+                    self._table.delete(row)
+        elif op == 'move':
+            self._move_rows(self._rows_of(record['ids']), record['campaign_id'])
+        elif op == 'campaign_time':
+            campaign = self._campaigns.get(record['id'])
+            if campaign is not None:
+                campaign['send_time'] = datetime.fromisoformat(record['send_time'])
+        elif op == 'batch':
+            for sub_record in record['records']:
+                self._apply(sub_record)
+
+    def _attach_message(self, campaign):
+        """
+        Points a campaign at its interned message: campaigns read back by hash
+        get the shared subject and body, campaigns carrying their own text
+        (older journals, new campaigns) have it interned.
+        """
+        if 'message' in campaign and campaign['message'] in self._messages:
+            campaign['subject'], campaign['body'] = self._messages.get(campaign['message'])
+        else:
+            key, campaign['subject'], campaign['body'], _ = self._messages.intern(
+                campaign.get('subject', ''), campaign.get('body', ''))
+            campaign['message'] = key
+        return campaign
+
+    def _rows_of(self, job_ids):
+        """Returns the rows of the live jobs among job_ids (each at most once, in order)."""
+        rows = (self._table.row(job_id) for job_id in job_ids)
+        return list(dict.fromkeys(row for row in rows if row is not None))
+
+    def _live_campaign_rows(self, campaign_id):
+        """Returns the rows of the live jobs currently belonging to a campaign (skipping moved and removed ones)."""
+        table = self._table
+        return [row for row in self._campaign_jobs.get(campaign_id, ())
+                if table.alive(row) and table.campaign_id(row) == campaign_id]
+
+    def _move_rows(self, rows, campaign_id):
+        """Re-parents jobs onto another campaign (index lists only; the caller handles read indexes)."""
+        target = self._campaign_jobs.setdefault(campaign_id, array('I'))
+        for row in rows:
+            self._table.set_campaign(row, campaign_id)
+            target.append(row)
+
+    def _drop_campaign(self, campaign_id):
+        self._campaigns.pop(campaign_id, None)
+        rows = self._live_campaign_rows(campaign_id)
+        self._campaign_jobs.pop(campaign_id, None)
+        for row in rows:
+            self._table.delete(row)
+
+    # --- Writing ---
+    def _append(self, records):
+        """Appends a batch of records to the journal with a single write."""
+        if not records:
+            return
+        payload = ''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in records)
+        with _APPEND_SECONDS.time(), open(self.path, 'a', encoding='utf-8') as f:
+            f.write(payload)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._record_count += len(records)
+        self._maybe_compact()
+
+    def _append_transaction(self, records):
+        """Appends several records as one journal line, so a torn write drops all or nothing."""
+        if records:
+            self._append([{'op': 'batch', 'records': records}])
+
+    def _write_snapshot(self):
+        """Writes all live jobs to a temp file and atomically replaces the journal."""
+        tmp_path = self.path + '.tmp'
+        # Messages no longer used by any campaign are dropped from the new journal
+        self._messages.retain({campaign['message'] for campaign in self._campaigns.values()})
+        started = time.perf_counter()
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for key, (subject, body) in self._messages.items():
+                f.write(json.dumps(_message_record(key, subject, body), separators=(',', ':')) + '\n')
+            for campaign in self._campaigns.values():
+                f.write(json.dumps({'op': 'campaign', 'campaign': _campaign_to_record(campaign)}, separators=(',', ':')) + '\n')
+            for job in self._table.iter_json():
+                f.write('{"op":"add","job":' + job + '}\n')
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        _SNAPSHOT_SECONDS.observe(time.perf_counter() - started)
+        # Drop tombstoned rows and renumber the campaign row lists to match
+        self._table = self._table.compacted()
+        self._campaign_jobs = {campaign_id: array('I') for campaign_id in self._campaigns}
+        for row in self._table.rows():
+            self._campaign_jobs.setdefault(self._table.campaign_id(row), array('I')).append(row)
+        if self.fsync:
+            _fsync_directory(os.path.dirname(os.path.abspath(self.path)))
+        self._record_count = len(self._messages) + len(self._campaigns) + len(self._table)
+
+    def _maybe_compact(self):
+        live = len(self._messages) + len(self._campaigns) + len(self._table)
+        if (self._record_count >= self.compact_min_records
+                and self._record_count > self.compact_ratio * max(live, 1)):
+            self._write_snapshot()
+
+    def compact(self):
+        """Rewrites the journal so it only contains the live jobs."""
+        with self._lock:
+            self._ensure_loaded()
+            self._write_snapshot()
+
+    # --- Public API: Jobs ---
+    def _materialize(self, row):
+        """Returns a job dict with its campaign's message fields filled in."""
+        job = self._table.to_dict(row)
+        campaign = self._campaigns.get(job['campaign_id'])
+        if campaign is not None:
+            job['subject'] = campaign['subject']
+            job['body'] = campaign['body']
+            job['send_time'] = campaign['send_time']
+        return job
+
+    def all(self):
+        """Returns all stored jobs as dicts, joined with their campaign's message."""
+        with self._lock:
+            self._ensure_loaded()
+            return [self._materialize(row) for row in self._table.rows()]
+
+    def get(self, job_id):
+        """Returns a single job as a dict, or None if it does not exist."""
+        with self._lock:
+            self._ensure_loaded()
+            row = self._table.row(job_id)
+            return self._materialize(row) if row is not None else None
+
+    def update_status(self, job_id, status):
+        """Updates the status of a job."""
+        return self.update_status_many([job_id], status) == 1
+
+    def update_status_many(self, job_ids, status):
+        """Updates the status of several jobs with a single journal write."""
+        with self._lock:
+            self._ensure_loaded()
+            records = []
+            for job_id in job_ids:
+                row = self._table.row(job_id)
+                if row is None:
+                    continue
+                self._set_status(row, status)
+                records.append({'op': 'status', 'id': job_id, 'status': status})
+            if records:
+                self.version += 1
+            self._append(records)
+            return len(records)
+
+    def remove(self, job_id):
+        """Removes a job."""
+        with self._lock:
+            self._ensure_loaded()
+            row = self._table.row(job_id)
+            if row is None:
+                return False
+            self._forget_job(row)
+            self._table.delete(row)
+            self.version += 1
+            self._append([{'op': 'remove', 'id': job_id}])
+            return True
+
+    def replace_all(self, jobs):
+        """Replaces every stored job with the given (self-contained) list and compacts the journal."""
+        with self._lock:
+            self._table = JobTable()
+            self._legacy_rows = {}
+            self._campaigns = {}
+            self._campaign_jobs = {}
+            self._messages.clear()
+            for job in jobs:
+                self._add_legacy_job(job)
+            self._group_legacy_jobs()
+            self._rebuild_indexes()
+            self._loaded = True
+            self._write_snapshot()
+
+    # --- Public API: Campaigns ---
+    def add_campaign(self, campaign, numbers):
+        """
+        Stores a campaign and one pending recipient row per number with a
+        single journal write. Returns the created recipient rows as dicts.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            campaign = dict(campaign)
+            campaign.setdefault('status', 'pending')
+            campaign.pop('message', None)
+            key, campaign['subject'], campaign['body'], is_new = self._messages.intern(
+                campaign['subject'], campaign['body'])
+            campaign['message'] = key
+            campaign_id = campaign['id']
+            self._campaigns[campaign_id] = campaign
+            self._campaign_jobs[campaign_id] = array('I')
+            self._counts[campaign_id] = {}
+            records = []
+            if is_new:
+                records.append(_message_record(key, campaign['subject'], campaign['body']))
+            records.append({'op': 'campaign', 'campaign': _campaign_to_record(campaign)})
+            jobs = self._add_jobs(campaign_id, numbers, records)
+            self.version += 1
+            self._append(records)
+            return [job.copy() for job in jobs]
+
+    def add_jobs(self, campaign_id, numbers):
+        """
+        Adds one pending recipient row per number to an existing campaign with
+        a single journal write. Returns how many were added (0 if the campaign
+        no longer exists).
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if campaign_id not in self._campaigns:
+                return 0
+            records = []
+            jobs = self._add_jobs(campaign_id, numbers, records)
+            if jobs:
+                self.version += 1
+                self._append(records)
+            return len(jobs)
+
+    def _add_jobs(self, campaign_id, numbers, records):
+        """Creates pending rows for numbers, appending their journal records to records. Returns the job dicts."""
+        campaign_rows = self._campaign_jobs.setdefault(campaign_id, array('I'))
+        first = len(campaign_rows)
+        jobs = []
+        for number in numbers:
+            job_uuid = uuid.uuid4()
+            job = {'id': str(job_uuid), 'campaign_id': campaign_id, 'number': number, 'status': 'pending'}
+            campaign_rows.append(self._table.add(job['id'], campaign_id, number, 'pending', key=job_uuid.int))
+            records.append({'op': 'add', 'job': job})
+            jobs.append(job)
+        if jobs:
+            counts = self._counts.setdefault(campaign_id, {})
+            counts['pending'] = counts.get('pending', 0) + len(jobs)
+        self._index_pending_many(campaign_rows[first:])
+        return jobs
+
+    def campaigns(self):
+        """Returns copies of all stored campaigns."""
+        with self._lock:
+            self._ensure_loaded()
+            return [campaign.copy() for campaign in self._campaigns.values()]
+
+    def get_campaign(self, campaign_id):
+        """Returns a copy of a single campaign, or None if it does not exist."""
+        with self._lock:
+            self._ensure_loaded()
+            campaign = self._campaigns.get(campaign_id)
+            return campaign.copy() if campaign is not None else None
+
+    def campaign_jobs(self, campaign_id, status=None):
+        """Returns a campaign's recipient rows as dicts, optionally filtered by status."""
+        with self._lock:
+            self._ensure_loaded()
+            table = self._table
+            return [table.to_dict(row) for row in self._live_campaign_rows(campaign_id)
+                    if status is None or table.status(row) == status]
+
+    def update_campaign_status(self, campaign_id, status):
+        """Updates the status of a campaign."""
+        with self._lock:
+            self._ensure_loaded()
+            campaign = self._campaigns.get(campaign_id)
+            if campaign is None:
+                return False
+            campaign['status'] = status
+            self.version += 1
+            self._append([{'op': 'campaign_status', 'id': campaign_id, 'status': status}])
+            return True
+
+    def remove_campaign(self, campaign_id):
+        """Removes a campaign together with all of its recipient rows."""
+        with self._lock:
+            self._ensure_loaded()
+            if campaign_id not in self._campaigns:
+                return False
+            self._unindex_pending_many(self._live_campaign_rows(campaign_id))
+            self._drop_campaign(campaign_id)
+            self._counts.pop(campaign_id, None)
+            self.version += 1
+            self._append([{'op': 'remove_campaign', 'id': campaign_id}])
+            return True
+
+    # --- Public API: Bulk Operations ---
+    def select_pending(self, campaign_id=None, job_ids=None, start=None, end=None):
+        """
+        Returns the ids of pending jobs matching every given selector: a
+        campaign, an explicit list of ids and/or a send-time window
+        [start, end). Runs in time proportional to the selected jobs.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            table = self._table
+            if job_ids is not None:
+                candidates = (table.row(job_id) for job_id in job_ids)
+            elif campaign_id is not None:
+                candidates = self._live_campaign_rows(campaign_id)
+            else:
+                low = bisect.bisect_left(self._pending, _time_code(start) << 128) if start else 0
+                high = (bisect.bisect_left(self._pending, (_time_code(end) + 1) << 128) if end
+                        else len(self._pending))
+                candidates = (table.row_for_key(key & _KEY_MASK) for key in self._pending[low:high])
+
+            selected = []
+            seen = set()
+            for row in candidates:
+                if row is None or not table.is_pending(row) or row in seen:
+                    continue
+                if campaign_id is not None and table.campaign_id(row) != campaign_id:
+                    continue
+                if start is not None or end is not None:
+                    send_time = self._campaigns[table.campaign_id(row)]['send_time']
+                    if (start is not None and send_time < start) or (end is not None and send_time >= end):
+                        continue
+                seen.add(row)
+                selected.append(table.job_id(row))
+            return selected
+
+    def _pending_left(self, campaign_id):
+        return self._counts.get(campaign_id, {}).get('pending', 0)
+
+    def cancel_jobs(self, job_ids):
+        """
+        Removes pending jobs in one journal transaction.
+        Returns (cancelled_count, ids of campaigns left without pending jobs).
+        """
+        with self._lock:
+            self._ensure_loaded()
+            rows = [row for row in self._rows_of(job_ids) if self._table.is_pending(row)]
+            if not rows:
+                return 0, []
+            self._unindex_pending_many(rows)
+            touched = set()
+            ids = []
+            for row in rows:
+                self._count(row, -1)
+                touched.add(self._table.campaign_id(row))
+                ids.append(self._table.job_id(row))
+                self._table.delete(row)
+            self.version += 1
+            self._append_transaction([{'op': 'remove_many', 'ids': ids}])
+            return len(rows), [campaign_id for campaign_id in touched if not self._pending_left(campaign_id)]
+
+    def reschedule_jobs(self, job_ids, send_time):
+        """
+        Moves pending jobs to a new send time in one journal transaction.
+        A campaign whose pending jobs are all selected is simply re-timed;
+        otherwise the selected jobs are split off into a new campaign that
+        shares the original message. Returns (rescheduled_count, campaigns
+        to (re)register with the scheduler).
+        """
+        with self._lock:
+            self._ensure_loaded()
+            by_campaign = {}
+            for row in self._rows_of(job_ids):
+                if self._table.is_pending(row):
+                    by_campaign.setdefault(self._table.campaign_id(row), []).append(row)
+            if not by_campaign:
+                return 0, []
+
+            records = []
+            scheduled = []
+            moved = [row for rows in by_campaign.values() for row in rows]
+            self._unindex_pending_many(moved)
+            for campaign_id, rows in by_campaign.items():
+                campaign = self._campaigns[campaign_id]
+                if len(rows) == self._pending_left(campaign_id):
+                    campaign['send_time'] = send_time
+                    if campaign['status'] != 'pending':
+                        campaign['status'] = 'pending'
+                        records.append({'op': 'campaign_status', 'id': campaign_id, 'status': 'pending'})
+                    records.append({'op': 'campaign_time', 'id': campaign_id, 'send_time': send_time.isoformat()})
+                    scheduled.append(campaign.copy())
+                    continue
+
+                new_campaign = dict(campaign, id=str(uuid.uuid4()), send_time=send_time, status='pending')
+                self._campaigns[new_campaign['id']] = new_campaign
+                self._counts[new_campaign['id']] = {}
+                for row in rows:
+                    self._count(row, -1)
+                self._move_rows(rows, new_campaign['id'])
+                for row in rows:
+                    self._count(row, 1)
+                records.append({'op': 'campaign', 'campaign': _campaign_to_record(new_campaign)})
+                records.append({'op': 'move', 'ids': [self._table.job_id(row) for row in rows],
+                                'campaign_id': new_campaign['id']})
+                scheduled.append(new_campaign.copy())
+            self._index_pending_many(moved)
+            self.version += 1
+            self._append_transaction(records)
+            return len(moved), scheduled
+
+    # --- Public API: Scheduler Rehydration ---
+    def due_campaigns(self, until, after=None):
+        """
+        Returns copies of the pending/running campaigns that still have pending
+        recipients and are due in (after, until], ordered by send time.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            due = []
+            for campaign_id, campaign in self._campaigns.items():
+                if campaign['status'] not in ('pending', 'running') or not self._pending_left(campaign_id):
+                    continue
+                send_time = campaign['send_time']
+                if send_time <= until and (after is None or send_time > after):
+                    due.append(campaign.copy())
+            due.sort(key=lambda campaign: campaign['send_time'])
+            return due
+
+    def close_campaigns(self, campaign_ids, campaign_status, job_status):
+        """
+        Sets the status of several campaigns and of all their pending
+        recipients in one journal transaction. Returns the number of
+        recipients updated.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            records = []
+            rows = []
+            for campaign_id in campaign_ids:
+                campaign = self._campaigns.get(campaign_id)
+                if campaign is None:
+                    continue
+                for row in self._live_campaign_rows(campaign_id):
+                    if self._table.is_pending(row):
+                        rows.append(row)
+                        records.append({'op': 'status', 'id': self._table.job_id(row), 'status': job_status})
+                campaign['status'] = campaign_status
+                records.append({'op': 'campaign_status', 'id': campaign_id, 'status': campaign_status})
+            self._unindex_pending_many(rows)
+            for row in rows:
+                self._count(row, -1)
+                self._table.set_status(row, job_status)
+                self._count(row, 1)
+            if records:
+                self.version += 1
+            self._append_transaction(records)
+            return len(rows)
+
+    # --- Public API: Listing ---
+    def pending_page(self, limit, cursor=None):
+        """
+        Returns (jobs, next_cursor, total) for one page of pending jobs ordered
+        by send time. cursor is the opaque next_cursor of the previous page.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            start = 0
+            if cursor:
+                time_code, _, job_id = cursor.partition(':')
+                start = bisect.bisect_right(self._pending, (int(time_code) << 128) | id_key(job_id))
+            keys = self._pending[start:start + limit]
+            jobs = [self._materialize(self._table.row_for_key(key & _KEY_MASK)) for key in keys]
+            next_cursor = None
+            if keys and start + limit < len(self._pending):
+                next_cursor = f"{keys[-1] >> 128}:{jobs[-1]['id']}"
+            return jobs, next_cursor, len(self._pending)
+
+    def etag(self):
+        """Returns an opaque tag that changes whenever any job or campaign changes."""
+        with self._lock:
+            self._ensure_loaded()
+            return f"jobs-{self._token}-{self.version}"
+
+    def pending_count(self, campaign_id=None):
+        """Returns how many jobs are pending, overall or in one campaign, from the read indexes."""
+        with self._lock:
+            self._ensure_loaded()
+            if campaign_id is not None:
+                return self._pending_left(campaign_id)
+            return len(self._pending)
+
+    def summary(self):
+        """Returns per-campaign job counts by status bucket, without touching individual jobs."""
+        with self._lock:
+            self._ensure_loaded()
+            result = []
+            for campaign_id, campaign in self._campaigns.items():
+                counts = {bucket: count for bucket, count in self._counts.get(campaign_id, {}).items() if count}
+                entry = campaign.copy()
+                entry['counts'] = counts
+                entry['total'] = sum(counts.values())
+                result.append(entry)
+            return result
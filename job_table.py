@@ -0,0 +1,246 @@
+# job_table.py
+import json
+import re
+import uuid
+from array import array
+from collections import Counter
+
+# Namespace for the name-based UUIDs that stand in for job ids which are not canonical UUIDs
+_ODD_ID_NAMESPACE = uuid.UUID('40514ddb-e702-4953-b2bf-3a2c0ad29a8a')
+# The form str(uuid.uuid4()) produces; only ids in exactly this form are stored as raw bytes
+_CANONICAL_UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+def parse_job_id(job_id):
+    """Returns (key, canonical): the job id's 128-bit integer key and whether the id is a canonical UUID string."""
+    if isinstance(job_id, str) and _CANONICAL_UUID.fullmatch(job_id):
+        return int(job_id.replace('-', ''), 16), True
+    return uuid.uuid5(_ODD_ID_NAMESPACE, str(job_id)).int, False
+
+def format_job_id(raw):
+    """Formats 16 raw id bytes as a canonical UUID string."""
+    digits = raw.hex()
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+def id_key(job_id):
+    """Returns the 128-bit integer key of a job id: the UUID itself, or a name-based UUID for other ids."""
+    return parse_job_id(job_id)[0]
+
+def pack_number(number):
+    """
+    Packs "+<digits>" (up to 18 digits) into one integer, "1<digits>", so
+    leading zeros survive. Returns 0 if the number cannot be packed.
+    """
+    if isinstance(number, str) and 1 < len(number) <= 19 and number[0] == '+':
+        digits = number[1:]
+        if digits.isdigit() and digits.isascii():
+            return int('1' + digits)
+    return 0
+
+def unpack_number(packed):
+    return '+' + str(packed)[1:]
+
+class JobTable:
+    """
+    Columnar in-memory table of recipient jobs.
+
+    Each job is a row spread over compact columns: its id as 16 raw UUID
+    bytes, its campaign and status as integer codes into small per-table
+    lookup lists, and its phone number packed into a 64-bit integer
+    ("+254712345678" is stored as 1254712345678). Ids and numbers that do
+    not fit (ids that are not UUIDs, group ids) are kept in side dicts.
+    Only the status itself is coded: the reason of a "failed: <reason>"
+    status goes to a side dict too, so the status lookup list stays at the
+    handful of statuses the app uses however many distinct errors occur.
+    Rows are addressed by their position; deleted rows are tombstoned
+    (status code 0) until compacted() copies the live rows into a new table.
+
+    Dicts are only built by to_dict(), at the edge where jobs leave the store.
+    """
+
+    def __init__(self):
+        self._ids = bytearray()
+        self._campaign_col = array('I')
+        self._number_col = array('Q')
+        self._status_col = array('I')
+        self._rows = {}
+        self._odd_ids = {}
+        self._odd_numbers = {}
+        self._reasons = {}
+        self._campaign_codes = {None: 0}
+        self._campaign_names = [None]
+        self._status_codes = {}
+        self._status_names = [None]
+        self.live = 0
+
+    def __len__(self):
+        return self.live
+
+    # --- Codes ---
+    def campaign_code(self, campaign_id):
+        code = self._campaign_codes.get(campaign_id)
+        if code is None:
+            code = len(self._campaign_names)
+            self._campaign_names.append(campaign_id)
+            self._campaign_codes[campaign_id] = code
+        return code
+
+    def status_code(self, status):
+        """Returns the code of a bare status ('pending', 'sent', 'failed', ...), without any ': <reason>' part."""
+        code = self._status_codes.get(status)
+        if code is None:
+            code = len(self._status_names)
+            self._status_names.append(status)
+            self._status_codes[status] = code
+        return code
+
+    # --- Rows ---
+    def add(self, job_id, campaign_id, number, status, key=None):
+        """
+        Appends a job and returns its row. key may be passed when job_id is
+        known to be a canonical UUID string (e.g. freshly generated) to skip parsing.
+        A job with the same id is replaced.
+        """
+        canonical = True
+        if key is None:
+            key, canonical = parse_job_id(job_id)
+        old_row = self._rows.get(key)
+        if old_row is not None:
+            self.delete(old_row)
+        row = len(self._status_col)
+        self._ids += key.to_bytes(16, 'big')
+        self._campaign_col.append(self.campaign_code(campaign_id))
+        packed = pack_number(number)
+        self._number_col.append(packed)
+        self._status_col.append(0)
+        self.set_status(row, status)
+        if not canonical:
+            self._odd_ids[row] = job_id
+        if not packed:
+            self._odd_numbers[row] = number
+        self._rows[key] = row
+        self.live += 1
+        return row
+
+    def row(self, job_id):
+        """Returns the row of a live job, or None."""
+        return self._rows.get(id_key(job_id))
+
+    def row_for_key(self, key):
+        return self._rows.get(key)
+
+    def rows(self):
+        """Yields the rows of all live jobs in insertion order."""
+        status_col = self._status_col
+        return (row for row in range(len(status_col)) if status_col[row])
+
+    def alive(self, row):
+        return self._status_col[row] != 0
+
+    def delete(self, row):
+        if not self._status_col[row]:
+            return
+        del self._rows[self.key(row)]
+        self._status_col[row] = 0
+        self._odd_ids.pop(row, None)
+        self._odd_numbers.pop(row, None)
+        self._reasons.pop(row, None)
+        self.live -= 1
+
+    # --- Columns ---
+    def key(self, row):
+        return int.from_bytes(self._ids[row * 16:row * 16 + 16], 'big')
+
+    def job_id(self, row):
+        odd_id = self._odd_ids.get(row)
+        if odd_id is not None:
+            return odd_id
+        return format_job_id(self._ids[row * 16:row * 16 + 16])
+
+    def campaign_id(self, row):
+        return self._campaign_names[self._campaign_col[row]]
+
+    def set_campaign(self, row, campaign_id):
+        self._campaign_col[row] = self.campaign_code(campaign_id)
+
+    def number(self, row):
+        packed = self._number_col[row]
+        return unpack_number(packed) if packed else self._odd_numbers[row]
+
+    def status(self, row):
+        """Returns the job's full status, e.g. 'sent' or 'failed: <reason>'."""
+        reason = self._reasons.get(row)
+        status = self._status_names[self._status_col[row]]
+        return status if reason is None else f"{status}: {reason}"
+
+    def is_pending(self, row):
+        return self._status_col[row] == self._status_codes.get('pending')
+
+    def set_status(self, row, status):
+        """Sets a job's status; a 'failed: <reason>' status is stored as 'failed' with the reason on the side."""
+        status, _, reason = status.partition(': ')
+        self._status_col[row] = self.status_code(status)
+        if reason:
+            self._reasons[row] = reason
+        else:
+            self._reasons.pop(row, None)
+
+    def to_dict(self, row):
+        """Returns the job at row as a plain {'id', 'campaign_id', 'number', 'status'} dict."""
+        return {'id': self.job_id(row), 'campaign_id': self.campaign_id(row),
+                'number': self.number(row), 'status': self.status(row)}
+
+    # --- Scans ---
+    def count_by_campaign(self):
+        """Returns {(campaign_id, bare status): number of live jobs} in one pass over the code columns."""
+        counts = Counter(zip(self._campaign_col, self._status_col))
+        return {(self._campaign_names[campaign], self._status_names[status]): count
+                for (campaign, status), count in counts.items() if status}
+
+    def iter_status(self, status):
+        """Yields (row, campaign_id, key) for every live job with the given bare status."""
+        code = self._status_codes.get(status)
+        if code is None:
+            return
+        ids = self._ids
+        campaign_col = self._campaign_col
+        campaign_names = self._campaign_names
+        from_bytes = int.from_bytes
+        for row, row_status in enumerate(self._status_col):
+            if row_status == code:
+                yield row, campaign_names[campaign_col[row]], from_bytes(ids[row * 16:row * 16 + 16], 'big')
+
+    def iter_json(self):
+        """Yields each live job as the JSON text of its to_dict() form, reusing the encoded campaign and status fields."""
+        campaigns = [json.dumps(campaign_id) for campaign_id in self._campaign_names]
+        statuses = [json.dumps(status) for status in self._status_names]
+        ids = self._ids
+        for row in self.rows():
+            odd_id = self._odd_ids.get(row)
+            job_id = json.dumps(odd_id) if odd_id is not None else f'"{format_job_id(ids[row * 16:row * 16 + 16])}"'
+            packed = self._number_col[row]
+            number = f'"{unpack_number(packed)}"' if packed else json.dumps(self._odd_numbers[row])
+            status = statuses[self._status_col[row]] if row not in self._reasons else json.dumps(self.status(row))
+            yield (f'{{"id":{job_id},"campaign_id":{campaigns[self._campaign_col[row]]},'
+                   f'"number":{number},"status":{status}}}')
+
+    # --- Compaction ---
+    def compacted(self):
+        """Returns a table holding only the live rows, renumbered in order (self if nothing was deleted)."""
+        if self.live == len(self._status_col):
+            return self
+        table = JobTable()
+        for row in self.rows():
+            new_row = len(table._status_col)
+            table._ids += self._ids[row * 16:row * 16 + 16]
+            table._campaign_col.append(table.campaign_code(self.campaign_id(row)))
+            table._number_col.append(self._number_col[row])
+            table._status_col.append(table.status_code(self._status_names[self._status_col[row]]))
+            if row in self._odd_ids:
+                table._odd_ids[new_row] = self._odd_ids[row]
+            if row in self._odd_numbers:
+                table._odd_numbers[new_row] = self._odd_numbers[row]
+            if row in self._reasons:
+                table._reasons[new_row] = self._reasons[row]
+            table._rows[self.key(row)] = new_row
+        table.live = len(table._status_col)
+        return table
@@ -0,0 +1,65 @@
+# message_store.py
+import hashlib
+
+def message_hash(subject, body):
+    """Returns the content address of a message: the SHA-256 hex digest of its subject and body."""
+    # The subject's length keeps e.g. ("ab", "c") and ("a", "bc") apart
+    return hashlib.sha256(f"{len(subject)}:{subject}{body}".encode('utf-8')).hexdigest()
+
+class MessageStore:
+    """
+    Content-addressed table of message texts, keyed by message_hash().
+
+    Campaigns refer to their message by hash, so a text that is scheduled
+    many times (split or rescheduled campaigns, recurring promotions,
+    migrated legacy jobs) is kept once in memory and written once to disk.
+    intern() hands out the stored strings, so every campaign using the same
+    text shares the same str objects; texts already stored are found by a
+    dict lookup on the text itself, without hashing them again.
+    """
+
+    def __init__(self):
+        self._messages = {}
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __contains__(self, key):
+        return key in self._messages
+
+    def intern(self, subject, body):
+        """
+        Stores a message if it is new. Returns (hash, subject, body, is_new),
+        where subject and body are the shared stored copies.
+        """
+        key = self._keys.get((subject, body))
+        if key is None:
+            key = message_hash(subject, body)
+        stored = self._messages.get(key)
+        if stored is not None:
+            return key, stored[0], stored[1], False
+        self.add(key, subject, body)
+        return key, subject, body, True
+
+    def add(self, key, subject, body):
+        """Stores a message read back from disk under its known hash."""
+        if key not in self._messages:
+            self._messages[key] = (subject, body)
+            self._keys[(subject, body)] = key
+
+    def get(self, key):
+        """Returns (subject, body) for a hash, or None."""
+        return self._messages.get(key)
+
+    def items(self):
+        return self._messages.items()
+
+    def retain(self, keys):
+        """Drops every message whose hash is not in keys."""
+        self._messages = {key: message for key, message in self._messages.items() if key in keys}
+        self._keys = {message: key for key, message in self._messages.items()}
+
+    def clear(self):
+        self._messages = {}
+        self._keys = {}
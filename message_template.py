@@ -0,0 +1,67 @@
+# message_template.py
+import re
+
+# Placeholders look like {{name}} or {{name|fallback}}; field names are letters, digits and underscores
+_PLACEHOLDER = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*(?:\|([^{}]*))?\}\}")
+
+class TemplateError(ValueError):
+    """Raised when a message template cannot be compiled."""
+
+class CompiledTemplate:
+    """
+    A message template parsed once into a str.format pattern plus the list
+    of fields it needs, so rendering a recipient's message is one dict
+    lookup per field and a single format() call.
+    """
+    __slots__ = ('source', 'fields', '_pattern', '_lookups')
+
+    def __init__(self, source, pattern, lookups):
+        self.source = source
+        self._pattern = pattern
+        self._lookups = lookups
+        self.fields = tuple(dict.fromkeys(name for name, _ in lookups))
+
+    @property
+    def is_static(self):
+        """True if every recipient gets the same text."""
+        return not self._lookups
+
+    def render(self, attributes=None, number=None):
+        """
+        Renders the message for one recipient. attributes is the recipient's
+        attribute dict (or None); the special field "number" is the recipient's
+        number. Missing fields use the placeholder's fallback, or stay empty.
+        """
+        if not self._lookups:
+            return self._pattern
+        if attributes is None:
+            attributes = {}
+        values = []
+        for name, fallback in self._lookups:
+            value = attributes.get(name)
+            if value is None or value == '':
+                value = number if name == 'number' and number is not None else fallback
+            values.append(value)
+        return self._pattern.format(*values)
+
+def compile_template(text):
+    """Compiles a message template. Raises TemplateError on an unterminated or malformed placeholder."""
+    pattern = []
+    lookups = []
+    position = 0
+    for match in _PLACEHOLDER.finditer(text):
+        literal = text[position:match.start()]
+        if '{{' in literal or '}}' in literal:
+            raise TemplateError(f"Malformed placeholder near: {literal[literal.find('{{'):][:30]!r}")
+        pattern.append(literal.replace('{', '{{').replace('}', '}}'))
+        pattern.append(f"{{{len(lookups)}}}")
+        lookups.append((match.group(1), match.group(2) or ''))
+        position = match.end()
+    literal = text[position:]
+    if '{{' in literal or '}}' in literal:
+        raise TemplateError(f"Malformed placeholder near: {literal[literal.find('{{'):][:30]!r}")
+    if not lookups:
+        # Static text: render() returns it as is, without going through format()
+        return CompiledTemplate(text, text, ())
+    pattern.append(literal.replace('{', '{{').replace('}', '}}'))
+    return CompiledTemplate(text, ''.join(pattern), tuple(lookups))
@@ -0,0 +1,219 @@
+# metrics.py
+import bisect
+import math
+import os
+import threading
+import time
+
+# Set WHATSAPP_METRICS=0 to turn every recording call into a no-op
+ENABLED = os.environ.get("WHATSAPP_METRICS", "1") != "0"
+
+# Upper bounds (seconds) for latency histograms: sub-millisecond file writes up to minute-long browser sends
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Every metric created in this process, in creation order; render() exposes them all
+REGISTRY = []
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+# --- Series ---
+class _Value:
+    """One counter or gauge series. Its value is either recorded or read from a function at scrape time."""
+    __slots__ = ('value', 'function', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if ENABLED:
+            with self._lock:
+                self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        if ENABLED:
+            self.value = value
+
+    def set_function(self, function):
+        """Reads the value from function() whenever metrics are scraped, so nothing is recorded in between."""
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            return self.function()
+        return self.value
+
+class _Timer:
+    __slots__ = ('_histogram', '_start')
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+class _HistogramValue:
+    """One histogram series: a count per bucket, plus the sum and count of all observations."""
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        if ENABLED:
+            index = bisect.bisect_left(self.bounds, value)
+            with self._lock:
+                self.counts[index] += 1
+                self.sum += value
+                self.count += 1
+
+    def time(self):
+        """Context manager that observes the duration of its block."""
+        return _Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+# --- Metrics ---
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        Returns the series for these label values, creating it on first use.
+        Hot paths should look a series up once and keep it.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(value) for value in values)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in sorted(self._series.items()):
+            lines.extend(self._render_series(values, series))
+        return lines
+
+class Counter(_Metric):
+    """A value that only goes up (sends, failures, bytes written)."""
+    kind = 'counter'
+
+    def _new_series(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_series(self, values, series):
+        return [f"{self.name}{_label_text(self.labelnames, values)} {_format_value(series.get())}"]
+
+class Gauge(Counter):
+    """A value that goes up and down (queue depth, pending jobs)."""
+    kind = 'gauge'
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def set_function(self, function):
+        self.labels().set_function(function)
+
+class Histogram(_Metric):
+    """Distribution of observed values (usually durations in seconds) over fixed buckets."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _render_series(self, values, series):
+        counts, total, count = series.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            labels = _label_text(self.labelnames, values, ('le', _format_value(float(bound))))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _label_text(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+# --- Exposition ---
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def render():
+    """Returns every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            # A failing gauge function must not take the whole scrape down
+            lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+    return '\n'.join(lines) + '\n'
+
+# --- Shared Metrics ---
+# Defined here rather than next to their call sites so every module records into the same series
+MESSAGES_TOTAL = Counter('whatsapp_messages_total', 'Messages handed to a transport, by transport and result.',
+                         ('transport', 'result'))
+STAGE_SECONDS = Histogram('whatsapp_send_stage_seconds',
+                          'Time spent per message in each send stage (render, send, open_chat, type, persist).',
+                          ('stage',))
+SCHEDULER_LAG_SECONDS = Histogram('whatsapp_scheduler_lag_seconds',
+                                  'Delay between a scheduled message\'s planned send_time and its actual send.',
+                                  buckets=(0.1, 1, 5, 15, 30, 60, 300, 900, 1800, 3600, 21600, 86400))
+QUEUE_DEPTH = Gauge('whatsapp_queue_depth', 'Items waiting in a queue (send pipeline or state writer).', ('queue',))
+PENDING_JOBS = Gauge('whatsapp_pending_jobs', 'Scheduled messages still waiting to be sent.')
+FILE_IO_SECONDS = Histogram('whatsapp_file_io_seconds', 'Time spent writing state files, by operation.', ('operation',))
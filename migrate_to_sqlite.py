@@ -0,0 +1,103 @@
+# migrate_to_sqlite.py
+# Copies the file-based state (customer_numbers.txt, contact_attributes.jsonl,
+# the scheduled jobs journal or legacy scheduled_jobs.json, and the send_history/
+# log or, if there is none yet, pywhatkit's PyWhatKit_DB.txt send log)
+# into the SQLite database used when WHATSAPP_STORAGE=sqlite.
+#
+# Usage: python migrate_to_sqlite.py [--db whatsapp_sender.db] [--numbers customer_numbers.txt]
+#            [--attributes contact_attributes.jsonl] [--journal scheduled_jobs.jsonl] [--legacy-jobs scheduled_jobs.json]
+#            [--send-history send_history] [--history PyWhatKit_DB.txt]
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from contact_attributes import ContactAttributeStore
+from contact_store import ContactStore
+from job_store import JobStore
+from send_history import SendHistoryLog, parse_pywhatkit_log
+from sqlite_store import SqliteContactAttributeStore, SqliteContactStore, SqliteDatabase, SqliteJobStore
+
+# Rows per transaction when copying large tables
+BATCH_SIZE = 10000
+
+def _history_entry(record):
+    """Converts a send history log record to a send_history table row."""
+    status = record['status']
+    if status == 'failed' and record.get('error'):
+        status = f"failed: {record['error']}"
+    return {'sent_at': datetime.fromisoformat(record['sent_at']), 'number': record['number'],
+            'message': record.get('message', ''), 'status': status,
+            'job_id': record.get('job_id'), 'campaign_id': record.get('campaign_id')}
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate file-based state into the SQLite backend.")
+    parser.add_argument('--db', default='whatsapp_sender.db')
+    parser.add_argument('--numbers', default='customer_numbers.txt')
+    parser.add_argument('--attributes', default='contact_attributes.jsonl')
+    parser.add_argument('--journal', default='scheduled_jobs.jsonl')
+    parser.add_argument('--legacy-jobs', default='scheduled_jobs.json')
+    parser.add_argument('--send-history', default='send_history', help='directory of the rotating send history log')
+    parser.add_argument('--history', default='PyWhatKit_DB.txt')
+    args = parser.parse_args()
+
+    database = SqliteDatabase(args.db)
+    contacts = SqliteContactStore(database)
+    jobs = SqliteJobStore(database)
+    if contacts.count() or jobs.campaigns():
+        print(f"[MIGRATE] {args.db} already holds contacts or campaigns; refusing to migrate twice.")
+        sys.exit(1)
+    start = time.perf_counter()
+
+    numbers = ContactStore(args.numbers).all()
+    for offset in range(0, len(numbers), BATCH_SIZE):
+        contacts.add_many(numbers[offset:offset + BATCH_SIZE])
+    print(f"[MIGRATE] Copied {len(numbers)} contact(s) from {args.numbers}.")
+
+    if os.path.exists(args.attributes):
+        attributes = list(ContactAttributeStore(args.attributes).all().items())
+        attribute_store = SqliteContactAttributeStore(database)
+        for offset in range(0, len(attributes), BATCH_SIZE):
+            attribute_store.set_many(dict(attributes[offset:offset + BATCH_SIZE]), merge=False)
+        print(f"[MIGRATE] Copied personalization fields of {len(attributes)} contact(s) from {args.attributes}.")
+
+    if os.path.exists(args.journal) or os.path.exists(args.legacy_jobs):
+        # Loading the file store also migrates a legacy scheduled_jobs.json into a journal
+        file_jobs = JobStore(args.journal, legacy_path=args.legacy_jobs)
+        file_jobs.load()
+        campaign_count = job_count = 0
+        for campaign in file_jobs.campaigns():
+            campaign_jobs = file_jobs.campaign_jobs(campaign['id'])
+            jobs.import_campaign(campaign, campaign_jobs)
+            campaign_count += 1
+            job_count += len(campaign_jobs)
+        print(f"[MIGRATE] Copied {campaign_count} campaign(s) with {job_count} job(s) from {args.journal}.")
+
+    if os.path.isdir(args.send_history):
+        entries = (_history_entry(record) for record in SendHistoryLog(args.send_history).records())
+        source = args.send_history
+    elif os.path.exists(args.history):
+        entries = parse_pywhatkit_log(args.history)
+        source = args.history
+    else:
+        entries = None
+    if entries is not None:
+        batch = []
+        copied = 0
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) >= BATCH_SIZE:
+                database.add_send_history(batch)
+                copied += len(batch)
+                batch = []
+        if batch:
+            database.add_send_history(batch)
+            copied += len(batch)
+        print(f"[MIGRATE] Copied {copied} send history entr{'y' if copied == 1 else 'ies'} from {source}.")
+
+    database.checkpoint()
+    print(f"[MIGRATE] Done in {time.perf_counter() - start:.2f} s. Start the app with WHATSAPP_STORAGE=sqlite.")
+
+if __name__ == '__main__':
+    main()
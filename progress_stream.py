@@ -0,0 +1,131 @@
+# progress_stream.py
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+
+class ProgressBroadcaster:
+    """
+    In-process fan-out of send progress to Server-Sent Events subscribers.
+
+    Senders report campaign starts, per-recipient outcomes and campaign ends;
+    the broadcaster keeps rolling totals per campaign and encodes each event
+    once into an SSE frame in a shared ring buffer. Subscribers only remember
+    the sequence number of the last frame they sent and copy newer frames
+    out of the buffer, so each extra dashboard adds a socket write, not
+    another encoding or another queue. While nobody is subscribed,
+    per-recipient frames are not built at all; a subscriber always starts
+    from a snapshot of the current totals.
+    """
+
+    def __init__(self, buffer_size=1000, keep_finished=20, heartbeat_interval=15.0):
+        self.buffer_size = buffer_size
+        self.keep_finished = keep_finished
+        self.heartbeat_interval = heartbeat_interval
+        self._frames = deque(maxlen=buffer_size)
+        self._sequence = 0
+        self._campaigns = OrderedDict()
+        self._subscribers = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    # --- Publishing ---
+    def _publish(self, event, data):
+        """Encodes an event once and wakes every subscriber. Call with the lock held."""
+        self._sequence += 1
+        payload = json.dumps(data, separators=(',', ':'))
+        self._frames.append((self._sequence, f"id: {self._sequence}\nevent: {event}\ndata: {payload}\n\n"))
+        self._cond.notify_all()
+
+    def campaign_started(self, campaign_id, total, kind='scheduled'):
+        """Starts (or restarts) the totals of a campaign with total recipients to send."""
+        with self._cond:
+            totals = {'campaign_id': campaign_id, 'kind': kind, 'status': 'running',
+                      'total': total, 'sent': 0, 'failed': 0, 'started_at': time.time()}
+            self._campaigns.pop(campaign_id, None)
+            self._campaigns[campaign_id] = totals
+            self._publish('campaign', totals)
+
+    def record(self, campaign_id, number, error=None, job_id=None):
+        """Counts one send attempt and, if anyone is listening, pushes it with the campaign's totals."""
+        with self._cond:
+            totals = self._campaigns.get(campaign_id)
+            if totals is not None:
+                totals['sent' if error is None else 'failed'] += 1
+            if self._subscribers:
+                self._publish('send', {
+                    'campaign_id': campaign_id,
+                    'job_id': job_id,
+                    'number': number,
+                    'status': 'sent' if error is None else 'failed',
+                    'error': None if error is None else str(error),
+                    'totals': totals
+                })
+
+    def campaign_finished(self, campaign_id, status='completed'):
+        with self._cond:
+            totals = self._campaigns.get(campaign_id)
+            if totals is None:
+                return
+            totals['status'] = status
+            totals['finished_at'] = time.time()
+            # Move it to the end so the oldest finished campaigns are dropped first
+            self._campaigns.move_to_end(campaign_id)
+            self._publish('campaign', totals)
+            finished = [key for key, value in self._campaigns.items() if value['status'] != 'running']
+            for key in finished[:max(0, len(finished) - self.keep_finished)]:
+                del self._campaigns[key]
+
+    def totals(self):
+        """Returns a copy of the totals of running and recently finished campaigns."""
+        with self._cond:
+            return [dict(totals) for totals in self._campaigns.values()]
+
+    # --- Subscribing ---
+    def subscribe(self):
+        """
+        Yields SSE frames: a snapshot of all campaign totals first, then every
+        new event, with a comment line as heartbeat when idle. A subscriber
+        that falls further behind than the buffer gets a fresh snapshot.
+        Ends when close() is called or the generator is closed.
+        """
+        with self._cond:
+            self._subscribers += 1
+            last = self._sequence
+            snapshot = self._snapshot_frame()
+        try:
+            yield snapshot
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._sequence != last or self._closed, self.heartbeat_interval)
+                    if self._closed:
+                        return
+                    if self._sequence == last:
+                        frames = None
+                    elif self._frames and self._frames[0][0] <= last + 1:
+                        # Only the newest frames are copied, walking the ring buffer from its end
+                        frames = [frame for _, frame in islice(reversed(self._frames), self._sequence - last)]
+                        frames.reverse()
+                    else:
+                        frames = [self._snapshot_frame()]
+                    last = self._sequence
+                # Sockets are written outside the lock so one slow client cannot stall the senders
+                yield ''.join(frames) if frames else ": heartbeat\n\n"
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+
+    def _snapshot_frame(self):
+        payload = json.dumps({'campaigns': list(self._campaigns.values())}, separators=(',', ':'))
+        return f"id: {self._sequence}\nevent: snapshot\ndata: {payload}\n\n"
+
+    def subscriber_count(self):
+        with self._cond:
+            return self._subscribers
+
+    def close(self):
+        """Ends every subscription (used on shutdown)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,128 @@
+# retry_engine.py
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from transport import is_transient
+
+class RetryPolicy:
+    """
+    Exponential backoff with jitter. Attempt n (1 = the first send) is
+    followed by a wait between half and all of min(max_delay,
+    base_delay * multiplier ** (n - 1)), so retries from one outage spread
+    out instead of coming back together. After max_attempts sends the
+    message is given up on.
+    """
+
+    def __init__(self, max_attempts=5, base_delay=30.0, max_delay=3600.0, multiplier=2.0, seed=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self._random = random.Random(seed)
+
+    def delay(self, attempt):
+        """Seconds to wait after the given failed attempt."""
+        cap = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return cap / 2 + self._random.uniform(0, cap / 2)
+
+class RetryEngine:
+    """
+    Decides what happens to a failed send and schedules retries.
+
+    handle_failure(task, error) returns 'retry', 'dead' or 'failed'.
+    Transient failures with attempts left are put on the dispatcher's timing
+    wheel as one-off entries, so nothing holds a worker thread while they
+    wait; when one comes due (within the send window, outside quiet hours
+    and within the slot capacity) resubmit(task, slot_time) puts it back on
+    the send pipeline and returns True, or False if the task no longer needs
+    sending; it returns None if the pipeline had no room, and the retry
+    waits for the next slot. Transient failures out of attempts go to
+    on_exhausted(task, error) (the dead-letter queue); permanent ones are
+    final straight away.
+
+    Retries waiting on the wheel are counted per campaign, so completion
+    can wait for them with wait_campaign().
+    """
+
+    def __init__(self, dispatcher, resubmit, on_exhausted, policy=None, classify=is_transient):
+        self.dispatcher = dispatcher
+        self.resubmit = resubmit
+        self.on_exhausted = on_exhausted
+        self.policy = policy or RetryPolicy()
+        self.classify = classify
+        self._waiting = Counter()
+        # Retry key -> the task waiting under it
+        self._tasks = {}
+        self._cond = threading.Condition()
+
+    def handle_failure(self, task, error, window=None):
+        if not self.classify(error):
+            return 'failed'
+        if task.attempts >= self.policy.max_attempts:
+            self.on_exhausted(task, error)
+            return 'dead'
+        self.schedule(task, datetime.now() + timedelta(seconds=self.policy.delay(task.attempts)), window)
+        return 'retry'
+
+    def schedule(self, task, when, window=None):
+        """
+        Puts a task on the dispatcher to be resubmitted from when on. A task
+        whose job already has a retry waiting replaces it (it is counted
+        once); if the dispatcher rejects the time, nothing is counted.
+        """
+        # A task without a job (Send Now) is keyed by itself
+        key = ('retry', task.job_id or id(task))
+        # Kept on the task, so the send pipeline can check it again when the retry comes up
+        task.window = window
+        with self._cond:
+            # Held across the call, so a release for the new entry waits until it is registered
+            self.dispatcher.schedule(key, when, window,
+                                     release=lambda key, limit, slot_time: self._release(key, task, slot_time))
+            previous = self._tasks.get(key)
+            if previous is not None:
+                self._uncount(previous.campaign_id)
+            self._tasks[key] = task
+            self._waiting[task.campaign_id] += 1
+
+    def _uncount(self, campaign_id):
+        """Call with the lock held."""
+        self._waiting[campaign_id] -= 1
+        if self._waiting[campaign_id] <= 0:
+            del self._waiting[campaign_id]
+        self._cond.notify_all()
+
+    def _release(self, key, task, slot_time):
+        """Dispatcher callback for a due retry. Returns (released, finished) like a campaign release."""
+        with self._cond:
+            if self._tasks.get(key) is not task:
+                # Replaced by a later schedule() of the same job, which is sent instead
+                return 0, True
+        # Stays False if resubmit raises: the dispatcher gives up on the retry
+        queued = False
+        try:
+            queued = self.resubmit(task, slot_time)
+        finally:
+            # Resubmitted tasks are counted by the pipeline before they stop counting here
+            with self._cond:
+                if queued is not None and self._tasks.get(key) is task:
+                    del self._tasks[key]
+                    self._uncount(task.campaign_id)
+        if queued is None:
+            # The pipeline is full: still waiting, for the next slot
+            return 0, False
+        return (1 if queued else 0), True
+
+    def waiting(self, campaign_id):
+        with self._cond:
+            return self._waiting.get(campaign_id, 0)
+
+    def waiting_count(self):
+        with self._cond:
+            return sum(self._waiting.values())
+
+    def wait_campaign(self, campaign_id, timeout=None):
+        """Blocks until no retry of the campaign is waiting on the dispatcher."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._waiting.get(campaign_id), timeout)
@@ -0,0 +1,348 @@
+# send_history.py
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+_SEGMENT_FILE = re.compile(r"segment-(\d{6})\.jsonl\.gz")
+# Each block keeps a Bloom filter of its numbers: 16 bits per record and 3 bit positions
+# per number give about 0.5% false positives (blocks decompressed for nothing)
+_FILTER_BITS_PER_RECORD = 16
+_FILTER_HASHES = 3
+
+def parse_pywhatkit_log(path):
+    """
+    Yields send history entries from pywhatkit's PyWhatKit_DB.txt, which holds
+    "Date:", "Time:", "Phone Number:"/"Group ID:" and "Message:" lines per send,
+    separated by a line of dashes.
+    """
+    entry = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line.startswith('-----'):
+                if 'number' in entry and 'date' in entry:
+                    day, month, year = (int(part) for part in entry['date'].split('/'))
+                    hour, minute = (int(part) for part in entry.get('time', '0:0').split(':'))
+                    yield {
+                        'sent_at': datetime(year, month, day, hour, minute),
+                        'number': entry['number'],
+                        'message': entry.get('message', ''),
+                        'status': 'sent'
+                    }
+                entry = {}
+            elif line.startswith('Date: '):
+                entry['date'] = line[len('Date: '):]
+            elif line.startswith('Time: '):
+                entry['time'] = line[len('Time: '):]
+            elif line.startswith('Phone Number: '):
+                entry['number'] = line[len('Phone Number: '):]
+            elif line.startswith('Group ID: '):
+                entry['number'] = line[len('Group ID: '):]
+            elif line.startswith('Message: '):
+                entry['message'] = line[len('Message: '):]
+
+def _filter_positions(number, size_bits):
+    digest = int.from_bytes(hashlib.blake2b(number.encode('utf-8'), digest_size=4 * _FILTER_HASHES).digest(), 'big')
+    return [(digest >> (32 * i)) % size_bits for i in range(_FILTER_HASHES)]
+
+def _number_filter(numbers, size_bits):
+    bits = bytearray((size_bits + 7) // 8)
+    for number in numbers:
+        for position in _filter_positions(number, size_bits):
+            bits[position >> 3] |= 1 << (position & 7)
+    return bytes(bits)
+
+def _time_key(value):
+    """Datetimes and ISO strings compare as ISO strings, which sort chronologically."""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+class _Block:
+    """Location and summary of one compressed block of records."""
+    __slots__ = ('segment', 'offset', 'length', 'first_seq', 'last_seq', 'start', 'end', 'campaigns', 'numbers')
+
+    def __init__(self, segment, entry):
+        self.segment = segment
+        self.offset = entry['offset']
+        self.length = entry['length']
+        self.first_seq = entry['first_seq']
+        self.last_seq = entry['last_seq']
+        self.start = entry['start']
+        self.end = entry['end']
+        self.campaigns = frozenset(entry['campaigns'])
+        self.numbers = base64.b64decode(entry['numbers'])
+
+    def may_contain(self, number, positions):
+        """
+        False if the block certainly has no record for number (Bloom filter
+        lookup). positions caches the number's bit positions per filter size.
+        """
+        bits = self.numbers
+        size_bits = len(bits) * 8
+        number_positions = positions.get(size_bits)
+        if number_positions is None:
+            number_positions = positions[size_bits] = _filter_positions(number, size_bits)
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in number_positions)
+
+# --- Rotating Send History ---
+class SendHistoryLog:
+    """
+    Structured send history: one JSON record per send attempt with its
+    sequence number, sent_at, number, campaign and job ids, status, error,
+    message and timings.
+
+    New records are appended to a small uncompressed tail file. Every
+    block_records records the tail is sealed: the block is gzip-compressed
+    and appended to the current segment file (segment-NNNNNN.jsonl.gz, a
+    valid multi-member gzip file, so zcat reads it whole), and one line
+    describing it - offset, length, time range, campaigns and a Bloom filter
+    of its numbers - is appended to the segment's index file. Segments are
+    rotated once they reach max_segment_bytes, and the oldest are deleted
+    beyond max_segments.
+
+    The block summaries are kept in memory (about 2 KB per 1000 records). A
+    query skips every block whose time range, campaigns or number filter
+    cannot match and only decompresses the blocks left over, so it never
+    scans the whole history.
+
+    Blocks are written before their index line and the tail is truncated
+    last; on load, data past the last indexed block is cut off and tail
+    records that were already sealed are dropped, so a crash at any point
+    neither loses nor duplicates records.
+    """
+
+    def __init__(self, directory, legacy_path=None, block_records=1000, max_segment_bytes=64 * 1024 * 1024,
+                 max_segments=None):
+        self.directory = directory
+        self.legacy_path = legacy_path
+        self.block_records = block_records
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segments = max_segments
+        self.tail_path = os.path.join(directory, 'tail.jsonl')
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._blocks = []
+        self._tail = []
+        self._tail_file = None
+        self._seq = 0
+        self._segment = 0
+        self._segment_size = 0
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:06d}.jsonl.gz")
+
+    def _index_path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:06d}.idx.jsonl")
+
+    # --- Loading ---
+    def load(self):
+        """Reads the segment indexes and the tail, importing PyWhatKit_DB.txt on first use."""
+        with self._lock:
+            self._ensure_loaded()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        segments = sorted(int(match.group(1)) for match in map(_SEGMENT_FILE.fullmatch, os.listdir(self.directory))
+                          if match)
+        self._blocks = []
+        for segment in segments:
+            self._load_segment(segment)
+        if segments:
+            self._segment = segments[-1]
+            self._segment_size = os.path.getsize(self._segment_path(self._segment))
+        self._seq = self._blocks[-1].last_seq if self._blocks else 0
+        self._tail = []
+        if os.path.exists(self.tail_path):
+            with open(self.tail_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write
+                        break
+                    if record['seq'] > self._seq:
+                        self._tail.append(record)
+                        self._seq = record['seq']
+        # Rewrite the tail so it holds exactly the records kept in memory
+        tmp_path = self.tail_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in self._tail))
+        os.replace(tmp_path, self.tail_path)
+        self._tail_file = open(self.tail_path, 'a', encoding='utf-8')
+        self._loaded = True
+        if not self._seq and self.legacy_path and os.path.exists(self.legacy_path):
+            imported = self._append_many(parse_pywhatkit_log(self.legacy_path))
+            print(f"[SEND HISTORY] Imported {imported} entr{'y' if imported == 1 else 'ies'} from {self.legacy_path}.")
+
+    def _load_segment(self, segment):
+        end = 0
+        index_path = self._index_path(segment)
+        if os.path.exists(index_path):
+            index_end = 0
+            with open(index_path, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    self._blocks.append(_Block(segment, entry))
+                    end = entry['offset'] + entry['length']
+                    index_end += len(line)
+            if os.path.getsize(index_path) > index_end:
+                # Cut a torn index line so the next one starts on a fresh line
+                with open(index_path, 'r+b') as f:
+                    f.truncate(index_end)
+        segment_path = self._segment_path(segment)
+        if os.path.getsize(segment_path) > end:
+            # A block written without its index line; its records are still in the tail
+            with open(segment_path, 'r+b') as f:
+                f.truncate(end)
+
+    # --- Writing ---
+    def append(self, entry):
+        """Appends one send attempt. sent_at may be a datetime or an ISO string."""
+        with self._lock:
+            self._ensure_loaded()
+            self._append_many([entry])
+
+    def append_many(self, entries):
+        """Appends several send attempts with one write per block. Returns how many were added."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._append_many(entries)
+
+    def _append_many(self, entries):
+        count = 0
+        lines = []
+        for entry in entries:
+            self._seq += 1
+            record = {'seq': self._seq}
+            record.update(entry)
+            record['seq'] = self._seq
+            record['sent_at'] = _time_key(record['sent_at'])
+            self._tail.append(record)
+            lines.append(json.dumps(record, separators=(',', ':')) + '\n')
+            count += 1
+            if len(self._tail) >= self.block_records:
+                self._seal()
+                lines = []
+        if lines:
+            self._tail_file.write(''.join(lines))
+            self._tail_file.flush()
+        return count
+
+    def _seal(self):
+        """Compresses the tail into a new block of the current segment and empties the tail."""
+        records = self._tail
+        if not records:
+            return
+        if not self._segment or self._segment_size >= self.max_segment_bytes:
+            self._rotate()
+        payload = gzip.compress(''.join(json.dumps(record, separators=(',', ':')) + '\n'
+                                        for record in records).encode('utf-8'))
+        with open(self._segment_path(self._segment), 'ab') as f:
+            f.write(payload)
+        times = [record['sent_at'] for record in records]
+        campaigns = sorted({record['campaign_id'] for record in records if record.get('campaign_id')})
+        entry = {'offset': self._segment_size, 'length': len(payload),
+                 'first_seq': records[0]['seq'], 'last_seq': records[-1]['seq'],
+                 'start': min(times), 'end': max(times), 'count': len(records),
+                 'campaigns': campaigns}
+        numbers = _number_filter({record['number'] for record in records}, len(records) * _FILTER_BITS_PER_RECORD)
+        entry['numbers'] = base64.b64encode(numbers).decode('ascii')
+        with open(self._index_path(self._segment), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._blocks.append(_Block(self._segment, entry))
+        self._segment_size += len(payload)
+        self._tail = []
+        self._tail_file.close()
+        self._tail_file = open(self.tail_path, 'w', encoding='utf-8')
+
+    def _rotate(self):
+        self._segment += 1
+        self._segment_size = 0
+        open(self._segment_path(self._segment), 'wb').close()
+        segments = sorted({block.segment for block in self._blocks} | {self._segment})
+        if self.max_segments and len(segments) > self.max_segments:
+            expired = set(segments[:len(segments) - self.max_segments])
+            self._blocks = [block for block in self._blocks if block.segment not in expired]
+            for segment in expired:
+                for path in (self._segment_path(segment), self._index_path(segment)):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def close(self):
+        with self._lock:
+            if self._tail_file is not None:
+                self._tail_file.close()
+                self._tail_file = None
+            self._loaded = False
+
+    # --- Queries ---
+    def _read_block(self, block, needle=None):
+        """Decompresses a block; with a needle only lines containing it are decoded."""
+        with open(self._segment_path(block.segment), 'rb') as f:
+            f.seek(block.offset)
+            data = gzip.decompress(f.read(block.length))
+        lines = data.decode('utf-8').splitlines()
+        return [json.loads(line) for line in lines if needle is None or needle in line]
+
+    def query(self, number=None, campaign_id=None, start=None, end=None, limit=100):
+        """
+        Returns up to limit send attempts, newest first, filtered by number,
+        campaign and sent_at range (start inclusive, end exclusive; datetimes
+        or ISO strings).
+        """
+        start, end = _time_key(start), _time_key(end)
+
+        def matches(record):
+            return ((number is None or record['number'] == number)
+                    and (campaign_id is None or record.get('campaign_id') == campaign_id)
+                    and (start is None or record['sent_at'] >= start)
+                    and (end is None or record['sent_at'] < end))
+
+        positions = {}
+        # Records are written with compact separators, so a wanted field appears verbatim in its line
+        needle = None
+        if number is not None:
+            needle = '"number":' + json.dumps(number)
+        elif campaign_id is not None:
+            needle = '"campaign_id":' + json.dumps(campaign_id)
+        with self._lock:
+            self._ensure_loaded()
+            results = [record for record in reversed(self._tail) if matches(record)][:limit]
+            for block in reversed(self._blocks):
+                if len(results) >= limit:
+                    break
+                if ((start is not None and block.end < start) or (end is not None and block.start >= end)
+                        or (campaign_id is not None and campaign_id not in block.campaigns)):
+                    continue
+                if number is not None and not block.may_contain(number, positions):
+                    continue
+                for record in reversed(self._read_block(block, needle)):
+                    if matches(record):
+                        results.append(record)
+                        if len(results) >= limit:
+                            break
+            return results
+
+    def records(self):
+        """Yields every record, oldest first (reads all blocks; meant for exports and migrations)."""
+        with self._lock:
+            self._ensure_loaded()
+            blocks = list(self._blocks)
+            tail = list(self._tail)
+        for block in blocks:
+            yield from self._read_block(block)
+        yield from tail
+
+    def count(self):
+        with self._lock:
+            self._ensure_loaded()
+            return self._seq - (self._blocks[0].first_seq - 1 if self._blocks else 0)
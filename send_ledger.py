@@ -0,0 +1,242 @@
+# send_ledger.py
+import json
+import os
+import threading
+import time
+import uuid
+
+import metrics
+
+_APPEND_SECONDS = metrics.FILE_IO_SECONDS.labels('ledger_append')
+_COMPACT_SECONDS = metrics.FILE_IO_SECONDS.labels('ledger_compact')
+
+def new_owner():
+    """Returns an owner token unique to this process run."""
+    return f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+class _LedgerEntry:
+    __slots__ = ('job_id', 'owner', 'lease_until', 'attempt', 'state')
+
+    def __init__(self, job_id, owner, lease_until, attempt, state):
+        self.job_id = job_id
+        self.owner = owner
+        self.lease_until = lease_until
+        self.attempt = attempt
+        self.state = state
+
+    def to_dict(self):
+        return {'job_id': self.job_id, 'owner': self.owner, 'lease_until': self.lease_until,
+                'attempt': self.attempt, 'state': self.state}
+
+class SendLedger:
+    """
+    Outbox ledger of the jobs being sent, so a restart never sends a job twice.
+
+    A job moves through three states:
+      - 'claimed': taken for sending under a lease (claim()). Nobody may
+        claim it again until the lease runs out, so it is queued only once.
+      - 'sending': the attempt is recorded, durably, just before the
+        transport is called (begin()).
+      - 'sent': the transport returned, also recorded durably (confirm()).
+        A failed attempt drops the entry instead, leaving the job to the
+        retry engine.
+    Once the job store has persisted a job's 'sent' status the entry is
+    settled and dropped (settle()), so the ledger only ever holds the sends
+    in flight. A restart reads just those entries (in_flight()) to find
+    confirmed sends whose status was lost and attempts whose outcome is
+    unknown.
+
+    Backed by an append-only JSONL file of {"op": "claim"|"attempt"|"sent"|
+    "failed"|"forget", ...} records. The attempt and sent records are
+    fsynced; the rest are cheap to lose. The file is rewritten with only
+    the live entries once dead records outnumber them.
+    """
+
+    def __init__(self, path, owner=None, lease_seconds=3600.0, fsync=True, compact_min_records=1000,
+                 clock=time.time):
+        self.path = path
+        self.owner = owner or new_owner()
+        self.lease_seconds = lease_seconds
+        self.fsync = fsync
+        self.compact_min_records = compact_min_records
+        self.clock = clock
+        self._entries = {}
+        self._record_count = 0
+        self._loaded = False
+        # Kept open between appends: two records per message make reopening the file the main cost
+        self._file = None
+        self._lock = threading.RLock()
+
+    # --- Loading ---
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def load(self):
+        """Reads the ledger file; it only holds unsettled entries, so this is proportional to the sends in flight."""
+        with self._lock:
+            entries = {}
+            count = 0
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue  # torn last line after a crash
+                        count += 1
+                        self._apply(entries, record)
+            self._entries = entries
+            self._record_count = count
+            self._loaded = True
+
+    @staticmethod
+    def _apply(entries, record):
+        op = record.get('op')
+        if op == 'claim':
+            for job_id in record['ids']:
+                entries[job_id] = _LedgerEntry(job_id, record['owner'], record['until'], 0, 'claimed')
+        elif op == 'attempt':
+            entries[record['id']] = _LedgerEntry(record['id'], record['owner'], record['until'],
+                                                 record['attempt'], 'sending')
+        elif op == 'sent':
+            entry = entries.get(record['id'])
+            if entry is not None:
+                entry.state = 'sent'
+        elif op == 'failed':
+            entries.pop(record['id'], None)
+        elif op == 'forget':
+            for job_id in record['ids']:
+                entries.pop(job_id, None)
+        elif op == 'entry':
+            # Written by compact()
+            entry = record['entry']
+            entries[entry['job_id']] = _LedgerEntry(entry['job_id'], entry['owner'], entry['lease_until'],
+                                                    entry['attempt'], entry['state'])
+
+    # --- Writing ---
+    def _append(self, records, durable=False):
+        with _APPEND_SECONDS.time():
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+            # Flushed on every append, so a crash of the process loses nothing; fsync also covers power loss
+            self._file.flush()
+            if durable and self.fsync:
+                os.fsync(self._file.fileno())
+        self._record_count += len(records)
+        if self._record_count >= self.compact_min_records and self._record_count > 2 * len(self._entries):
+            self.compact()
+
+    def compact(self):
+        """Rewrites the file with one record per live entry (expired claims are dropped) and atomically replaces it."""
+        with self._lock:
+            self._ensure_loaded()
+            self.close()
+            now = self.clock()
+            for job_id in [entry.job_id for entry in self._entries.values()
+                           if entry.state == 'claimed' and entry.lease_until <= now]:
+                del self._entries[job_id]
+            tmp_path = self.path + ".tmp"
+            with _COMPACT_SECONDS.time():
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for entry in self._entries.values():
+                        f.write(json.dumps({'op': 'entry', 'entry': entry.to_dict()}, separators=(',', ':')) + '\n')
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            self._record_count = len(self._entries)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # --- Public API ---
+    def claim(self, job_ids, lease_seconds=None):
+        """
+        Claims jobs for sending with one append. A job already being sent,
+        sent, or under a live claim (ours included) is skipped. Returns the
+        ids that were claimed.
+        """
+        until = self.clock() + (lease_seconds or self.lease_seconds)
+        with self._lock:
+            self._ensure_loaded()
+            now = self.clock()
+            claimed = []
+            for job_id in dict.fromkeys(job_ids):
+                entry = self._entries.get(job_id)
+                if entry is not None and (entry.state != 'claimed' or entry.lease_until > now):
+                    continue
+                self._entries[job_id] = _LedgerEntry(job_id, self.owner, until, 0, 'claimed')
+                claimed.append(job_id)
+            if claimed:
+                self._append([{'op': 'claim', 'ids': claimed, 'owner': self.owner, 'until': until}])
+            return claimed
+
+    def begin(self, job_id, attempt):
+        """
+        Records that the job is about to be sent, durably. Returns False if
+        it must not be sent because it is being sent already or was sent.
+        A claimed job may be begun by whoever the claimant handed it to (a
+        sender process); a job without an entry (a retry or re-drive) is
+        claimed on the spot.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(job_id)
+            if entry is not None and entry.state != 'claimed':
+                return False
+            until = self.clock() + self.lease_seconds
+            self._entries[job_id] = _LedgerEntry(job_id, self.owner, until, attempt, 'sending')
+            self._append([{'op': 'attempt', 'id': job_id, 'owner': self.owner, 'until': until,
+                           'attempt': attempt}], durable=True)
+            return True
+
+    def confirm(self, job_id, ok):
+        """Records the outcome of an attempt: a send is kept until settled, a failure drops the entry."""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(job_id)
+            if entry is None:
+                return
+            if ok:
+                entry.state = 'sent'
+                self._append([{'op': 'sent', 'id': job_id}], durable=True)
+            else:
+                del self._entries[job_id]
+                self._append([{'op': 'failed', 'id': job_id}])
+
+    def settle(self, job_ids):
+        """Drops the 'sent' entries of jobs whose status the job store has persisted."""
+        with self._lock:
+            self._ensure_loaded()
+            settled = [job_id for job_id in job_ids
+                       if job_id in self._entries and self._entries[job_id].state == 'sent']
+            self._forget(settled)
+
+    def forget(self, job_ids):
+        """Drops the entries of the given jobs, whatever their state."""
+        with self._lock:
+            self._ensure_loaded()
+            self._forget([job_id for job_id in job_ids if job_id in self._entries])
+
+    def _forget(self, job_ids):
+        if not job_ids:
+            return
+        for job_id in job_ids:
+            del self._entries[job_id]
+        self._append([{'op': 'forget', 'ids': job_ids}])
+
+    def in_flight(self):
+        """Returns every entry as a dict (job_id, owner, lease_until, attempt, state)."""
+        with self._lock:
+            self._ensure_loaded()
+            return [entry.to_dict() for entry in self._entries.values()]
+
+    def count(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._entries)
@@ -0,0 +1,351 @@
+# send_pipeline.py
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+import metrics
+from dispatcher import next_send_time
+from transport import is_transient
+
+# --- Pacing ---
+class TokenBucket:
+    """Classic token bucket: acquire() blocks until a token is available at the current rate."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, stop_event=None):
+        """Takes one token, sleeping as needed. Returns False if stop_event was set while waiting."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+class AdaptivePacer:
+    """
+    AIMD controller for a TokenBucket.
+
+    Successful sends with a healthy latency raise the rate additively; failures
+    cut it multiplicatively, and latency creeping above the target (by default
+    1.5x the best smoothed latency seen so far) trims it gently. The rate is
+    always kept within [min_rate, max_rate] messages/second.
+    """
+
+    def __init__(self, initial_rate=1.0, min_rate=1 / 60.0, max_rate=1.0, increase=0.05,
+                 decrease=0.5, latency_decrease=0.9, target_latency=None, smoothing=0.2):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_decrease = latency_decrease
+        self.target_latency = target_latency
+        self.smoothing = smoothing
+        self.avg_latency = None
+        self.error_rate = 0.0
+        self._best_latency = None
+        self.bucket = TokenBucket(self._clamp(initial_rate))
+
+    def _clamp(self, rate):
+        return max(self.min_rate, min(self.max_rate, rate))
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    def acquire(self, stop_event=None):
+        return self.bucket.acquire(stop_event)
+
+    def record(self, latency, ok):
+        """Feeds one send outcome back into the controller."""
+        self.error_rate += self.smoothing * ((0.0 if ok else 1.0) - self.error_rate)
+        rate = self.bucket.rate
+        if not ok:
+            rate *= self.decrease
+        else:
+            if self.avg_latency is None:
+                self.avg_latency = latency
+            else:
+                self.avg_latency += self.smoothing * (latency - self.avg_latency)
+            if self._best_latency is None or self.avg_latency < self._best_latency:
+                self._best_latency = self.avg_latency
+            target = self.target_latency or 1.5 * self._best_latency
+            if self.avg_latency > target:
+                rate *= self.latency_decrease
+            else:
+                rate += self.increase
+        self.bucket.set_rate(self._clamp(rate))
+
+# --- Throughput ---
+# Weight of the newest send time in a sender's smoothed send time
+SEND_SECONDS_SMOOTHING = 0.2
+
+def sender_rate(send_seconds, transport, max_rate=None):
+    """
+    Messages/second one sender delivers: one send (send_seconds, the
+    smoothed time of its recent sends, but no less than the transport's
+    min_send_seconds) plus the transport's inter_message_delay, capped by
+    max_rate. transport may be a transport class. Returns max_rate when
+    neither bounds the time per message.
+    """
+    seconds = max(send_seconds or 0.0, transport.min_send_seconds) + transport.inter_message_delay
+    if seconds <= 0:
+        return max_rate
+    return 1.0 / seconds if max_rate is None else min(max_rate, 1.0 / seconds)
+
+# --- Pipeline ---
+class SendTask:
+    """
+    A single message waiting in the pipeline. planned_at is the epoch time
+    the message was scheduled for, if any; latency is set to the duration of
+    the transport send before the callback runs, and attempts counts the
+    sends tried so far (a retried task is submitted again as is). window is
+    the daily send window (a DailyWindow) of a scheduled message, if any.
+    """
+    __slots__ = ('campaign_id', 'job_id', 'number', 'message', 'callback', 'planned_at', 'latency', 'attempts',
+                 'window')
+
+    def __init__(self, campaign_id, job_id, number, message, callback=None, planned_at=None, window=None):
+        self.campaign_id = campaign_id
+        self.job_id = job_id
+        self.number = number
+        self.message = message
+        self.callback = callback
+        self.planned_at = planned_at
+        self.window = window
+        self.latency = None
+        self.attempts = 0
+
+class SendPipeline:
+    """
+    Central send pipeline shared by every campaign.
+
+    Tasks are queued per campaign and handed to workers round-robin across
+    campaigns, so concurrent campaigns share capacity fairly. The total number
+    of queued tasks is bounded (submit() blocks when the queue is full). There
+    is one worker per transport, i.e. per sender session/account, and each
+    worker paces itself with its own AdaptivePacer.
+
+    With a SendLedger, a task with a job_id is sent only if the ledger
+    records the attempt first (a job already being sent or sent is dropped
+    as a duplicate), and its outcome is confirmed in the ledger before the
+    callback runs.
+
+    With a defer hook, a scheduled task (one with planned_at) that a worker
+    takes off the queue outside its send window or inside quiet_hours is
+    not sent but handed to defer(task) to be sent later.
+    """
+
+    def __init__(self, transports, max_queued=1000, pacing=True, pacer_options=None, ledger=None,
+                 quiet_hours=None, defer=None):
+        self.transports = list(transports)
+        self.ledger = ledger
+        self.quiet_hours = quiet_hours
+        self.defer = defer
+        self.max_queued = max_queued
+        self.pacing = pacing
+        self.pacer_options = pacer_options or {}
+        self.pacers = [AdaptivePacer(**self.pacer_options) for _ in self.transports]
+        # Smoothed seconds per send of each worker, None until it has sent
+        self._send_seconds = [None] * len(self.transports)
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._outstanding = {}
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._workers = []
+        metrics.QUEUE_DEPTH.labels('send').set_function(lambda: self._queued)
+
+    # --- Lifecycle ---
+    def start(self):
+        """Starts one worker thread per transport."""
+        with self._cond:
+            if self._workers:
+                return
+            self._stop_event.clear()
+            for index, transport in enumerate(self.transports):
+                worker = threading.Thread(target=self._worker_loop, args=(index, transport),
+                                          name=f"send-worker-{index}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+
+    def stop(self, timeout=None):
+        """Stops the workers after their current send and closes the transports."""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.join(timeout)
+        for transport in self.transports:
+            try:
+                transport.close()
+            except Exception as e:
+                print(f"[SEND PIPELINE] Error closing transport {transport.name}: {e}")
+
+    # --- Submission ---
+    def submit(self, task, timeout=None):
+        """Queues a task, blocking while the pipeline is full. Returns False on timeout or shutdown."""
+        self.start()
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._queued < self.max_queued or self._stop_event.is_set(), timeout):
+                return False
+            if self._stop_event.is_set():
+                return False
+            queue = self._queues.get(task.campaign_id)
+            if queue is None:
+                queue = self._queues[task.campaign_id] = deque()
+            queue.append(task)
+            self._queued += 1
+            self._outstanding[task.campaign_id] = self._outstanding.get(task.campaign_id, 0) + 1
+            self._cond.notify_all()
+            return True
+
+    def wait_campaign(self, campaign_id, timeout=None):
+        """Blocks until every task submitted for the campaign has been processed."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._outstanding.get(campaign_id), timeout)
+
+    def queue_depth(self):
+        with self._cond:
+            return self._queued
+
+    def unfinished_job_ids(self):
+        """Job ids still to be finished from before a restart: none, as the queue lives in this process."""
+        return set()
+
+    def throughput(self):
+        """
+        Messages/second the workers deliver at present (see sender_rate),
+        each capped by its pacer's current rate. None if a worker's rate is
+        unbounded (no pacing, and nothing known about its send time).
+        """
+        total = 0.0
+        for index, transport in enumerate(self.transports):
+            rate = sender_rate(self._send_seconds[index], transport, self.pacers[index].rate if self.pacing else None)
+            if rate is None:
+                return None
+            total += rate
+        return total
+
+    # --- Workers ---
+    def _next_task(self):
+        """Pops the next task, rotating across campaigns. Returns None on shutdown."""
+        with self._cond:
+            while not self._queues:
+                if self._stop_event.is_set():
+                    return None
+                self._cond.wait()
+            campaign_id, queue = self._queues.popitem(last=False)
+            task = queue.popleft()
+            if queue:
+                # Move the campaign to the back of the rotation
+                self._queues[campaign_id] = queue
+            self._queued -= 1
+            self._cond.notify_all()
+            return task
+
+    def _deferred(self, task):
+        """Hands a scheduled task that may not be sent now to the defer hook. Returns True if it did."""
+        if self.defer is None or task.planned_at is None:
+            return False
+        now = datetime.now()
+        if next_send_time(now, task.window, self.quiet_hours) == now:
+            return False
+        try:
+            self.defer(task)
+        except Exception as e:
+            print(f"[SEND PIPELINE] Deferring job {task.job_id} failed: {e}")
+        finally:
+            self._finish(task)
+        return True
+
+    def _finish(self, task):
+        with self._cond:
+            remaining = self._outstanding.get(task.campaign_id, 1) - 1
+            if remaining:
+                self._outstanding[task.campaign_id] = remaining
+            else:
+                self._outstanding.pop(task.campaign_id, None)
+            self._cond.notify_all()
+
+    def _worker_loop(self, index, transport):
+        pacer = self.pacers[index]
+        # Series are looked up once so recording stays a bisect and a lock per message
+        sent_total = metrics.MESSAGES_TOTAL.labels(transport.name, 'ok')
+        failed_total = metrics.MESSAGES_TOTAL.labels(transport.name, 'failed')
+        send_seconds = metrics.STAGE_SECONDS.labels('send')
+        while not self._stop_event.is_set():
+            if self.pacing and not pacer.acquire(self._stop_event):
+                break
+            task = self._next_task()
+            if task is None:
+                break
+            if self._deferred(task):
+                continue
+            error = None
+            recorded = self.ledger is not None and task.job_id is not None
+            if recorded:
+                try:
+                    if not self.ledger.begin(task.job_id, task.attempts + 1):
+                        print(f"[SEND PIPELINE] Skipping job {task.job_id}: it is already being sent or was sent.")
+                        self._finish(task)
+                        continue
+                except Exception as e:
+                    # An attempt that cannot be recorded is not made
+                    error = e
+            task.attempts += 1
+            start = time.perf_counter()
+            if error is None:
+                try:
+                    transport.send(task.number, task.message)
+                except Exception as e:
+                    error = e
+                if recorded:
+                    try:
+                        self.ledger.confirm(task.job_id, error is None)
+                    except Exception as e:
+                        # Left unconfirmed, a restart treats the send as interrupted rather than resending it
+                        print(f"[SEND PIPELINE] Could not confirm job {task.job_id} in the ledger: {e}")
+            latency = task.latency = time.perf_counter() - start
+            send_seconds.observe(latency)
+            smoothed = self._send_seconds[index]
+            self._send_seconds[index] = latency if smoothed is None else (
+                smoothed + SEND_SECONDS_SMOOTHING * (latency - smoothed))
+            (sent_total if error is None else failed_total).inc()
+            if task.planned_at is not None:
+                metrics.SCHEDULER_LAG_SECONDS.observe(max(0.0, time.time() - task.planned_at))
+            if self.pacing:
+                # A permanent failure (bad number) says nothing about how hard the channel can be pushed
+                pacer.record(latency, error is None or not is_transient(error))
+            try:
+                if task.callback is not None:
+                    task.callback(task, error)
+            except Exception as e:
+                print(f"[SEND PIPELINE] Callback for job {task.job_id} failed: {e}")
+            finally:
+                self._finish(task)
+            if transport.inter_message_delay and self._stop_event.wait(transport.inter_message_delay):
+                break
@@ -0,0 +1,184 @@
+# sender_worker.py
+# A sender process: leases shards of recipients from the broker database,
+# sends them through its own transport (its own browser session) and reports
+# every outcome back. Started by the app's WorkerPool when
+# WHATSAPP_SENDER_PROCESSES is set; can also be run by hand next to the app.
+#
+# Usage: python sender_worker.py --broker whatsapp_broker.db --transport fake --worker-id sender-0
+#            [--max-rate 1.0] [--no-pacing] [--lease-seconds 30] [--quiet-hours 21:00-08:00]
+#            [--option latency=0.01 ...]
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+
+from broker import SqliteBroker
+from dispatcher import DailyWindow, next_send_time
+from send_pipeline import AdaptivePacer
+from transport import SendInterruptedError, create_transport, is_transient
+
+# Seconds between polls of the broker while there is no work
+IDLE_POLL_SECONDS = 0.05
+
+class SenderWorker:
+    """
+    Sends leased shards one task at a time. Each task is begun (marked as
+    being sent and recorded in the ledger) before the transport is called
+    and reported right after, so a sender taking over the shard of a dead
+    one knows exactly which task, if any, was cut off mid-send. A heartbeat
+    thread keeps the current lease alive through slow sends. A scheduled
+    task that comes up outside its send window or inside the quiet hours
+    is reported as deferred instead of being sent.
+    """
+
+    def __init__(self, broker, transport, worker_id, max_rate=1.0, pacing=True, quiet_hours=None):
+        self.broker = broker
+        self.transport = transport
+        self.worker_id = worker_id
+        self.pacing = pacing
+        self.quiet_hours = quiet_hours
+        self.pacer = AdaptivePacer(max_rate=max_rate)
+        self.ledger = broker.ledger(owner=worker_id)
+        self.started_at = time.time()
+        self.stop_event = threading.Event()
+        self._shard_id = None
+        self._parent_pid = os.getppid()
+
+    # --- Heartbeat ---
+    def _heartbeat_loop(self):
+        interval = self.broker.lease_seconds / 3
+        while not self.stop_event.wait(interval):
+            if os.getppid() != self._parent_pid:
+                # The app that started us is gone; its replacement starts its own senders
+                print(f"[SENDER {self.worker_id}] Parent process exited; stopping.")
+                self.stop_event.set()
+                break
+            try:
+                self.broker.heartbeat(self.worker_id, self.transport.name, self.started_at, self._shard_id)
+            except Exception as e:
+                print(f"[SENDER {self.worker_id}] Heartbeat failed: {e}")
+
+    # --- Sending ---
+    def _report(self, shard, index, outcome, error=None, latency=None):
+        return self.broker.report(self.ledger, self.worker_id, self.transport.name, shard, index, outcome,
+                                  error, latency)
+
+    def _may_send(self, task):
+        """True unless the task is a scheduled one and now is outside its send window or inside the quiet hours."""
+        if task.get('planned_at') is None:
+            return True
+        window = DailyWindow.parse(task['window']) if task.get('window') else None
+        now = datetime.now()
+        return next_send_time(now, window, self.quiet_hours) == now
+
+    def _run_shard(self, shard):
+        """Sends the shard's remaining tasks. Returns when it is done, taken over or the worker stops."""
+        tasks = shard['tasks']
+        index = shard['progress']
+        if shard['attempting'] == index:
+            # The previous owner died between starting this send and reporting it
+            if not self._report(shard, index, 'interrupted', SendInterruptedError()):
+                return
+            index += 1
+        while index < len(tasks) and not self.stop_event.is_set():
+            if self.pacing and not self.pacer.acquire(self.stop_event):
+                break
+            if not self._may_send(tasks[index]):
+                if not self._report(shard, index, 'deferred'):
+                    return
+                index += 1
+                continue
+            state = self.broker.begin(self.ledger, self.worker_id, shard, index)
+            if state == 'lost':
+                print(f"[SENDER {self.worker_id}] Lost the lease on shard {shard['id']}.")
+                return
+            if state == 'skip':
+                print(f"[SENDER {self.worker_id}] Skipping job {tasks[index]['job_id']}: "
+                      f"it is already being sent or was sent.")
+                if not self._report(shard, index, 'skipped'):
+                    return
+                index += 1
+                continue
+            task = tasks[index]
+            error = None
+            start = time.perf_counter()
+            try:
+                self.transport.send(task['number'], task['message'])
+            except Exception as e:
+                error = e
+            latency = time.perf_counter() - start
+            if error is None:
+                outcome = 'ok'
+            elif isinstance(error, SendInterruptedError):
+                # Handed off but unconfirmed: dead-lettered by the app, never retried
+                outcome = 'interrupted'
+            else:
+                outcome = 'transient' if is_transient(error) else 'permanent'
+            if not self._report(shard, index, outcome, error, latency):
+                print(f"[SENDER {self.worker_id}] Lost the lease on shard {shard['id']}.")
+                return
+            if self.pacing:
+                self.pacer.record(latency, error is None or not is_transient(error))
+            index += 1
+            if self.transport.inter_message_delay and self.stop_event.wait(self.transport.inter_message_delay):
+                break
+        if index < len(tasks):
+            self.broker.release(self.worker_id, shard['id'])
+
+    def run(self):
+        self.broker.heartbeat(self.worker_id, self.transport.name, self.started_at)
+        threading.Thread(target=self._heartbeat_loop, name='sender-heartbeat', daemon=True).start()
+        print(f"[SENDER {self.worker_id}] Started (pid {os.getpid()}, transport {self.transport.name}).")
+        while not self.stop_event.is_set():
+            try:
+                shard = self.broker.lease(self.worker_id)
+                if shard is None:
+                    self.stop_event.wait(IDLE_POLL_SECONDS)
+                    continue
+                self._shard_id = shard['id']
+                try:
+                    self._run_shard(shard)
+                finally:
+                    self._shard_id = None
+            except Exception as e:
+                print(f"[SENDER {self.worker_id}] Error: {e}")
+                self.stop_event.wait(1.0)
+        try:
+            self.transport.close()
+        except Exception as e:
+            print(f"[SENDER {self.worker_id}] Error closing transport {self.transport.name}: {e}")
+        print(f"[SENDER {self.worker_id}] Stopped.")
+
+def parse_option(text):
+    key, _, value = text.partition('=')
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+def main():
+    parser = argparse.ArgumentParser(description="WhatsApp sender worker process.")
+    parser.add_argument('--broker', required=True)
+    parser.add_argument('--transport', default='pywhatkit')
+    parser.add_argument('--worker-id', required=True)
+    parser.add_argument('--max-rate', type=float, default=1.0)
+    parser.add_argument('--no-pacing', action='store_true')
+    parser.add_argument('--lease-seconds', type=float, default=30.0)
+    parser.add_argument('--quiet-hours', type=DailyWindow.parse, default=None)
+    parser.add_argument('--option', action='append', default=[], type=parse_option)
+    args = parser.parse_args()
+
+    broker = SqliteBroker(args.broker, lease_seconds=args.lease_seconds)
+    transport = create_transport(args.transport, **dict(args.option))
+    worker = SenderWorker(broker, transport, args.worker_id, max_rate=args.max_rate, pacing=not args.no_pacing,
+                          quiet_hours=args.quiet_hours)
+    # Finish the current message, hand the rest of the shard back and exit
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop_event.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop_event.set())
+    worker.run()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,818 @@
+# sqlite_store.py
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from job_store import status_bucket
+from send_ledger import new_owner
+
+# --- Schema ---
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    number TEXT PRIMARY KEY
+) WITHOUT ROWID;
+
+-- Personalization fields of a number, as a JSON object
+CREATE TABLE IF NOT EXISTS contact_attributes (
+    number TEXT PRIMARY KEY,
+    attributes TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS campaigns (
+    id TEXT PRIMARY KEY,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    send_time TEXT NOT NULL,
+    status TEXT NOT NULL,
+    -- Daily window the campaign may send in, e.g. '09:00-17:00' (NULL: any time)
+    send_window TEXT
+);
+CREATE INDEX IF NOT EXISTS campaigns_status_send_time ON campaigns (status, send_time);
+
+-- send_time is copied from the campaign so pending jobs can be listed from one index
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    campaign_id TEXT NOT NULL REFERENCES campaigns (id),
+    number TEXT NOT NULL,
+    status TEXT NOT NULL,
+    send_time TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_send_time ON jobs (status, send_time, id);
+CREATE INDEX IF NOT EXISTS jobs_campaign_status ON jobs (campaign_id, status);
+CREATE INDEX IF NOT EXISTS jobs_number ON jobs (number);
+
+CREATE TABLE IF NOT EXISTS send_history (
+    id INTEGER PRIMARY KEY,
+    sent_at TEXT NOT NULL,
+    number TEXT NOT NULL,
+    message TEXT NOT NULL,
+    status TEXT NOT NULL,
+    job_id TEXT,
+    campaign_id TEXT
+);
+CREATE INDEX IF NOT EXISTS send_history_number ON send_history (number, sent_at);
+CREATE INDEX IF NOT EXISTS send_history_sent_at ON send_history (sent_at);
+CREATE INDEX IF NOT EXISTS send_history_campaign ON send_history (campaign_id, sent_at);
+
+-- Messages that failed every retry, oldest first by seq
+CREATE TABLE IF NOT EXISTS dead_letters (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    failed_at TEXT NOT NULL,
+    number TEXT NOT NULL,
+    message TEXT NOT NULL,
+    error TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    job_id TEXT,
+    campaign_id TEXT
+);
+CREATE INDEX IF NOT EXISTS dead_letters_campaign ON dead_letters (campaign_id, seq);
+
+-- Outbox ledger: jobs claimed for sending, being sent, or sent but not yet settled into jobs.status
+CREATE TABLE IF NOT EXISTS send_ledger (
+    job_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    lease_until REAL NOT NULL,
+    attempt INTEGER NOT NULL,
+    state TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Stay well below SQLite's limit on the number of "?" parameters per statement
+_IN_CHUNK = 500
+
+def _chunks(values, size=_IN_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _placeholders(count):
+    return ','.join('?' * count)
+
+def _campaign_from_row(row):
+    campaign = {
+        'id': row['id'],
+        'subject': row['subject'],
+        'body': row['body'],
+        'send_time': datetime.fromisoformat(row['send_time']),
+        'status': row['status']
+    }
+    if row['send_window']:
+        campaign['send_window'] = row['send_window']
+    return campaign
+
+def _job_from_row(row):
+    return {'id': row['id'], 'campaign_id': row['campaign_id'], 'number': row['number'], 'status': row['status']}
+
+class SqliteDatabase:
+    """
+    Shared embedded SQLite database for contacts, campaigns, jobs and send
+    history.
+
+    The database runs in WAL mode so readers in other processes never block
+    the writer. A single connection is shared by all threads behind a lock;
+    every statement is parameterized (sqlite3 keeps them prepared in its
+    statement cache), and bulk changes go through executemany in one
+    transaction.
+    """
+
+    def __init__(self, path, synchronous='NORMAL'):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={synchronous}")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        # Databases created before campaigns had send windows
+        if 'send_window' not in [row['name'] for row in self.conn.execute("PRAGMA table_info(campaigns)")]:
+            self.conn.execute("ALTER TABLE campaigns ADD COLUMN send_window TEXT")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def checkpoint(self):
+        """Folds the write-ahead log back into the main database file."""
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    # --- Send History ---
+    def add_send_history(self, entries):
+        """
+        Appends send attempts in one transaction. Each entry is a dict with
+        sent_at (datetime), number, message, status and optional job_id/campaign_id.
+        """
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO send_history (sent_at, number, message, status, job_id, campaign_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(entry['sent_at'].isoformat(), entry['number'], entry['message'], entry['status'],
+                  entry.get('job_id'), entry.get('campaign_id')) for entry in entries]
+            )
+
+    def send_history(self, number=None, limit=100, campaign_id=None, start=None, end=None):
+        """
+        Returns the most recent send attempts, optionally for a single number or
+        campaign and within [start, end) (datetimes).
+        """
+        clauses, params = [], []
+        if number:
+            clauses.append("number = ?")
+            params.append(number)
+        if campaign_id:
+            clauses.append("campaign_id = ?")
+            params.append(campaign_id)
+        if start is not None:
+            clauses.append("sent_at >= ?")
+            params.append(start.isoformat())
+        if end is not None:
+            clauses.append("sent_at < ?")
+            params.append(end.isoformat())
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        with self.lock:
+            rows = self.conn.execute(f"SELECT * FROM send_history {where}ORDER BY sent_at DESC LIMIT ?",
+                                     (*params, limit))
+            entries = []
+            for row in rows:
+                entry = dict(row)
+                entry['sent_at'] = datetime.fromisoformat(entry['sent_at'])
+                entries.append(entry)
+            return entries
+
+class SqliteContactStore:
+    """SQLite implementation of the ContactStore interface."""
+
+    def __init__(self, database):
+        self.db = database
+        self.version = 0
+        self._token = uuid.uuid4().hex[:8]
+
+    def all(self):
+        """Returns the sorted list of numbers."""
+        with self.db.lock:
+            return [row[0] for row in self.db.conn.execute("SELECT number FROM contacts ORDER BY number")]
+
+    def etag(self):
+        """Returns an opaque tag that changes whenever the contact list changes."""
+        return f"contacts-{self._token}-{self.version}"
+
+    def page(self, limit, cursor=None, prefix=None):
+        """
+        Returns (numbers, next_cursor, matched) for one page of the sorted list,
+        with the same cursor and prefix semantics as ContactStore.page.
+        """
+        conditions = []
+        params = []
+        if prefix:
+            conditions.append("number >= ? AND number < ?")
+            params += [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.db.lock:
+            matched = self.db.conn.execute(f"SELECT COUNT(*) FROM contacts {where}", params).fetchone()[0]
+            if cursor:
+                conditions.append("number > ?")
+                params.append(cursor)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            numbers = [row[0] for row in self.db.conn.execute(
+                f"SELECT number FROM contacts {where} ORDER BY number LIMIT ?", params + [limit + 1])]
+        next_cursor = numbers[limit - 1] if len(numbers) > limit else None
+        return numbers[:limit], next_cursor, matched
+
+    def count(self):
+        with self.db.lock:
+            return self.db.conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def contains(self, number):
+        with self.db.lock:
+            return self.db.conn.execute("SELECT 1 FROM contacts WHERE number = ?", (number,)).fetchone() is not None
+
+    def add(self, number):
+        """Adds a number. Returns False if it already exists."""
+        return self.add_many([number]) == 1
+
+    def add_many(self, numbers):
+        """Adds several numbers in one transaction. Returns how many were new."""
+        with self.db.lock, self.db.conn:
+            before = self.db.conn.total_changes
+            self.db.conn.executemany("INSERT OR IGNORE INTO contacts (number) VALUES (?)",
+                                     ((number,) for number in numbers))
+            added = self.db.conn.total_changes - before
+            if added:
+                self.version += 1
+            return added
+
+    def remove(self, number):
+        """Removes a number. Returns False if it does not exist."""
+        with self.db.lock, self.db.conn:
+            removed = self.db.conn.execute("DELETE FROM contacts WHERE number = ?", (number,)).rowcount
+            if removed:
+                self.version += 1
+            return removed == 1
+
+    def replace_all(self, numbers):
+        """Replaces every stored number with the given list."""
+        with self.db.lock, self.db.conn:
+            self.db.conn.execute("DELETE FROM contacts")
+            self.db.conn.executemany("INSERT OR IGNORE INTO contacts (number) VALUES (?)",
+                                     ((number,) for number in numbers))
+            self.version += 1
+
+class SqliteContactAttributeStore:
+    """SQLite implementation of the ContactAttributeStore interface."""
+
+    def __init__(self, database):
+        self.db = database
+
+    def get(self, number):
+        """Returns the attribute dict of a number, or None."""
+        with self.db.lock:
+            row = self.db.conn.execute("SELECT attributes FROM contact_attributes WHERE number = ?", (number,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, numbers):
+        """Returns {number: attributes} for the numbers that have attributes."""
+        found = {}
+        with self.db.lock:
+            for chunk in _chunks(numbers):
+                for row in self.db.conn.execute(
+                        f"SELECT number, attributes FROM contact_attributes WHERE number IN ({_placeholders(len(chunk))})",
+                        chunk):
+                    found[row[0]] = json.loads(row[1])
+        return found
+
+    def set_many(self, updates, merge=True):
+        """Stores attributes for several numbers in one transaction, with the same merge rules as ContactAttributeStore."""
+        cleaned = {}
+        for number, attributes in updates.items():
+            attributes = {str(name): str(value) for name, value in attributes.items()
+                          if value is not None and str(value) != ''}
+            if attributes:
+                cleaned[number] = attributes
+        with self.db.lock, self.db.conn:
+            existing = self.get_many(cleaned) if merge else {}
+            rows = []
+            for number, attributes in cleaned.items():
+                if number in existing:
+                    attributes = dict(existing[number], **attributes)
+                    if attributes == existing[number]:
+                        continue
+                rows.append((number, json.dumps(attributes, separators=(',', ':'))))
+            self.db.conn.executemany(
+                "INSERT OR REPLACE INTO contact_attributes (number, attributes) VALUES (?, ?)", rows)
+            return len(rows)
+
+    def remove(self, number):
+        """Drops all attributes of a number."""
+        with self.db.lock, self.db.conn:
+            return self.db.conn.execute("DELETE FROM contact_attributes WHERE number = ?", (number,)).rowcount == 1
+
+class SqliteJobStore:
+    """
+    SQLite implementation of the JobStore interface.
+
+    Pending jobs are listed from the (status, send_time, id) index with
+    keyset pagination, and per-campaign summaries are computed with one
+    GROUP BY over the (campaign_id, status) index.
+    """
+
+    _JOB_COLUMNS = ("SELECT j.id, j.campaign_id, j.number, j.status, c.subject, c.body, c.send_time "
+                    "FROM jobs j JOIN campaigns c ON c.id = j.campaign_id")
+
+    def __init__(self, database):
+        self.db = database
+        self.version = 0
+        self._token = uuid.uuid4().hex[:8]
+        # (version, count): COUNT(*) walks the index, so it is reused until the next change
+        self._pending_count = None
+
+    # --- Helpers ---
+    def _materialize(self, row):
+        job = _job_from_row(row)
+        job['subject'] = row['subject']
+        job['body'] = row['body']
+        job['send_time'] = datetime.fromisoformat(row['send_time'])
+        return job
+
+    def _insert_campaign(self, campaign):
+        self.db.conn.execute(
+            "INSERT INTO campaigns (id, subject, body, send_time, status, send_window) VALUES (?, ?, ?, ?, ?, ?)",
+            (campaign['id'], campaign['subject'], campaign['body'], campaign['send_time'].isoformat(),
+             campaign.get('status', 'pending'), campaign.get('send_window'))
+        )
+
+    def _insert_jobs(self, jobs, send_time):
+        self.db.conn.executemany(
+            "INSERT INTO jobs (id, campaign_id, number, status, send_time) VALUES (?, ?, ?, ?, ?)",
+            ((job['id'], job['campaign_id'], job['number'], job['status'], send_time.isoformat()) for job in jobs)
+        )
+
+    def _pending_left(self, campaign_id):
+        return self.db.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE campaign_id = ? AND status = 'pending'", (campaign_id,)).fetchone()[0]
+
+    def _changed(self):
+        self.version += 1
+
+    # --- Loading ---
+    def load(self):
+        """Kept for interface compatibility; the database needs no loading pass."""
+
+    def compact(self):
+        self.db.checkpoint()
+
+    # --- Public API: Jobs ---
+    def all(self):
+        """Returns copies of all stored jobs, joined with their campaign's message."""
+        with self.db.lock:
+            return [self._materialize(row) for row in self.db.conn.execute(self._JOB_COLUMNS)]
+
+    def get(self, job_id):
+        """Returns a copy of a single job, or None if it does not exist."""
+        with self.db.lock:
+            row = self.db.conn.execute(f"{self._JOB_COLUMNS} WHERE j.id = ?", (job_id,)).fetchone()
+            return self._materialize(row) if row is not None else None
+
+    def update_status(self, job_id, status):
+        """Updates the status of a job."""
+        return self.update_status_many([job_id], status) == 1
+
+    def update_status_many(self, job_ids, status):
+        """Updates the status of several jobs in one transaction."""
+        with self.db.lock, self.db.conn:
+            before = self.db.conn.total_changes
+            self.db.conn.executemany("UPDATE jobs SET status = ? WHERE id = ?",
+                                     ((status, job_id) for job_id in job_ids))
+            updated = self.db.conn.total_changes - before
+            if updated:
+                self._changed()
+            return updated
+
+    def remove(self, job_id):
+        """Removes a job."""
+        with self.db.lock, self.db.conn:
+            removed = self.db.conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount
+            if removed:
+                self._changed()
+            return removed == 1
+
+    def replace_all(self, jobs):
+        """Replaces every stored job with the given (self-contained) list, grouping them into campaigns."""
+        with self.db.lock, self.db.conn:
+            self.db.conn.execute("DELETE FROM jobs")
+            self.db.conn.execute("DELETE FROM campaigns")
+            campaigns = {}
+            for job in jobs:
+                send_time = job['send_time']
+                if isinstance(send_time, str):
+                    send_time = datetime.fromisoformat(send_time)
+                key = (job.get('subject', ''), job.get('body', ''), send_time)
+                campaign = campaigns.get(key)
+                if campaign is None:
+                    campaign = campaigns[key] = {
+                        'id': str(uuid.uuid4()),
+                        'subject': key[0],
+                        'body': key[1],
+                        'send_time': send_time,
+                        'status': 'pending'
+                    }
+                    self._insert_campaign(campaign)
+                self._insert_jobs([{'id': job['id'], 'campaign_id': campaign['id'], 'number': job['number'],
+                                    'status': job.get('status', 'pending')}], send_time)
+            self._changed()
+
+    # --- Public API: Campaigns ---
+    def add_campaign(self, campaign, numbers):
+        """
+        Stores a campaign and one pending recipient row per number in one
+        transaction. Returns the created recipient rows.
+        """
+        campaign = dict(campaign)
+        campaign.setdefault('status', 'pending')
+        jobs = [{'id': str(uuid.uuid4()), 'campaign_id': campaign['id'], 'number': number, 'status': 'pending'}
+                for number in numbers]
+        with self.db.lock, self.db.conn:
+            self._insert_campaign(campaign)
+            self._insert_jobs(jobs, campaign['send_time'])
+            self._changed()
+        return jobs
+
+    def add_jobs(self, campaign_id, numbers):
+        """
+        Adds one pending recipient row per number to an existing campaign in
+        one transaction. Returns how many were added (0 if the campaign no longer exists).
+        """
+        with self.db.lock, self.db.conn:
+            row = self.db.conn.execute("SELECT send_time FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
+            if row is None:
+                return 0
+            jobs = [{'id': str(uuid.uuid4()), 'campaign_id': campaign_id, 'number': number, 'status': 'pending'}
+                    for number in numbers]
+            self._insert_jobs(jobs, datetime.fromisoformat(row['send_time']))
+            if jobs:
+                self._changed()
+            return len(jobs)
+
+    def import_campaign(self, campaign, jobs):
+        """Stores a campaign with existing recipient rows (ids and statuses kept), e.g. when migrating."""
+        with self.db.lock, self.db.conn:
+            self._insert_campaign(campaign)
+            self._insert_jobs(jobs, campaign['send_time'])
+            self._changed()
+
+    def campaigns(self):
+        """Returns copies of all stored campaigns."""
+        with self.db.lock:
+            return [_campaign_from_row(row) for row in self.db.conn.execute("SELECT * FROM campaigns")]
+
+    def get_campaign(self, campaign_id):
+        """Returns a copy of a single campaign, or None if it does not exist."""
+        with self.db.lock:
+            row = self.db.conn.execute("SELECT * FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
+            return _campaign_from_row(row) if row is not None else None
+
+    def campaign_jobs(self, campaign_id, status=None):
+        """Returns copies of a campaign's recipient rows, optionally filtered by status."""
+        with self.db.lock:
+            if status is None:
+                rows = self.db.conn.execute("SELECT * FROM jobs WHERE campaign_id = ?", (campaign_id,))
+            else:
+                rows = self.db.conn.execute("SELECT * FROM jobs WHERE campaign_id = ? AND status = ?",
+                                            (campaign_id, status))
+            return [_job_from_row(row) for row in rows]
+
+    def update_campaign_status(self, campaign_id, status):
+        """Updates the status of a campaign."""
+        with self.db.lock, self.db.conn:
+            updated = self.db.conn.execute("UPDATE campaigns SET status = ? WHERE id = ?",
+                                           (status, campaign_id)).rowcount
+            if updated:
+                self._changed()
+            return updated == 1
+
+    def remove_campaign(self, campaign_id):
+        """Removes a campaign together with all of its recipient rows."""
+        with self.db.lock, self.db.conn:
+            self.db.conn.execute("DELETE FROM jobs WHERE campaign_id = ?", (campaign_id,))
+            removed = self.db.conn.execute("DELETE FROM campaigns WHERE id = ?", (campaign_id,)).rowcount
+            if removed:
+                self._changed()
+            return removed == 1
+
+    # --- Public API: Bulk Operations ---
+    def select_pending(self, campaign_id=None, job_ids=None, start=None, end=None):
+        """Returns the ids of pending jobs matching every given selector (see JobStore.select_pending)."""
+        conditions = ["status = 'pending'"]
+        params = []
+        if campaign_id is not None:
+            conditions.append("campaign_id = ?")
+            params.append(campaign_id)
+        if start is not None:
+            conditions.append("send_time >= ?")
+            params.append(start.isoformat())
+        if end is not None:
+            conditions.append("send_time < ?")
+            params.append(end.isoformat())
+        query = f"SELECT id FROM jobs WHERE {' AND '.join(conditions)}"
+        with self.db.lock:
+            if job_ids is None:
+                return [row[0] for row in self.db.conn.execute(f"{query} ORDER BY send_time, id", params)]
+            selected = []
+            for chunk in _chunks(dict.fromkeys(job_ids)):
+                selected += [row[0] for row in self.db.conn.execute(
+                    f"{query} AND id IN ({_placeholders(len(chunk))})", params + chunk)]
+            return selected
+
+    def cancel_jobs(self, job_ids):
+        """
+        Removes pending jobs in one transaction.
+        Returns (cancelled_count, ids of campaigns left without pending jobs).
+        """
+        with self.db.lock, self.db.conn:
+            touched = set()
+            cancelled = 0
+            for chunk in _chunks(job_ids):
+                marks = _placeholders(len(chunk))
+                touched.update(row[0] for row in self.db.conn.execute(
+                    f"SELECT DISTINCT campaign_id FROM jobs WHERE status = 'pending' AND id IN ({marks})", chunk))
+                cancelled += self.db.conn.execute(
+                    f"DELETE FROM jobs WHERE status = 'pending' AND id IN ({marks})", chunk).rowcount
+            if not cancelled:
+                return 0, []
+            self._changed()
+            return cancelled, [campaign_id for campaign_id in touched if not self._pending_left(campaign_id)]
+
+    def reschedule_jobs(self, job_ids, send_time):
+        """
+        Moves pending jobs to a new send time in one transaction (see
+        JobStore.reschedule_jobs). Returns (rescheduled_count, campaigns to
+        (re)register with the scheduler).
+        """
+        with self.db.lock, self.db.conn:
+            by_campaign = {}
+            for chunk in _chunks(job_ids):
+                for row in self.db.conn.execute(
+                        f"SELECT id, campaign_id FROM jobs WHERE status = 'pending' "
+                        f"AND id IN ({_placeholders(len(chunk))})", chunk):
+                    by_campaign.setdefault(row['campaign_id'], []).append(row['id'])
+            if not by_campaign:
+                return 0, []
+
+            scheduled = []
+            for campaign_id, ids in by_campaign.items():
+                campaign = self.get_campaign(campaign_id)
+                if len(ids) == self._pending_left(campaign_id):
+                    campaign['send_time'] = send_time
+                    campaign['status'] = 'pending'
+                    self.db.conn.execute("UPDATE campaigns SET send_time = ?, status = 'pending' WHERE id = ?",
+                                         (send_time.isoformat(), campaign_id))
+                    self.db.conn.execute("UPDATE jobs SET send_time = ? WHERE campaign_id = ?",
+                                         (send_time.isoformat(), campaign_id))
+                    scheduled.append(campaign)
+                    continue
+
+                new_campaign = dict(campaign, id=str(uuid.uuid4()), send_time=send_time, status='pending')
+                self._insert_campaign(new_campaign)
+                for chunk in _chunks(ids):
+                    self.db.conn.execute(
+                        f"UPDATE jobs SET campaign_id = ?, send_time = ? WHERE id IN ({_placeholders(len(chunk))})",
+                        [new_campaign['id'], send_time.isoformat()] + chunk)
+                scheduled.append(new_campaign)
+            self._changed()
+            return sum(len(ids) for ids in by_campaign.values()), scheduled
+
+    # --- Public API: Scheduler Rehydration ---
+    def due_campaigns(self, until, after=None):
+        """
+        Returns copies of the pending/running campaigns that still have pending
+        recipients and are due in (after, until], ordered by send time.
+        """
+        params = [until.isoformat()]
+        after_condition = ""
+        if after is not None:
+            after_condition = "AND c.send_time > ?"
+            params.append(after.isoformat())
+        with self.db.lock:
+            rows = self.db.conn.execute(
+                f"SELECT c.* FROM campaigns c WHERE c.status IN ('pending', 'running') "
+                f"AND c.send_time <= ? {after_condition} "
+                f"AND EXISTS (SELECT 1 FROM jobs j WHERE j.campaign_id = c.id AND j.status = 'pending') "
+                f"ORDER BY c.send_time", params)
+            return [_campaign_from_row(row) for row in rows]
+
+    def close_campaigns(self, campaign_ids, campaign_status, job_status):
+        """
+        Sets the status of several campaigns and of all their pending
+        recipients in one transaction. Returns the number of recipients updated.
+        """
+        campaign_ids = list(campaign_ids)
+        with self.db.lock, self.db.conn:
+            before = self.db.conn.total_changes
+            self.db.conn.executemany("UPDATE jobs SET status = ? WHERE campaign_id = ? AND status = 'pending'",
+                                     ((job_status, campaign_id) for campaign_id in campaign_ids))
+            updated = self.db.conn.total_changes - before
+            self.db.conn.executemany("UPDATE campaigns SET status = ? WHERE id = ?",
+                                     ((campaign_status, campaign_id) for campaign_id in campaign_ids))
+            if campaign_ids:
+                self._changed()
+            return updated
+
+    # --- Public API: Listing ---
+    def pending_page(self, limit, cursor=None):
+        """
+        Returns (jobs, next_cursor, total) for one page of pending jobs ordered
+        by send time. cursor is the opaque next_cursor of the previous page.
+        """
+        params = []
+        after_cursor = ""
+        if cursor:
+            send_time, separator, job_id = cursor.partition('|')
+            if not separator:
+                raise ValueError("invalid cursor")
+            datetime.fromisoformat(send_time)
+            after_cursor = "AND (j.send_time, j.id) > (?, ?)"
+            params += [send_time, job_id]
+        with self.db.lock:
+            rows = self.db.conn.execute(
+                f"{self._JOB_COLUMNS} WHERE j.status = 'pending' {after_cursor} "
+                f"ORDER BY j.send_time, j.id LIMIT ?", params + [limit + 1]).fetchall()
+            total = self.pending_count()
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = f"{last['send_time']}|{last['id']}"
+        return [self._materialize(row) for row in rows[:limit]], next_cursor, total
+
+    def etag(self):
+        """Returns an opaque tag that changes whenever any job or campaign changes."""
+        return f"jobs-{self._token}-{self.version}"
+
+    def pending_count(self, campaign_id=None):
+        """Returns how many jobs are pending, overall or in one campaign."""
+        with self.db.lock:
+            if campaign_id is not None:
+                return self._pending_left(campaign_id)
+            if self._pending_count is None or self._pending_count[0] != self.version:
+                count = self.db.conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'pending'").fetchone()[0]
+                self._pending_count = (self.version, count)
+            return self._pending_count[1]
+
+    def summary(self):
+        """Returns per-campaign job counts by status bucket from one grouped query."""
+        with self.db.lock:
+            result = {row['id']: dict(_campaign_from_row(row), counts={}, total=0)
+                      for row in self.db.conn.execute("SELECT * FROM campaigns")}
+            for row in self.db.conn.execute(
+                    "SELECT campaign_id, status, COUNT(*) FROM jobs GROUP BY campaign_id, status"):
+                entry = result.get(row[0])
+                if entry is None:
+                    continue
+                bucket = status_bucket(row[1])
+                entry['counts'][bucket] = entry['counts'].get(bucket, 0) + row[2]
+                entry['total'] += row[2]
+            return list(result.values())
+
+class SqliteDeadLetterQueue:
+    """SQLite implementation of the DeadLetterQueue interface."""
+
+    _COLUMNS = "id, failed_at, number, message, error, attempts, job_id, campaign_id"
+
+    def __init__(self, database):
+        self.db = database
+
+    @staticmethod
+    def _entry_from_row(row):
+        entry = {key: row[key] for key in row.keys()}
+        entry['failed_at'] = datetime.fromisoformat(entry['failed_at'])
+        return entry
+
+    def add(self, number, message, error, attempts, job_id=None, campaign_id=None):
+        """Stores a message that ran out of retries. Returns the new entry."""
+        entry = {'id': str(uuid.uuid4()), 'failed_at': datetime.now(), 'number': number, 'message': message,
+                 'error': str(error), 'attempts': attempts, 'job_id': job_id, 'campaign_id': campaign_id}
+        with self.db.lock, self.db.conn:
+            self.db.conn.execute(
+                f"INSERT INTO dead_letters ({self._COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (entry['id'], entry['failed_at'].isoformat(), number, message, entry['error'], attempts,
+                 job_id, campaign_id))
+        return entry
+
+    def entries(self, campaign_id=None, limit=None):
+        """Returns the stored entries, oldest first, optionally for one campaign."""
+        where, params = ("WHERE campaign_id = ? ", [campaign_id]) if campaign_id is not None else ("", [])
+        with self.db.lock:
+            rows = self.db.conn.execute(f"SELECT {self._COLUMNS} FROM dead_letters {where}ORDER BY seq LIMIT ?",
+                                        params + [-1 if limit is None else limit]).fetchall()
+        return [self._entry_from_row(row) for row in rows]
+
+    def take(self, entry_ids=None, campaign_id=None):
+        """Removes and returns the selected entries in one transaction (see DeadLetterQueue.take)."""
+        with self.db.lock, self.db.conn:
+            if entry_ids is not None:
+                rows = []
+                for chunk in _chunks(dict.fromkeys(entry_ids)):
+                    rows += self.db.conn.execute(
+                        f"SELECT seq, {self._COLUMNS} FROM dead_letters WHERE id IN ({_placeholders(len(chunk))})",
+                        chunk).fetchall()
+                rows.sort(key=lambda row: row['seq'])
+                if campaign_id is not None:
+                    rows = [row for row in rows if row['campaign_id'] == campaign_id]
+            elif campaign_id is not None:
+                rows = self.db.conn.execute(f"SELECT seq, {self._COLUMNS} FROM dead_letters WHERE campaign_id = ? "
+                                            f"ORDER BY seq", (campaign_id,)).fetchall()
+            else:
+                rows = self.db.conn.execute(f"SELECT seq, {self._COLUMNS} FROM dead_letters ORDER BY seq").fetchall()
+            self.db.conn.executemany("DELETE FROM dead_letters WHERE seq = ?", [(row['seq'],) for row in rows])
+        entries = [self._entry_from_row(row) for row in rows]
+        for entry in entries:
+            del entry['seq']
+        return entries
+
+    def count(self):
+        with self.db.lock:
+            return self.db.conn.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+
+class SqliteSendLedger:
+    """
+    SQLite implementation of the SendLedger interface. Each change is one
+    statement, so claims and attempts are atomic across processes sharing
+    the database as well as across threads. begin_in() and confirm_in()
+    let the broker record them in the same transaction as its own changes.
+    """
+
+    def __init__(self, database, owner=None, lease_seconds=3600.0, clock=time.time):
+        self.db = database
+        self.owner = owner or new_owner()
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+
+    def claim(self, job_ids, lease_seconds=None):
+        """Claims jobs for sending; returns the ids that were claimed (see SendLedger.claim)."""
+        now = self.clock()
+        until = now + (lease_seconds or self.lease_seconds)
+        claimed = []
+        with self.db.lock, self.db.conn:
+            for chunk in _chunks(dict.fromkeys(job_ids)):
+                self.db.conn.executemany(
+                    "INSERT INTO send_ledger (job_id, owner, lease_until, attempt, state) VALUES (?, ?, ?, 0, 'claimed') "
+                    "ON CONFLICT (job_id) DO UPDATE SET owner = excluded.owner, lease_until = excluded.lease_until "
+                    "WHERE send_ledger.state = 'claimed' AND send_ledger.lease_until <= ?",
+                    [(job_id, self.owner, until, now) for job_id in chunk])
+                rows = self.db.conn.execute(
+                    f"SELECT job_id FROM send_ledger WHERE job_id IN ({_placeholders(len(chunk))}) "
+                    f"AND owner = ? AND lease_until = ? AND state = 'claimed'", (*chunk, self.owner, until))
+                claimed_now = {row[0] for row in rows}
+                claimed += [job_id for job_id in chunk if job_id in claimed_now]
+        return claimed
+
+    def begin(self, job_id, attempt):
+        """Records that the job is about to be sent; False if it must not be (see SendLedger.begin)."""
+        with self.db.lock, self.db.conn:
+            return self.begin_in(self.db.conn, job_id, attempt)
+
+    def begin_in(self, conn, job_id, attempt):
+        """begin() inside the caller's transaction (the caller holds the database lock)."""
+        until = self.clock() + self.lease_seconds
+        updated = conn.execute(
+            "UPDATE send_ledger SET state = 'sending', owner = ?, lease_until = ?, attempt = ? "
+            "WHERE job_id = ? AND state = 'claimed'", (self.owner, until, attempt, job_id)).rowcount
+        if not updated:
+            updated = conn.execute(
+                "INSERT OR IGNORE INTO send_ledger (job_id, owner, lease_until, attempt, state) "
+                "VALUES (?, ?, ?, ?, 'sending')", (job_id, self.owner, until, attempt)).rowcount
+        return updated == 1
+
+    def confirm(self, job_id, ok):
+        with self.db.lock, self.db.conn:
+            self.confirm_in(self.db.conn, job_id, ok)
+
+    def confirm_in(self, conn, job_id, ok):
+        """confirm() inside the caller's transaction (the caller holds the database lock)."""
+        if ok:
+            conn.execute("UPDATE send_ledger SET state = 'sent' WHERE job_id = ?", (job_id,))
+        else:
+            conn.execute("DELETE FROM send_ledger WHERE job_id = ?", (job_id,))
+
+    def settle(self, job_ids):
+        with self.db.lock, self.db.conn:
+            for chunk in _chunks(job_ids):
+                self.db.conn.execute(f"DELETE FROM send_ledger WHERE state = 'sent' "
+                                     f"AND job_id IN ({_placeholders(len(chunk))})", chunk)
+
+    def forget(self, job_ids):
+        with self.db.lock, self.db.conn:
+            for chunk in _chunks(job_ids):
+                self.db.conn.execute(f"DELETE FROM send_ledger WHERE job_id IN ({_placeholders(len(chunk))})", chunk)
+
+    def in_flight(self):
+        with self.db.lock:
+            rows = self.db.conn.execute("SELECT job_id, owner, lease_until, attempt, state FROM send_ledger").fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self):
+        with self.db.lock:
+            return self.db.conn.execute("SELECT COUNT(*) FROM send_ledger").fetchone()[0]
@@ -0,0 +1,274 @@
+# state_manager.py
+import threading
+import time
+from collections import deque
+
+import metrics
+
+# One observation per flush of buffered status updates into the store
+_PERSIST_SECONDS = metrics.STAGE_SECONDS.labels('persist')
+
+class WriteTicket:
+    """Handle for a queued write; wait() blocks until the writer thread has committed it."""
+    __slots__ = ('_done', 'result', 'error')
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def _resolve(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Returns the write's result, re-raising its exception. Raises TimeoutError if not committed in time."""
+        if not self._done.wait(timeout):
+            raise TimeoutError("write not committed in time")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class StateSnapshot:
+    """Immutable view of the job state published by the writer thread."""
+    __slots__ = ('version', 'pending', 'campaigns', 'taken_at')
+
+    def __init__(self, version, pending, campaigns):
+        self.version = version
+        self.pending = pending
+        self.campaigns = campaigns
+        self.taken_at = time.time()
+
+class _StatusUpdate:
+    __slots__ = ('job_id', 'status', 'ticket', 'urgent')
+
+    def __init__(self, job_id, status, ticket, urgent=False):
+        self.job_id = job_id
+        self.status = status
+        self.ticket = ticket
+        self.urgent = urgent
+
+class _Call:
+    __slots__ = ('fn', 'args', 'kwargs', 'ticket')
+
+    def __init__(self, fn, args, kwargs, ticket):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.ticket = ticket
+
+class StateManager:
+    """
+    Single-writer front for the job store, shared by Flask request threads,
+    scheduler threads and send workers.
+
+    Every write is queued and applied by one writer thread, so writes never
+    interleave. The writer drains whatever has queued up while it was busy
+    and commits it as a group: job status updates in the group are folded
+    into one update_status_many() call per status (one journal append or
+    one SQLite transaction) instead of one write each. Callers may wait for
+    the commit through the returned WriteTicket or carry on.
+
+    Status updates are additionally coalesced according to the flush
+    policy: they are held in memory until flush_max of them are buffered
+    or the oldest has waited flush_interval seconds, whichever comes
+    first. Any other write, a caller waiting on its update, and stop()
+    flush the buffer immediately. flush_interval=0 commits every group as
+    soon as it is drained. on_flush(job_ids), if given, is called with
+    the jobs of every group of status updates once it is in the store.
+
+    Readers that only need counts call snapshot(), which returns the
+    last StateSnapshot published by the writer without taking any lock.
+    Snapshots are refreshed whenever the queue runs dry, and at most every
+    snapshot_interval seconds while writes keep arriving.
+    """
+
+    def __init__(self, job_store, max_batch=5000, snapshot_interval=0.25, flush_interval=0.0, flush_max=500,
+                 on_flush=None):
+        self.job_store = job_store
+        self.on_flush = on_flush
+        self.max_batch = max_batch
+        self.snapshot_interval = snapshot_interval
+        self.flush_interval = flush_interval
+        self.flush_max = flush_max
+        self.batches = 0
+        self.committed = 0
+        # Number of times buffered status updates were written to the store
+        self.flushes = 0
+        self._buffer = []
+        self._buffer_since = None
+        self._flush_now = False
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._writer = None
+        self._snapshot = None
+        self._snapshot_version = None
+        self._snapshot_time = 0.0
+        metrics.QUEUE_DEPTH.labels('state_writer').set_function(lambda: len(self._queue))
+
+    # --- Lifecycle ---
+    def start(self):
+        """Starts the writer thread."""
+        with self._cond:
+            if self._writer is not None:
+                return
+            self._stopping = False
+            self._writer = threading.Thread(target=self._writer_loop, name='state-writer', daemon=True)
+            self._writer.start()
+
+    def stop(self, timeout=None):
+        """Commits everything still queued, then stops the writer thread."""
+        with self._cond:
+            writer = self._writer
+            self._stopping = True
+            self._cond.notify_all()
+        if writer is not None:
+            writer.join(timeout)
+        with self._cond:
+            self._writer = None
+
+    # --- Writes ---
+    def _enqueue(self, item):
+        self.start()
+        with self._cond:
+            self._queue.append(item)
+            self._cond.notify()
+        return item.ticket
+
+    def update_status(self, job_id, status, wait=False):
+        """Queues a job status change. Returns its WriteTicket, or None once committed if wait is set."""
+        ticket = self._enqueue(_StatusUpdate(job_id, status, WriteTicket(), urgent=wait))
+        if wait:
+            return ticket.wait()
+        return ticket
+
+    def flush(self):
+        """Commits all buffered status updates now and returns once they are written."""
+        return self.call(lambda: None)
+
+    def call(self, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) on the writer thread and returns its result (blocking)."""
+        return self._enqueue(_Call(fn, args, kwargs, WriteTicket())).wait()
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._queue)
+
+    # --- Reads ---
+    def snapshot(self):
+        """Returns the latest published StateSnapshot (lock-free; may lag the store by snapshot_interval)."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            self._publish_snapshot()
+            snapshot = self._snapshot
+        return snapshot
+
+    def _publish_snapshot(self):
+        version = self.job_store.version
+        if self._snapshot is not None and version == self._snapshot_version:
+            return
+        campaigns = tuple(self.job_store.summary())
+        # Publishing is a single reference assignment, which readers observe atomically
+        self._snapshot = StateSnapshot(version, self.job_store.pending_count(), campaigns)
+        self._snapshot_version = version
+        self._snapshot_time = time.monotonic()
+
+    # --- Writer ---
+    def _take_batch(self):
+        """
+        Waits for work and pops up to max_batch queued writes. Returns an empty
+        list when the buffered status updates are due, None when stopped and drained.
+        """
+        with self._cond:
+            while not self._queue:
+                if self._stopping:
+                    return None
+                if self._buffer:
+                    remaining = self._buffer_since + self.flush_interval - time.monotonic()
+                    if remaining <= 0:
+                        return []
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+            count = min(len(self._queue), self.max_batch)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _commit_statuses(self, updates):
+        """Commits a run of status updates with one update_status_many() call per distinct status."""
+        latest = {}
+        for update in updates:
+            # Later updates of the same job win, as they would if applied one by one
+            latest.pop(update.job_id, None)
+            latest[update.job_id] = update.status
+        by_status = {}
+        for job_id, status in latest.items():
+            by_status.setdefault(status, []).append(job_id)
+        error = None
+        started = time.perf_counter()
+        try:
+            for status, job_ids in by_status.items():
+                self.job_store.update_status_many(job_ids, status)
+        except Exception as e:
+            print(f"[STATE MANAGER] Failed to commit {len(updates)} status update(s): {e}")
+            error = e
+        _PERSIST_SECONDS.observe(time.perf_counter() - started)
+        self.flushes += 1
+        if error is None and self.on_flush is not None:
+            try:
+                self.on_flush(list(latest))
+            except Exception as e:
+                print(f"[STATE MANAGER] Flush callback failed: {e}")
+        for update in updates:
+            update.ticket._resolve(error=error)
+
+    def _flush_buffer(self):
+        if self._buffer:
+            buffered, self._buffer = self._buffer, []
+            self._buffer_since = None
+            self._flush_now = False
+            self._commit_statuses(buffered)
+
+    def _flush_due(self):
+        if not self._buffer:
+            return False
+        return (self._flush_now or self._stopping or len(self._buffer) >= self.flush_max
+                or time.monotonic() - self._buffer_since >= self.flush_interval)
+
+    def _commit(self, batch):
+        for item in batch:
+            if isinstance(item, _StatusUpdate):
+                if not self._buffer:
+                    self._buffer_since = time.monotonic()
+                self._buffer.append(item)
+                self._flush_now = self._flush_now or item.urgent
+                continue
+            # Any other write is a barrier: status updates queued before it land first
+            self._flush_buffer()
+            try:
+                item.ticket._resolve(result=item.fn(*item.args, **item.kwargs))
+            except Exception as e:
+                item.ticket._resolve(error=e)
+        self.batches += 1
+        self.committed += len(batch)
+
+    def _writer_loop(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                break
+            self._commit(batch)
+            if self._flush_due():
+                self._flush_buffer()
+            idle = not self._queue
+            if idle or time.monotonic() - self._snapshot_time >= self.snapshot_interval:
+                try:
+                    self._publish_snapshot()
+                except Exception as e:
+                    print(f"[STATE MANAGER] Failed to publish snapshot: {e}")
+        self._flush_buffer()
+        self._publish_snapshot()
@@ -0,0 +1,344 @@
+# transport.py
+import os
+import random
+import threading
+import time
+import traceback
+import webbrowser
+from urllib.parse import quote
+
+import metrics
+
+class TransportError(Exception):
+    """Raised when a transport fails to deliver a message."""
+
+class PermanentTransportError(TransportError):
+    """A delivery failure that retrying cannot fix, e.g. a number that is not on WhatsApp."""
+
+class SendInterruptedError(PermanentTransportError):
+    """
+    A send that failed after the message was handed to WhatsApp (e.g. no
+    "sent" tick after pressing Enter), or whose sender crashed or was killed
+    mid-send, so the message may or may not have been delivered. Not
+    retried, to avoid a duplicate; it is dead-lettered for an operator to
+    decide.
+    """
+
+    def __init__(self, message="interrupted while sending (may have been delivered)"):
+        super().__init__(message)
+
+# pywhatkit's exceptions for input it will never accept (matched by name, as pywhatkit is imported lazily)
+_PERMANENT_ERROR_NAMES = {'CountryCodeException', 'InvalidParameters', 'UnsupportedEmojiError'}
+
+def is_transient(error):
+    """
+    Classifies a send failure. Timeouts, browser hiccups and network errors
+    before the message was handed off (login, opening the chat) are
+    transient (worth retrying); PermanentTransportError, including
+    SendInterruptedError for failures after the hand-off, and invalid input
+    are not.
+    """
+    if isinstance(error, PermanentTransportError) or isinstance(error, (ValueError, TypeError)):
+        return False
+    return type(error).__name__ not in _PERMANENT_ERROR_NAMES
+
+def _raised_in(error, module):
+    """True if error was raised from inside module (e.g. webbrowser, while opening the tab)."""
+    return any(frame.filename == module.__file__ for frame in traceback.extract_tb(error.__traceback__))
+
+# --- Transport Interface ---
+class SendTransport:
+    """
+    Base class for everything that can deliver a WhatsApp message.
+    Subclasses implement send(); close() releases any held resources.
+    inter_message_delay is the pause (seconds) a caller should leave between
+    consecutive sends when sending in a loop, and min_send_seconds the
+    least time one send takes.
+    """
+    name = 'base'
+    inter_message_delay = 0
+    min_send_seconds = 0
+    # False for transports that drive the desktop's own browser, keyboard and focus, so only one can run at a time
+    parallel = True
+
+    def send(self, phone_number, message):
+        """Delivers a single message. Raises an exception on failure."""
+        raise NotImplementedError
+
+    def close(self):
+        """Releases resources held by the transport."""
+        pass
+
+# --- pywhatkit Browser Backend ---
+class PywhatkitTransport(SendTransport):
+    """
+    Sends through pywhatkit, which opens a new WhatsApp Web tab per message.
+
+    pywhatkit gives no point at which the message is known to be handed
+    over: once the tab is open, it waits, types and presses Enter, then
+    closes the tab, and a failure in any of that may come after the message
+    went out. So only failures before the tab opened (a bad number, the
+    browser failing to start) are raised as they are; anything later is a
+    SendInterruptedError.
+    """
+    name = 'pywhatkit'
+    # Gives the browser time to close the previous tab before the next one opens
+    inter_message_delay = 5
+    parallel = False
+    # Every send waits wait_time seconds for WhatsApp Web to load before typing
+    min_send_seconds = 20
+
+    def __init__(self, wait_time=20, tab_close=True):
+        self.wait_time = wait_time
+        self.min_send_seconds = wait_time
+        self.tab_close = tab_close
+
+    def send(self, phone_number, message):
+        # Imported lazily: pywhatkit needs a display and a browser as soon as it is imported
+        import pywhatkit
+        # pywhatkit.sendwhatmsg_instantly directly opens browser without waiting for specific time within minute
+        try:
+            pywhatkit.sendwhatmsg_instantly(phone_number, message, wait_time=self.wait_time, tab_close=self.tab_close)
+        except Exception as e:
+            if type(e).__name__ in _PERMANENT_ERROR_NAMES or _raised_in(e, webbrowser):
+                raise
+            raise SendInterruptedError(f"pywhatkit failed after opening the chat with {phone_number} "
+                                       f"(may have been delivered): {e}") from e
+
+# --- In-Process Fake Backend ---
+class FakeTransport(SendTransport):
+    """
+    In-process stand-in for benchmarks and local development.
+    Simulates a per-message latency (with optional jitter) and random
+    transient and permanent failure rates.
+    """
+    name = 'fake'
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, seed=None, permanent_failure_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.permanent_failure_rate = permanent_failure_rate
+        self.sent_count = 0
+        self.failed_count = 0
+        self._random = random.Random(seed)
+
+    def send(self, phone_number, message):
+        delay = self.latency
+        if self.jitter:
+            delay = max(0.0, delay + self._random.uniform(-self.jitter, self.jitter))
+        if delay:
+            time.sleep(delay)
+        if self.permanent_failure_rate and self._random.random() < self.permanent_failure_rate:
+            self.failed_count += 1
+            raise PermanentTransportError(f"simulated invalid number {phone_number}")
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            self.failed_count += 1
+            raise TransportError(f"simulated failure sending to {phone_number}")
+        self.sent_count += 1
+
+# --- Persistent WhatsApp Web Session Backend ---
+WHATSAPP_WEB_URL = "https://web.whatsapp.com"
+
+# CSS selectors for the parts of the WhatsApp Web UI the session transport drives.
+# benchmarks/fake_whatsapp_web.html implements the same selectors for local testing.
+DEFAULT_SELECTORS = {
+    'app_ready': "#pane-side",
+    'compose_box': "footer div[contenteditable='true']",
+    'outgoing_message': "div.message-out",
+    'message_pending': "span[data-icon='msg-time']",
+    'message_sent': "span[data-icon='msg-check'], span[data-icon='msg-dblcheck']",
+    'invalid_number': "div[data-animate-modal-popup='true']",
+    'invalid_number_dismiss': "div[data-animate-modal-popup='true'] button",
+}
+
+# Clicking an in-app link to /send makes WhatsApp Web switch chats without reloading the page
+_OPEN_CHAT_SCRIPT = """
+const link = document.createElement('a');
+link.href = arguments[0];
+link.style.display = 'none';
+document.body.appendChild(link);
+link.click();
+link.remove();
+"""
+
+# Returns [number of outgoing messages, status of the last one] for the open chat
+_LAST_OUTGOING_SCRIPT = """
+const sel = arguments[0];
+const messages = document.querySelectorAll(sel.outgoing_message);
+if (!messages.length) { return [0, null]; }
+const last = messages[messages.length - 1];
+if (last.querySelector(sel.message_pending)) { return [messages.length, 'pending']; }
+if (last.querySelector(sel.message_sent)) { return [messages.length, 'sent']; }
+return [messages.length, 'unknown'];
+"""
+
+# Stage timings of a browser send: loading the chat, then pressing Enter until the tick appears
+_OPEN_CHAT_SECONDS = metrics.STAGE_SECONDS.labels('open_chat')
+_TYPE_SECONDS = metrics.STAGE_SECONDS.labels('type')
+
+class BrowserSessionTransport(SendTransport):
+    """
+    Drives one long-lived WhatsApp Web tab through Selenium.
+
+    The browser is started once (with a persistent profile so the QR login
+    survives restarts), chats are switched inside the already-loaded page,
+    and each send waits for WhatsApp's own "sent" tick on the new message
+    instead of sleeping for a fixed time. Requires the optional 'selenium'
+    package and a local Chrome or Firefox.
+    """
+    name = 'browser_session'
+
+    def __init__(self, base_url=WHATSAPP_WEB_URL, profile_dir="whatsapp_session", browser='chrome',
+                 headless=False, login_timeout=120, chat_timeout=30, send_timeout=60,
+                 poll_interval=0.1, selectors=None):
+        self.base_url = base_url.rstrip('/')
+        self.profile_dir = profile_dir
+        self.browser = browser
+        self.headless = headless
+        self.login_timeout = login_timeout
+        self.chat_timeout = chat_timeout
+        self.send_timeout = send_timeout
+        self.poll_interval = poll_interval
+        self.selectors = dict(DEFAULT_SELECTORS, **(selectors or {}))
+        self._driver = None
+        # One tab can only work on one chat at a time
+        self._lock = threading.Lock()
+
+    # --- Session Management ---
+    def _start_driver(self):
+        """Starts the browser with a persistent profile directory."""
+        try:
+            from selenium import webdriver
+        except ImportError:
+            raise PermanentTransportError("The browser_session transport requires selenium (pip install selenium).")
+
+        profile_dir = os.path.abspath(self.profile_dir)
+        if self.browser == 'firefox':
+            options = webdriver.FirefoxOptions()
+            options.add_argument("-profile")
+            options.add_argument(profile_dir)
+            if self.headless:
+                options.add_argument("-headless")
+            return webdriver.Firefox(options=options)
+
+        options = webdriver.ChromeOptions()
+        options.add_argument(f"--user-data-dir={profile_dir}")
+        if self.headless:
+            options.add_argument("--headless=new")
+        return webdriver.Chrome(options=options)
+
+    def _ensure_session(self):
+        """Opens WhatsApp Web once and waits until the user is logged in."""
+        if self._driver is not None:
+            return
+        self._driver = self._start_driver()
+        self._driver.get(self.base_url)
+        print(f"[BROWSER SESSION] Waiting up to {self.login_timeout}s for WhatsApp Web to be ready (scan the QR code if asked)...")
+        self._wait_until(lambda: self._find(self.selectors['app_ready']), self.login_timeout, "WhatsApp Web login")
+        print("[BROWSER SESSION] WhatsApp Web session is ready.")
+
+    def _find(self, selector):
+        from selenium.webdriver.common.by import By
+        elements = self._driver.find_elements(By.CSS_SELECTOR, selector)
+        return elements[0] if elements else None
+
+    def _wait_until(self, condition, timeout, what):
+        """Polls condition() until it returns a truthy value or the timeout expires."""
+        deadline = time.monotonic() + timeout
+        while True:
+            result = condition()
+            if result:
+                return result
+            if time.monotonic() >= deadline:
+                raise TransportError(f"Timed out after {timeout}s waiting for {what}.")
+            time.sleep(self.poll_interval)
+
+    def _last_outgoing(self):
+        return self._driver.execute_script(_LAST_OUTGOING_SCRIPT, self.selectors)
+
+    # --- Sending ---
+    def send(self, phone_number, message):
+        with self._lock:
+            self._ensure_session()
+            digits = phone_number.lstrip('+')
+            open_started = time.perf_counter()
+            self._driver.execute_script(_OPEN_CHAT_SCRIPT, f"{self.base_url}/send?phone={digits}&text={quote(message)}")
+
+            def chat_ready():
+                if self._find(self.selectors['invalid_number']):
+                    dismiss_button = self._find(self.selectors['invalid_number_dismiss'])
+                    if dismiss_button is not None:
+                        dismiss_button.click()
+                    raise PermanentTransportError(f"WhatsApp reports {phone_number} is not a valid WhatsApp number.")
+                compose_box = self._find(self.selectors['compose_box'])
+                # The compose box is pre-filled from the link once the chat has switched
+                if compose_box is not None and compose_box.text.strip():
+                    return compose_box
+                return None
+
+            compose_box = self._wait_until(chat_ready, self.chat_timeout, f"the chat with {phone_number} to open")
+            count_before, _ = self._last_outgoing()
+            type_started = time.perf_counter()
+            _OPEN_CHAT_SECONDS.observe(type_started - open_started)
+
+            from selenium.webdriver.common.keys import Keys
+
+            def message_sent():
+                count, status = self._last_outgoing()
+                return count > count_before and status == 'sent'
+
+            try:
+                compose_box.send_keys(Keys.ENTER)
+                self._wait_until(message_sent, self.send_timeout, f"the message to {phone_number} to be sent")
+            except Exception as e:
+                # Enter may have gone through: retrying could deliver the message twice
+                raise SendInterruptedError(f"no sent confirmation for the message to {phone_number} "
+                                           f"(may have been delivered): {e}") from e
+            _TYPE_SECONDS.observe(time.perf_counter() - type_started)
+
+    def close(self):
+        with self._lock:
+            if self._driver is not None:
+                try:
+                    self._driver.quit()
+                finally:
+                    self._driver = None
+
+TRANSPORTS = {
+    PywhatkitTransport.name: PywhatkitTransport,
+    FakeTransport.name: FakeTransport,
+    BrowserSessionTransport.name: BrowserSessionTransport,
+}
+
+def create_transport(name, **options):
+    """Creates a transport by its registered name (e.g. 'pywhatkit' or 'fake')."""
+    try:
+        transport_class = TRANSPORTS[name]
+    except KeyError:
+        raise ValueError(f"Unknown transport '{name}'. Available: {', '.join(sorted(TRANSPORTS))}")
+    return transport_class(**options)
+
+def session_options(name, index):
+    """
+    Options that give the index-th of several transports of one kind its
+    own session: each browser_session gets its own browser profile
+    (whatsapp_session, whatsapp_session_1, ...), as Chrome refuses a
+    profile another browser has open.
+    """
+    if name == BrowserSessionTransport.name:
+        return {'profile_dir': f"whatsapp_session_{index}" if index else "whatsapp_session"}
+    return {}
+
+def check_parallel(name, count):
+    """Raises ValueError if count transports of this kind cannot run side by side."""
+    transport_class = TRANSPORTS.get(name)
+    if count > 1 and transport_class is not None and not transport_class.parallel:
+        raise ValueError(f"The '{name}' transport drives the desktop's browser, keyboard and focus, so only "
+                         f"one sender can use it at a time (asked for {count}). Use 'browser_session' for "
+                         f"parallel senders.")
+
+def create_transports(name, count):
+    """Creates count transports of one kind for parallel senders, each with its own session."""
+    check_parallel(name, count)
+    return [create_transport(name, **session_options(name, index)) for index in range(count)]